@@ -93,8 +93,58 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+MEDIA_URL = '/media/'
+MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Per-user response cache, ETags and auth state (tasks_app/caching.py).
+# It must be shared by every process that writes: the web workers and the
+# management commands (reminders, imports, archiving, ...) all bump data
+# versions. The file-based default is shared on one host; use Redis or
+# Memcached across hosts. A per-process backend (locmem) gets a system check
+# warning.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int)},
+    }
+}
+# Gives the test suite a throwaway cache directory instead of the one above.
+TEST_RUNNER = 'tasks_app.testing.TestRunner'
+
+# Outgoing email (reminders). Point EMAIL_HOST/EMAIL_PORT at a local
+# debugging server, e.g. `python -m aiosmtpd -n -l localhost:1025`, in development.
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=1025, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=10, cast=int)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='Duna <reminders@localhost>')
+
+# ActivityLog retention (tasks_app/archive.py): `manage.py archive_activity`
+# moves entries older than this to gzipped NDJSON files, per user and month.
+ACTIVITY_RETENTION_DAYS = config('ACTIVITY_RETENTION_DAYS', default=90, cast=int)
+ACTIVITY_ARCHIVE_DIR = config('ACTIVITY_ARCHIVE_DIR', default=str(BASE_DIR / 'archive' / 'activity'))
+
+# /tasks/changes/ hands out cursors this far in the past, so writes from
+# transactions still open when it ran (at most this long) aren't skipped.
+SYNC_CURSOR_MARGIN_SECONDS = config('SYNC_CURSOR_MARGIN_SECONDS', default=60, cast=int)
+
+# Resumable attachment uploads (tasks_app/attachments.py). Partial files must
+# be on a disk all web processes share; finished ones go to MEDIA_ROOT, once
+# per distinct content. `manage.py purge_uploads` drops abandoned uploads.
+ATTACHMENT_UPLOAD_DIR = config('ATTACHMENT_UPLOAD_DIR', default=str(BASE_DIR / 'uploads'))
+ATTACHMENT_QUOTA_BYTES = config('ATTACHMENT_QUOTA_BYTES', default=1024 ** 3, cast=int)
+# Downloads (tasks_app/downloads.py) are sent by Django unless the web server
+# can take over: 'x-accel-redirect' (nginx, with an internal location at
+# ATTACHMENT_ACCEL_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile' (Apache).
+ATTACHMENT_SENDFILE = config('ATTACHMENT_SENDFILE', default='')
+ATTACHMENT_ACCEL_PREFIX = config('ATTACHMENT_ACCEL_PREFIX', default='/protected-media/')
+
 # CORS configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -105,7 +155,7 @@ CORS_ALLOWED_ORIGINS = [
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'tasks_app.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -118,4 +168,7 @@ from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Tokens embed a hash of the password hash, so changing it logs out everywhere.
+    'CHECK_REVOKE_TOKEN': True,
+    'TOKEN_REFRESH_SERIALIZER': 'tasks_app.serializers.RevocableTokenRefreshSerializer',
 }
\ No newline at end of file
@@ -0,0 +1,287 @@
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import caching, graph, rollups, search
+from .models import (
+    ActivityLog, Label, LinkResource, Subtask, Task, TaskAttachment, TaskComment, TaskDependency, TaskLabel,
+    TaskNote, TaskReminder, TimeLog, Tombstone,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Task fields kept in snapshots. updated_at and the recurrence bookkeeping
+# follow from these.
+SNAPSHOT_FIELDS = ['title', 'description', 'status', 'priority', 'deadline', 'category', 'recurrence', 'is_recurring', 'order', 'completed_at']
+# Rows deleted along with a task and put back when the deletion is undone:
+# snapshot key -> (model, fields kept besides the id).
+CHILDREN = {
+    'subtasks': (Subtask, ['title', 'status', 'order', 'created_at']),
+    'reminders': (TaskReminder, ['remind_at', 'is_sent', 'sent_at', 'type', 'created_at']),
+    'time_logs': (TimeLog, ['duration_minutes', 'estimated_minutes', 'logged_date', 'notes', 'created_at']),
+    'notes': (TaskNote, ['content', 'created_at']),
+    'comments': (TaskComment, ['user_id', 'content', 'created_at']),
+    'links': (LinkResource, ['title', 'url', 'resource_type', 'created_at']),
+}
+SEARCH_KINDS = {Subtask: 'subtask', TaskNote: 'note', TaskComment: 'comment'}
+# Snapshot keys of a deleted task that aren't task fields.
+RELATED_KEYS = {'labels', 'dependencies', 'attachments', *CHILDREN}
+# Changed by reordering or the recurrence scheduler, which are not logged,
+# so never a reason to refuse.
+UNCHECKED_FIELDS = {'order', 'recurrence_pending', *RELATED_KEYS}
+UNDOABLE = ('create', 'update', 'complete', 'delete')
+
+FLUSH_SIZE = 200
+FLUSH_INTERVAL = 2  # seconds
+
+_recording = ContextVar('activity_recording', default=True)
+
+
+class NothingToReplay(Exception):
+    pass
+
+
+class ReplayConflict(Exception):
+    pass
+
+
+class ActivityBuffer:
+    """
+    Log entries waiting to be written. Flushed with one bulk_create once
+    `size` entries are queued or `interval` seconds after the first one, so
+    requests never wait for the log.
+    """
+
+    def __init__(self, size=FLUSH_SIZE, interval=FLUSH_INTERVAL):
+        self.size = size
+        self.interval = interval
+        self.entries = []
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def add(self, entry):
+        with self.lock:
+            self.entries.append(entry)
+            full = len(self.entries) >= self.size
+            if not full and self.timer is None:
+                self.timer = threading.Timer(self.interval, self._flush_in_background)
+                self.timer.daemon = True
+                self.timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write all queued entries now. Returns how many were written."""
+        with self.lock:
+            entries, self.entries = self.entries, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if entries:
+            ActivityLog.objects.bulk_create(entries)
+            caching.bump_version(*{entry.user_id for entry in entries})
+        return len(entries)
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except DatabaseError:
+            logger.exception('Could not write the activity log.')
+        finally:
+            # The timer thread's own connection.
+            connection.close()
+
+
+buffer = ActivityBuffer()
+atexit.register(buffer.flush)
+
+
+def flush():
+    return buffer.flush()
+
+
+@contextmanager
+def paused():
+    """Don't log task changes made inside the block (undo/redo replays)."""
+    token = _recording.set(False)
+    try:
+        yield
+    finally:
+        _recording.reset(token)
+
+
+def _dump(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def snapshot(task, fields=SNAPSHOT_FIELDS):
+    return {name: _dump(getattr(task, name)) for name in fields}
+
+
+def _load(data, model=Task):
+    return {name: model._meta.get_field(name).to_python(value) for name, value in data.items() if name not in RELATED_KEYS}
+
+
+def _record(task, action, old_data, new_data):
+    if not _recording.get():
+        return
+    entry = ActivityLog(
+        user_id=task.user_id, action=action, task_id=task.pk,
+        old_data=old_data, new_data=new_data, timestamp=timezone.now(),
+    )
+    # Rolled-back writes are never logged.
+    transaction.on_commit(lambda: buffer.add(entry))
+
+
+def task_saved(task, created, loaded):
+    if created:
+        _record(task, 'create', None, snapshot(task))
+        return
+    changed = [name for name in SNAPSHOT_FIELDS if name in loaded and loaded[name] != getattr(task, name)]
+    if not changed:
+        return
+    action = 'complete' if 'status' in changed and task.status == 'completed' else 'update'
+    _record(task, action, {name: _dump(loaded[name]) for name in changed}, snapshot(task, changed))
+
+
+def task_deleting(task):
+    if not _recording.get():
+        return
+    data = snapshot(task)
+    # Whether the scheduler still owes it a successor, so undo doesn't
+    # create a second one.
+    data['recurrence_pending'] = task.recurrence_pending
+    data['labels'] = list(TaskLabel.objects.filter(task_id=task.pk).values_list('label_id', flat=True))
+    for key, (model, fields) in CHILDREN.items():
+        rows = model.objects.filter(task_id=task.pk).values('id', *fields)
+        data[key] = [{name: _dump(value) for name, value in row.items()} for row in rows]
+    # Their files may be gone by the time of an undo, which is refused.
+    data['attachments'] = TaskAttachment.objects.filter(task_id=task.pk).count()
+    data['dependencies'] = list(TaskDependency.objects.filter(
+        Q(dependent_task_id=task.pk) | Q(depends_on_task_id=task.pk),
+    ).values_list('dependent_task_id', 'depends_on_task_id'))
+    _record(task, 'delete', data, None)
+
+
+def _matches(task, data):
+    current = {name: getattr(task, name) for name in data if name not in UNCHECKED_FIELDS}
+    return all(current[name] == value for name, value in _load(data).items() if name in current)
+
+
+def _restore_children(task, data):
+    for key, (model, fields) in CHILDREN.items():
+        rows = [_load(row, model) for row in data.get(key, [])]
+        if model is TaskComment:
+            # Comments of users deleted since have nobody to belong to.
+            users = set(User.objects.filter(pk__in={row['user_id'] for row in rows}).values_list('pk', flat=True))
+            rows = [row for row in rows if row['user_id'] in users]
+        children = model.objects.bulk_create([model(task=task, **row) for row in rows])
+        # bulk_create stamps auto_now_add fields with the current time.
+        stamped = [name for name in fields if getattr(model._meta.get_field(name), 'auto_now_add', False)]
+        for child, row in zip(children, rows):
+            for name in stamped:
+                setattr(child, name, row[name])
+        if children and stamped:
+            model.objects.bulk_update(children, stamped)
+        # Bulk inserts skip the signals that keep these up to date.
+        if model in SEARCH_KINDS:
+            search.index_objects(SEARCH_KINDS[model], children)
+        elif model is TimeLog:
+            for log in children:
+                rollups.time_log_changed(log, created=True, task=task)
+
+    pairs = data.get('dependencies', [])
+    # Only between tasks that are still there.
+    present = set(Task.objects.filter(user_id=task.user_id, pk__in={pk for pair in pairs for pk in pair}).values_list('pk', flat=True))
+    TaskDependency.objects.bulk_create([
+        TaskDependency(dependent_task_id=dependent, depends_on_task_id=depends_on)
+        for dependent, depends_on in pairs if dependent in present and depends_on in present
+    ], ignore_conflicts=True)
+    graph.invalidate(task.user_id)
+
+
+def _restore(user, task_id, data):
+    if data.get('attachments'):
+        raise ReplayConflict('The task had attachments, which were deleted with it and cannot be restored.')
+    task = Task(id=task_id, user=user, **_load(data))
+    task.save(force_insert=True)
+    # Back, so clients syncing from before the delete mustn't drop it.
+    Tombstone.objects.filter(user=user, model='task', object_id=task_id).delete()
+    if 'recurrence_pending' in data and task.recurrence_pending != data['recurrence_pending']:
+        # save() marks a new recurring task as owed a successor, which it
+        # may already have.
+        task.recurrence_pending = data['recurrence_pending']
+        Task.objects.filter(pk=task.pk).update(recurrence_pending=task.recurrence_pending)
+    labels = Label.objects.filter(user=user, id__in=data.get('labels', [])).values_list('id', flat=True)
+    TaskLabel.objects.bulk_create([TaskLabel(task=task, label_id=label_id) for label_id in labels])
+    _restore_children(task, data)
+    return task
+
+
+def _apply(user, entry, forward):
+    """Move the entry's task from one side of the diff to the other."""
+    source, target = (entry.old_data, entry.new_data) if forward else (entry.new_data, entry.old_data)
+    task = Task.objects.filter(user=user, pk=entry.task_id).first()
+    if source is None:
+        if task is not None:
+            raise ReplayConflict('The task already exists.')
+        return _restore(user, entry.task_id, target)
+    if task is None:
+        raise ReplayConflict('The task no longer exists.')
+    if not _matches(task, source):
+        raise ReplayConflict('The task has changed since.')
+    if target is None:
+        task.delete()
+        return None
+    for name, value in _load(target).items():
+        setattr(task, name, value)
+    task.save()
+    return task
+
+
+def _history(user):
+    return ActivityLog.objects.filter(user=user, action__in=UNDOABLE)
+
+
+def _replay(user, pick, forward):
+    flush()
+    with transaction.atomic():
+        # One undo/redo at a time per user.
+        User.objects.select_for_update().filter(pk=user.pk).exists()
+        entry = pick()
+        if entry is None:
+            raise NothingToReplay()
+        with paused():
+            task = _apply(user, entry, forward)
+        entry.undone = not forward
+        entry.save(update_fields=['undone'])
+        caching.bump_version(user.pk)
+    return entry, task
+
+
+def undo(user):
+    """Revert the user's latest logged task change. Returns (entry, task or None)."""
+    def latest():
+        return _history(user).filter(undone=False).order_by('-timestamp', '-id').first()
+    return _replay(user, latest, forward=False)
+
+
+def redo(user):
+    """Re-apply the oldest change undone since the latest one still in effect."""
+    def next_undone():
+        undone = _history(user).filter(undone=True)
+        latest = _history(user).filter(undone=False).order_by('-timestamp', '-id').first()
+        if latest is not None:
+            # Anything undone before the latest new change is out of reach.
+            undone = undone.filter(Q(timestamp__gt=latest.timestamp) | Q(timestamp=latest.timestamp, id__gt=latest.id))
+        return undone.order_by('timestamp', 'id').first()
+    return _replay(user, next_undone, forward=True)
@@ -0,0 +1,210 @@
+import fcntl
+import gzip
+import json
+import logging
+import os
+import shutil
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching
+from .models import ActivityLog
+
+
+# Cold storage for ActivityLog: one gzipped NDJSON file per user and month,
+# <ACTIVITY_ARCHIVE_DIR>/<user id>/<YYYY-MM>.ndjson.gz. Each archiving run
+# appends a gzip member to the files it touches and then rewrites them as
+# one member, so the files stay append-only between compactions. Appends and
+# compactions of a user's files hold <user id>/.lock, so a compaction never
+# replaces a file with members it hasn't read.
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def user_dir(user_id):
+    return Path(settings.ACTIVITY_ARCHIVE_DIR) / str(user_id)
+
+
+def _path(user_id, month):
+    return user_dir(user_id) / f'{month}.ndjson.gz'
+
+
+def _month(timestamp):
+    return timestamp.astimezone(dt_timezone.utc).strftime('%Y-%m')
+
+
+def _record(entry):
+    return {
+        'id': entry.id,
+        'action': entry.action,
+        'task_id': entry.task_id,
+        'old_data': entry.old_data,
+        'new_data': entry.new_data,
+        'timestamp': entry.timestamp.isoformat(),
+        'undone': entry.undone,
+    }
+
+
+@contextmanager
+def _locked(directory):
+    """Exclusive lock on the archive directory of one user, across processes."""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / '.lock', 'wb') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write(path, records, mode):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, mode) as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+            for record in records:
+                archive.write(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _members(data):
+    """
+    The decompressed gzip members of `data`, and whether all of it could be
+    read. A damaged member is skipped up to the next gzip header; a torn
+    one at the end (an append in progress) gives what it has so far.
+    """
+    members, complete, offset = [], True, 0
+    view = memoryview(data)
+    while offset < len(data):
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            members.append(decompressor.decompress(view[offset:]))
+        except zlib.error:
+            complete = False
+            offset = data.find(GZIP_MAGIC, offset + 1)
+            if offset == -1:
+                break
+            continue
+        if not decompressor.eof:
+            complete = False
+            break
+        offset = len(data) - len(decompressor.unused_data)
+    return members, complete
+
+
+def _read(path):
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return [], True
+    members, complete = _members(data)
+    records = {}
+    for member in members:
+        for line in member.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                complete = False
+                continue
+            records[record['id']] = record
+    return list(records.values()), complete
+
+
+def read_file(path):
+    """The records in one archive file, deduplicated by id. Damaged or unfinished members are skipped."""
+    return _read(path)[0]
+
+
+def compact(path):
+    """
+    Rewrite `path` as a single gzip member, without duplicates, oldest
+    first. A file with a damaged part is left as it is, so what can't be
+    read isn't thrown away; returns whether the file was compacted.
+    """
+    with _locked(path.parent):
+        records, complete = _read(path)
+        if not complete:
+            logger.warning('Not compacting %s: part of it could not be read.', path)
+            return False
+        records.sort(key=lambda record: (record['timestamp'], record['id']))
+        tmp = path.with_suffix('.tmp')
+        _write(tmp, records, 'wb')
+        os.replace(tmp, path)
+    return True
+
+
+def archive_chunk(before, chunk_size=1000):
+    """
+    Move up to `chunk_size` entries older than `before` to the archive in one
+    short transaction. The files are written and synced before the rows are
+    deleted, so a crash can duplicate entries (readers drop them) but never
+    lose them. Returns the number of entries moved and the files touched.
+    """
+    with transaction.atomic():
+        # Oldest ids first: the primary key index finds them without a scan.
+        entries = list(ActivityLog.objects.filter(timestamp__lt=before).order_by('id')[:chunk_size])
+        if not entries:
+            return 0, set()
+        groups = defaultdict(list)
+        for entry in entries:
+            groups[entry.user_id, _month(entry.timestamp)].append(_record(entry))
+        # In a fixed order, so concurrent runs can't wait on each other's locks.
+        for (user_id, month), records in sorted(groups.items()):
+            with _locked(user_dir(user_id)):
+                _write(_path(user_id, month), records, 'ab')
+        ActivityLog.objects.filter(id__in=[entry.id for entry in entries]).delete()
+        caching.bump_version(*{user_id for user_id, _ in groups})
+    return len(entries), {_path(user_id, month) for user_id, month in groups}
+
+
+def archive_activity(retention=None, chunk_size=1000):
+    """
+    Archive every entry past the retention period, chunk by chunk, then
+    compact the files touched. Returns the number of entries moved.
+    """
+    retention = retention if retention is not None else timedelta(days=settings.ACTIVITY_RETENTION_DAYS)
+    before = timezone.now() - retention
+    total, touched = 0, set()
+    while True:
+        moved, paths = archive_chunk(before, chunk_size)
+        total += moved
+        touched |= paths
+        if moved < chunk_size:
+            break
+    for path in touched:
+        compact(path)
+    return total
+
+
+def archived_entries(user_id, before=None):
+    """
+    The user's archived entries as (timestamp, id, record), newest first,
+    strictly before the (timestamp, id) position `before`. Files are opened
+    one month at a time, only as far as the caller reads.
+    """
+    directory = user_dir(user_id)
+    if not directory.is_dir():
+        return
+    months = sorted((path.name[:-len('.ndjson.gz')] for path in directory.glob('*.ndjson.gz')), reverse=True)
+    for month in months:
+        if before is not None and month > _month(before[0]):
+            continue
+        keyed = []
+        for record in read_file(_path(user_id, month)):
+            key = (datetime.fromisoformat(record['timestamp']), record['id'])
+            if before is None or key < before:
+                keyed.append((*key, record))
+        yield from sorted(keyed, key=lambda item: item[:2], reverse=True)
+
+
+def delete_user_archive(user_id):
+    shutil.rmtree(user_dir(user_id), ignore_errors=True)
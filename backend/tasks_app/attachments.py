@@ -0,0 +1,243 @@
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import caching
+from .models import AttachmentBlob, StorageUsage, TaskAttachment, UploadSession
+
+
+# Uploads arrive as chunks appended at the offset received so far. Each
+# session's bytes go to <ATTACHMENT_UPLOAD_DIR>/<session id>.part and are
+# hashed as they are written; the finished file becomes the blob for its
+# SHA-256 (attachments/sha256/ab/cd/<sha256>), or is dropped if that blob is
+# already stored.
+
+READ_SIZE = 64 * 1024
+BLOB_DIR = 'attachments/sha256'
+# Hashers of uploads in progress, by session id. A chunk handled by another
+# process (or after a restart) rebuilds the hash from the partial file.
+HASHER_CACHE_SIZE = 256
+
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadConflict(UploadError):
+    """The chunk isn't the next one: `received` is where the upload stands."""
+
+    def __init__(self, message, received):
+        super().__init__(message)
+        self.received = received
+
+
+class _PartialFile(File):
+    # Lets FileSystemStorage move the finished upload into place instead of copying it.
+    def __init__(self, file, path):
+        super().__init__(file)
+        self.path = path
+
+    def temporary_file_path(self):
+        return str(self.path)
+
+
+def blob_name(digest):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def partial_path(session_id):
+    return Path(settings.ATTACHMENT_UPLOAD_DIR) / f'{session_id}.part'
+
+
+def usage(user_id):
+    return StorageUsage.objects.filter(user_id=user_id).values_list('bytes_used', flat=True).first() or 0
+
+
+def _charge(user_id, size):
+    StorageUsage.objects.get_or_create(user_id=user_id)
+    # Checked and added in one statement, so concurrent uploads can't overshoot.
+    charged = StorageUsage.objects.filter(user_id=user_id, bytes_used__lte=settings.ATTACHMENT_QUOTA_BYTES - size).update(
+        bytes_used=F('bytes_used') + size, updated_at=timezone.now(),
+    )
+    if not charged:
+        raise QuotaExceeded()
+
+
+def uncharge(user_id, size):
+    StorageUsage.objects.filter(user_id=user_id).update(bytes_used=F('bytes_used') - size, updated_at=timezone.now())
+
+
+def _take_hasher(session):
+    with _hashers_lock:
+        cached = _hashers.pop(session.pk, None)
+    if cached is not None and cached[0] == session.received:
+        return cached[1]
+    hasher = hashlib.sha256()
+    try:
+        with open(partial_path(session.pk), 'rb') as partial:
+            remaining = session.received
+            while remaining:
+                data = partial.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                hasher.update(data)
+                remaining -= len(data)
+    except FileNotFoundError:
+        remaining = session.received
+    if remaining:
+        raise UploadError('The partial upload is gone; start a new one.')
+    return hasher
+
+
+def _keep_hasher(session_id, received, hasher):
+    with _hashers_lock:
+        _hashers[session_id] = (received, hasher)
+        while len(_hashers) > HASHER_CACHE_SIZE:
+            _hashers.popitem(last=False)
+
+
+def start_upload(user, task, file_name, size):
+    if usage(user.pk) + size > settings.ATTACHMENT_QUOTA_BYTES:
+        raise QuotaExceeded()
+    session = UploadSession.objects.create(user=user, task=task, file_name=file_name, size=size)
+    path = partial_path(session.pk)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return session
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Write `length` bytes read from `stream` at `offset`, which must be where
+    the upload stands. Returns the attachment once the last byte is in,
+    else None. `length` 0 at the end retries completing the upload.
+    """
+    try:
+        partial = open(partial_path(session.pk), 'r+b')
+    except FileNotFoundError:
+        raise UploadError('The partial upload is gone; start a new one.')
+    with partial:
+        try:
+            fcntl.flock(partial, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadConflict('Another chunk of this upload is being written.', session.received)
+        session.refresh_from_db(fields=['received'])
+        if offset != session.received:
+            raise UploadConflict(f'Expected the chunk at offset {session.received}.', session.received)
+        if offset + length > session.size:
+            raise UploadError('The chunk goes past the size of the upload.')
+        hasher = _take_hasher(session)
+        # Anything past `received` is left from a chunk that never finished.
+        partial.truncate(offset)
+        partial.seek(offset)
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                raise UploadError('The chunk ended before Content-Range said it would.')
+            partial.write(data)
+            hasher.update(data)
+            remaining -= len(data)
+        partial.flush()
+        os.fsync(partial.fileno())
+        session.received = offset + length
+        UploadSession.objects.filter(pk=session.pk).update(received=session.received, updated_at=timezone.now())
+        _keep_hasher(session.pk, session.received, hasher)
+    if session.received == session.size:
+        return complete(session)
+    return None
+
+
+def _store(digest, size, path):
+    with open(path, 'rb') as partial:
+        name = default_storage.save(blob_name(digest), _PartialFile(partial, path))
+    try:
+        with transaction.atomic():
+            return AttachmentBlob.objects.create(sha256=digest, size=size, file=name)
+    except IntegrityError:
+        # The same content was stored by another upload meanwhile.
+        default_storage.delete(name)
+        return AttachmentBlob.objects.select_for_update().get(sha256=digest)
+
+
+def complete(session):
+    """Turn a fully received upload into an attachment, storing its content only if it is new."""
+    with transaction.atomic():
+        # Two last chunks (or a retry) racing: only the first one completes.
+        if not UploadSession.objects.select_for_update().filter(pk=session.pk).exists():
+            raise UploadConflict('This upload has already been completed.', session.size)
+        digest = _take_hasher(session).hexdigest()
+        # Attachments are charged here and released by the post_delete signal.
+        _charge(session.user_id, session.size)
+        # Locked so release() can't drop the blob before it is referenced.
+        blob = AttachmentBlob.objects.select_for_update().filter(sha256=digest).first()
+        if blob is None:
+            blob = _store(digest, session.size, partial_path(session.pk))
+        attachment = TaskAttachment.objects.create(
+            task_id=session.task_id, file=blob.file.name, blob=blob, size=session.size, file_name=session.file_name,
+        )
+        session.delete()
+    return attachment
+
+
+def discard_partial(session_id):
+    with _hashers_lock:
+        _hashers.pop(session_id, None)
+    partial_path(session_id).unlink(missing_ok=True)
+
+
+def release(blob_id):
+    """Delete the blob and its file if no attachment uses it anymore."""
+    with transaction.atomic():
+        blob = AttachmentBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None or blob.attachments.exists():
+            return
+        name = blob.file.name
+        blob.delete()
+        transaction.on_commit(lambda: default_storage.delete(name))
+
+
+def purge_stale_uploads(max_age):
+    """Drop uploads not written to for `max_age`, with their partial files. Returns how many."""
+    count, _ = UploadSession.objects.filter(updated_at__lt=timezone.now() - max_age).delete()
+    return count
+
+
+def reconcile(user_ids=None, batch_size=1000):
+    """Recompute every StorageUsage counter from the attachments."""
+    attachments = TaskAttachment.objects.all()
+    if user_ids is not None:
+        attachments = attachments.filter(task__user_id__in=user_ids)
+    totals = dict(attachments.order_by().values_list('task__user_id').annotate(n=Sum('size')))
+
+    with transaction.atomic():
+        stale = StorageUsage.objects.exclude(user_id__in=list(totals))
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        caching.bump_version(*totals, *stale.values_list('user_id', flat=True))
+        stale.update(bytes_used=0, updated_at=timezone.now())
+        StorageUsage.objects.bulk_create(
+            [StorageUsage(user_id=user_id, bytes_used=total) for user_id, total in totals.items()],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['bytes_used', 'updated_at'],
+        )
+    return len(totals)
@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import TokenRevocation
+
+
+# Saves and deletes invalidate the entry right away; the timeout bounds how
+# long a process with its own (non-shared) cache can miss that.
+CACHE_TIMEOUT = 60
+
+# Everything but the password hash, which is loaded on access if needed.
+USER_FIELDS = [field.attname for field in User._meta.concrete_fields if field.name != 'password']
+
+
+def _cache_key(user_id):
+    return f'tasks_app:auth-user:{user_id}'
+
+
+def invalidate(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def load_state(user_id):
+    """The user's fields and token checks, from the cache or one query. None if the user is gone."""
+    key = _cache_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = (
+            User.objects.filter(pk=user_id)
+            .values(*USER_FIELDS, 'password', 'token_revocation__revoked_before')
+            .first()
+        )
+        if row is None:
+            return None
+        revoked_before = row.pop('token_revocation__revoked_before')
+        state = {
+            'password_hash': get_md5_hash_password(row.pop('password')),
+            'revoked_before': revoked_before.timestamp() if revoked_before else None,
+            'fields': row,
+        }
+        cache.set(key, state, CACHE_TIMEOUT)
+    return state
+
+
+def check_token(token, state):
+    """Reject `token` if its user is gone or inactive, or it was revoked."""
+    if state is None:
+        raise AuthenticationFailed('User not found', code='user_not_found')
+    if not state['fields']['is_active']:
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+    if api_settings.CHECK_REVOKE_TOKEN and token.get(api_settings.REVOKE_TOKEN_CLAIM) != state['password_hash']:
+        raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+    # Access tokens carry the iat of the refresh token they came from. iat
+    # is whole seconds, so tokens issued in the second of revocation go too.
+    if state['revoked_before'] is not None and token.get('iat', 0) < state['revoked_before']:
+        raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+
+
+def revoke_tokens(user):
+    """Log `user` out everywhere: every token issued until now stops working."""
+    TokenRevocation.objects.update_or_create(user=user, defaults={'revoked_before': timezone.now()})
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user from a short-lived cache entry
+    instead of loading the User row on every request. The entry holds what
+    the checks need (is_active, password hash, revocation time) and is
+    dropped whenever the user or their revocation changes.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        state = load_state(user_id)
+        check_token(validated_token, state)
+        fields = state['fields']
+        return User.from_db(User.objects.db, list(fields), list(fields.values()))
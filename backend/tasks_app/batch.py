@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .filters import annotate_rollups
+from .models import Task, TaskLabel
+from .serializers import TaskSerializer
+
+
+MAX_OPERATIONS = 500
+OPERATIONS = ('create', 'update', 'delete', 'complete', 'pending')
+
+
+class BatchError(Exception):
+    def __init__(self, results):
+        super().__init__('Batch validation failed')
+        self.results = results
+
+
+def _validate(user, operations, context):
+    """
+    Check every operation before anything is written. Returns the planned
+    (index, op, task) triples or raises BatchError with per-item results.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BatchError([{'index': None, 'status': 'error', 'errors': {'operations': 'Expected a non-empty list.'}}])
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError([{'index': None, 'status': 'error', 'errors': {'operations': f'At most {MAX_OPERATIONS} operations per batch.'}}])
+
+    ids = [op.get('id') for op in operations if isinstance(op, dict) and op.get('op') != 'create']
+    tasks = annotate_rollups(Task.objects.filter(user=user, id__in=[pk for pk in ids if isinstance(pk, int)])).prefetch_related('labels__label')
+    tasks = {task.id: task for task in tasks}
+
+    plan, results, seen, failed = [], [], set(), False
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        errors = None
+        task = None
+        if kind not in OPERATIONS:
+            errors = {'op': f"Expected one of: {', '.join(OPERATIONS)}."}
+        elif kind == 'create':
+            serializer = TaskSerializer(data=op.get('data') or {}, context=context)
+            if serializer.is_valid():
+                task = Task(user=user, **serializer.validated_data)
+            else:
+                errors = serializer.errors
+        else:
+            pk = op.get('id')
+            task = tasks.get(pk) if isinstance(pk, int) else None
+            if task is None:
+                errors = {'id': 'Not found.'}
+            elif task.id in seen:
+                errors = {'id': 'A task may appear only once per batch.'}
+            else:
+                seen.add(task.id)
+                if kind == 'update':
+                    serializer = TaskSerializer(task, data=op.get('data') or {}, partial=True, context=context)
+                    if serializer.is_valid():
+                        for attr, value in serializer.validated_data.items():
+                            setattr(task, attr, value)
+                    else:
+                        errors = serializer.errors
+                elif kind in ('complete', 'pending'):
+                    task.status = 'completed' if kind == 'complete' else 'pending'
+
+        failed = failed or errors is not None
+        results.append({'index': index, 'status': 'error', 'errors': errors} if errors else {'index': index, 'status': 'valid'})
+        plan.append((index, kind, task))
+
+    if failed:
+        raise BatchError(results)
+    return plan
+
+
+def apply_batch(user, operations, context):
+    """
+    Apply create/update/delete/complete/pending operations on the user's
+    tasks in one transaction: one bulk INSERT, one bulk UPDATE and one
+    DELETE. post_save is dispatched for the bulk-written rows so the
+    signal-maintained data (rollups, counters, ...) stays in step.
+    """
+    plan = _validate(user, operations, context)
+    created = [task for _, kind, task in plan if kind == 'create']
+    updated = [task for _, kind, task in plan if kind in ('update', 'complete', 'pending')]
+    deleted = [task.id for _, kind, task in plan if kind == 'delete']
+
+    now = timezone.now()
+    for task in created + updated:
+        task.sync_completed_at()
+        task.sync_recurrence_pending()
+        # bulk_update() does not touch auto_now fields.
+        task.updated_at = now
+
+    with transaction.atomic():
+        Task.objects.bulk_create(created)
+        if updated:
+            Task.objects.bulk_update(updated, [
+                'title', 'description', 'status', 'priority', 'deadline', 'category',
+                'recurrence', 'recurrence_pending', 'completed_at', 'updated_at',
+            ])
+        if deleted:
+            Task.objects.filter(user=user, id__in=deleted).delete()
+        for _, kind, task in plan:
+            if kind != 'delete':
+                post_save.send(
+                    sender=Task, instance=task, created=kind == 'create',
+                    update_fields=None, raw=False, using=Task.objects.db,
+                )
+
+    for task in created:
+        # New tasks have no labels; spare the serializer a query each.
+        task._prefetched_objects_cache = {'labels': TaskLabel.objects.none()}
+
+    results = []
+    for index, kind, task in plan:
+        if kind == 'delete':
+            results.append({'index': index, 'status': 'deleted', 'id': task.id})
+        else:
+            results.append({
+                'index': index,
+                'status': 'created' if kind == 'create' else 'updated',
+                'task': TaskSerializer(task, context=context).data,
+            })
+    return results
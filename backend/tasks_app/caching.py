@@ -0,0 +1,171 @@
+import hashlib
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+# Entries are only ever superseded by a version bump; the timeout just
+# bounds how long unreachable ones linger in the cache.
+RESPONSE_TIMEOUT = 60 * 60
+# Backends whose contents other processes never see.
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs=None, **kwargs):
+    # A bump made by a management command would never reach the web workers.
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_BACKENDS:
+        return [checks.Warning(
+            'The default cache is local to each process, so data version bumps '
+            'from other processes are lost and stale responses keep being served.',
+            hint='Point CACHE_BACKEND at a shared backend (file-based, database, Redis or Memcached).',
+            id='tasks_app.W001',
+        )]
+    return []
+
+
+def _version_key(user_id):
+    return f'tasks_app:data-version:{user_id}'
+
+
+def _new_version():
+    # "<ms since epoch>-<random>": unique, and dates the write for Last-Modified.
+    return f'{time.time_ns() // 1_000_000}-{uuid.uuid4().hex[:12]}'
+
+
+def data_version(user_id):
+    """A token that changes whenever any of the user's data is written."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, None):
+            # Another request set it first.
+            version = cache.get(key) or version
+    return version
+
+
+def version_time(version):
+    return datetime.fromtimestamp(int(version.split('-', 1)[0]) / 1000, tz=dt_timezone.utc)
+
+
+def _set_versions(user_ids):
+    cache.set_many({_version_key(user_id): _new_version() for user_id in user_ids}, None)
+
+
+def bump_version(*user_ids):
+    """Invalidate every cached response and ETag of `user_ids`."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    _set_versions(user_ids)
+    if connection.in_atomic_block:
+        # Until the write commits, readers still see the old rows and may
+        # cache them under the new version; move past it once it is visible.
+        transaction.on_commit(lambda: _set_versions(user_ids))
+
+
+def response_key(request):
+    user_id = request.user.pk
+    query = '&'.join(f'{name}={value}' for name, values in sorted(request.query_params.lists()) for value in values)
+    digest = hashlib.sha1(f'{request.path}?{query}'.encode()).hexdigest()
+    # The date is part of the key: buckets and streaks roll over at midnight.
+    return f'tasks_app:response:{user_id}:{data_version(user_id)}:{timezone.now().date()}:{digest}'
+
+
+def cache_per_user(view_method):
+    """
+    Serve a GET handler from the cache until the user's data version moves.
+    The key is taken before the handler runs, so a write that lands while it
+    is reading can only leave the entry under a version nobody asks for.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return view_method(self, request, *args, **kwargs)
+        key = response_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, RESPONSE_TIMEOUT)
+        return response
+    return wrapper
+
+
+class CachedListMixin:
+    """Per-user response caching for a viewset's list()."""
+
+    @cache_per_user
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class NotModified(Exception):
+    pass
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETag and Last-Modified on GET/HEAD responses, derived from the
+    user's data version, so checking them costs a cache lookup. A matching
+    If-None-Match (or, without one, an If-Modified-Since no older than the
+    last write) is answered with 304 before the handler runs.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = None
+        if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+            return
+        version = data_version(request.user.pk)
+        today = timezone.now().date()
+        digest = hashlib.sha1('|'.join([
+            version,
+            # Buckets and streaks roll over at midnight.
+            str(today),
+            request.build_absolute_uri(),
+            request.accepted_media_type or '',
+        ]).encode()).hexdigest()
+        self.validators = (quote_etag(digest), version_time(version))
+
+        etag, last_modified = self.validators
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            if etag in parse_etags(if_none_match) or if_none_match.strip() == '*':
+                raise NotModified()
+            return
+        # Second resolution only; clients that need exactness send If-None-Match.
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+        if since is not None and int(last_modified.timestamp()) <= since and datetime.fromtimestamp(since, tz=dt_timezone.utc).date() == today:
+            raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, 'validators', None)
+        if validators and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            etag, last_modified = validators
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+            # Revalidate every time; the ETag makes that cheap.
+            response['Cache-Control'] = 'private, no-cache'
+        return response
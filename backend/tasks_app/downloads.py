@@ -0,0 +1,137 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+
+# Attachment downloads. By default the file goes out as a FileResponse,
+# which WSGI servers with wsgi.file_wrapper (gunicorn) send with sendfile().
+# With ATTACHMENT_SENDFILE set, the web server in front is told which file
+# to send instead, and handles Range requests itself.
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class Unsatisfiable(Exception):
+    pass
+
+
+class RangeFile:
+    """
+    The `length` bytes of `file` from its current position. Has no tell() or
+    seek(), so FileResponse leaves Content-Length to the caller; fileno()
+    lets sendfile() start at the position and stop at Content-Length.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def byte_range(header, size):
+    """
+    (first, last) for a single-range Range header, or None to send the
+    whole file (no header, several ranges, or one that doesn't parse).
+    """
+    match = RANGE.match(header.strip())
+    if match is None or match[1] == match[2] == '':
+        return None
+    if match[1] == '':
+        # bytes=-n: the last n bytes.
+        length = int(match[2])
+        if length == 0 or size == 0:
+            raise Unsatisfiable()
+        return max(size - length, 0), size - 1
+    first = int(match[1])
+    last = int(match[2]) if match[2] else size - 1
+    if match[2] and last < first:
+        return None
+    if first >= size:
+        raise Unsatisfiable()
+    return first, min(last, size - 1)
+
+
+def _if_range_matches(value, etag, last_modified):
+    if value.startswith(('"', 'W/')):
+        # If-Range only ever matches a strong validator.
+        return not etag.startswith('W/') and value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def _handoff(name, path):
+    if settings.ATTACHMENT_SENDFILE == 'x-accel-redirect':
+        return 'X-Accel-Redirect', settings.ATTACHMENT_ACCEL_PREFIX + quote(name)
+    return 'X-Sendfile', path
+
+
+def serve(request, attachment):
+    """
+    Send an attachment ({'file', 'file_name', 'uploaded_at', 'blob__sha256'})
+    honouring If-None-Match/If-Modified-Since, Range and If-Range. Uploaded
+    files get a strong ETag from their content hash; older ones a weak ETag
+    from size and mtime, which never satisfies If-Range.
+    """
+    path = default_storage.path(attachment['file'])
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('The file of this attachment is missing.')
+    size = stat.st_size
+    digest = attachment['blob__sha256']
+    etag = f'"{digest}"' if digest else f'W/"{size:x}-{int(stat.st_mtime):x}"'
+    last_modified = int(attachment['uploaded_at'].timestamp())
+    file_name = attachment['file_name'] or os.path.basename(attachment['file'])
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': 'private, no-cache',
+        'Accept-Ranges': 'bytes',
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None and settings.ATTACHMENT_SENDFILE:
+        response = HttpResponse(content_type=mimetypes.guess_type(file_name)[0] or 'application/octet-stream')
+        response['Content-Disposition'] = content_disposition_header(True, file_name)
+        header, value = _handoff(attachment['file'], path)
+        response[header] = value
+    elif response is None:
+        requested = request.headers.get('Range', '')
+        if_range = request.headers.get('If-Range')
+        if if_range and not _if_range_matches(if_range, etag, last_modified):
+            requested = ''
+        try:
+            span = byte_range(requested, size) if requested else None
+        except Unsatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        else:
+            file = open(path, 'rb')
+            if span is None:
+                response = FileResponse(file, as_attachment=True, filename=file_name)
+            else:
+                first, last = span
+                file.seek(first)
+                response = FileResponse(RangeFile(file, last - first + 1), status=206, as_attachment=True, filename=file_name)
+                response['Content-Length'] = last - first + 1
+                response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -0,0 +1,126 @@
+import csv
+import json
+import zlib
+from datetime import date, datetime
+
+from django.db.models import F, Prefetch
+
+from .models import Label, Task, TaskLabel, Subtask, TaskNote, TaskComment, TimeLog, StudySession
+
+
+FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 2000
+# Output is handed to the server in pieces of about this many bytes.
+WRITE_SIZE = 64 * 1024
+
+# Record type -> exported fields, in export order. Child records carry
+# task_id; tasks list their labels by name.
+RECORDS = {
+    'label': ['id', 'name', 'color', 'created_at'],
+    'task': [
+        'id', 'title', 'description', 'status', 'priority', 'deadline', 'category', 'recurrence',
+        'parent_task_id', 'order', 'completed_at', 'created_at', 'updated_at', 'labels',
+    ],
+    'subtask': ['id', 'task_id', 'title', 'status', 'order', 'created_at'],
+    'note': ['id', 'task_id', 'content', 'created_at', 'updated_at'],
+    'comment': ['id', 'task_id', 'author', 'content', 'created_at'],
+    'time_log': ['id', 'task_id', 'duration_minutes', 'estimated_minutes', 'logged_date', 'notes', 'created_at'],
+    'study_session': ['id', 'task_id', 'duration_minutes', 'break_minutes', 'started_at', 'ended_at', 'notes', 'created_at'],
+}
+CSV_COLUMNS = ['type'] + list(dict.fromkeys(field for fields in RECORDS.values() for field in fields))
+
+
+def _values(queryset, fields):
+    return queryset.order_by('id').values(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _tasks(user):
+    labels = Prefetch('labels', queryset=TaskLabel.objects.annotate(name=F('label__name')).only('task_id').order_by('id'))
+    tasks = Task.objects.filter(user=user).order_by('id').prefetch_related(labels)
+    fields = [field for field in RECORDS['task'] if field != 'labels']
+    # Prefetches run once per chunk, not once for the whole account.
+    for task in tasks.iterator(chunk_size=CHUNK_SIZE):
+        row = {field: getattr(task, field) for field in fields}
+        row['labels'] = [task_label.name for task_label in task.labels.all()]
+        yield row
+
+
+def records(user):
+    """(type, row) for everything in the user's workspace, one chunk of rows in memory at a time."""
+    sources = [
+        ('label', _values(Label.objects.filter(user=user), RECORDS['label'])),
+        ('task', _tasks(user)),
+        ('subtask', _values(Subtask.objects.filter(task__user=user), RECORDS['subtask'])),
+        ('note', _values(TaskNote.objects.filter(task__user=user), RECORDS['note'])),
+        ('comment', _values(TaskComment.objects.filter(task__user=user).annotate(author=F('user__username')), RECORDS['comment'])),
+        ('time_log', _values(TimeLog.objects.filter(task__user=user), RECORDS['time_log'])),
+        ('study_session', _values(StudySession.objects.filter(user=user), RECORDS['study_session'])),
+    ]
+    # Querysets are lazy: each one runs only once the previous is drained.
+    for kind, rows in sources:
+        for row in rows:
+            yield kind, row
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def ndjson_lines(user):
+    for kind, row in records(user):
+        yield json.dumps({'type': kind, **row}, default=_json_default, ensure_ascii=False) + '\n'
+
+
+class _Line:
+    """A csv.writer target that hands back each written line."""
+
+    def write(self, line):
+        return line
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(user):
+    writer = csv.writer(_Line())
+    yield writer.writerow(CSV_COLUMNS)
+    for kind, row in records(user):
+        yield writer.writerow([kind] + [_csv_value(row.get(column)) for column in CSV_COLUMNS[1:]])
+
+
+def encoded(lines, size=WRITE_SIZE):
+    """Join `lines` into UTF-8 pieces of about `size` bytes."""
+    pending, length = [], 0
+    for line in lines:
+        data = line.encode()
+        pending.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(pending)
+            pending, length = [], 0
+    if pending:
+        yield b''.join(pending)
+
+
+def gzipped(pieces):
+    """Gzip a stream of bytes on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for piece in pieces:
+        data = compressor.compress(piece)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(user, output_format, gzip=False):
+    """The export as bytes, produced while it is sent."""
+    lines = ndjson_lines(user) if output_format == 'ndjson' else csv_lines(user)
+    pieces = encoded(lines)
+    return gzipped(pieces) if gzip else pieces
@@ -0,0 +1,213 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import (
+    Case, CharField, Count, DateTimeField, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Task, TaskLabel, Subtask, TimeLog
+
+
+BUCKETS = ['overdue', 'today', 'upcoming', 'completed']
+
+# Sort key -> keyset ordering used by TaskPagination. Every ordering ends
+# with the primary key so the cursor position is unique.
+TASK_ORDERINGS = {
+    'order': ('order', '-created_at', 'id'),
+    'created_at': ('created_at', 'id'),
+    '-created_at': ('-created_at', '-id'),
+    'updated_at': ('updated_at', 'id'),
+    '-updated_at': ('-updated_at', '-id'),
+    'deadline': ('deadline_key', 'id'),
+    '-deadline': ('-deadline_key', '-id'),
+    'priority': ('-priority_rank', 'order', '-created_at', 'id'),
+    '-priority': ('priority_rank', 'order', '-created_at', 'id'),
+    'bucket': ('bucket_rank', 'order', '-created_at', 'id'),
+    'progress': ('progress_key', 'order', '-created_at', 'id'),
+    '-progress': ('-progress_key', 'order', '-created_at', 'id'),
+    'overrun': ('overrun_key', 'order', '-created_at', 'id'),
+    '-overrun': ('-overrun_key', 'order', '-created_at', 'id'),
+}
+DEFAULT_TASK_ORDERING = 'order'
+
+# Tasks without a deadline sort after every dated task.
+NO_DEADLINE = datetime(9999, 12, 31, tzinfo=dt_timezone.utc)
+
+
+def _day_bounds():
+    today = timezone.now().astimezone(dt_timezone.utc).date()
+    start = datetime.combine(today, time.min, tzinfo=dt_timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def annotate_bucket(queryset):
+    """Database equivalent of Task.status_label, exposed as `bucket`."""
+    today_start, tomorrow_start = _day_bounds()
+    return queryset.annotate(bucket=Case(
+        When(status='completed', then=Value('completed')),
+        When(deadline__lt=today_start, then=Value('overdue')),
+        When(deadline__lt=tomorrow_start, then=Value('today')),
+        default=Value('upcoming'),
+        output_field=CharField(),
+    ))
+
+
+def _child_total(model, aggregate, **filters):
+    # A correlated subquery per total rather than a join, so subtasks and
+    # time logs don't multiply each other's rows.
+    rows = model.objects.filter(task=OuterRef('pk'), **filters).order_by().values('task')
+    return Coalesce(Subquery(rows.annotate(total=aggregate).values('total')), Value(0), output_field=IntegerField())
+
+
+def annotate_rollups(queryset):
+    """Subtask counts and time-log totals per task, computed in the list query."""
+    return queryset.annotate(
+        subtask_count=_child_total(Subtask, Count('id')),
+        subtasks_completed=_child_total(Subtask, Count('id'), status='completed'),
+        spent_minutes=_child_total(TimeLog, Sum('duration_minutes')),
+        estimated_minutes=_child_total(TimeLog, Sum('estimated_minutes')),
+    )
+
+
+def _progress():
+    # Share of subtasks completed; tasks without subtasks sort as -1.
+    return Coalesce(
+        Cast('subtasks_completed', FloatField()) / NullIf(Cast('subtask_count', FloatField()), Value(0.0)),
+        Value(-1.0),
+        output_field=FloatField(),
+    )
+
+
+def _overrun():
+    # Minutes spent beyond the estimate (negative while under it); 0 without an estimate.
+    return Case(
+        When(estimated_minutes__gt=0, then=F('spent_minutes') - F('estimated_minutes')),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+ORDERING_ANNOTATIONS = {
+    'deadline_key': lambda: Coalesce('deadline', Value(NO_DEADLINE), output_field=DateTimeField()),
+    'priority_rank': lambda: Case(
+        When(priority='high', then=Value(2)),
+        When(priority='medium', then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    ),
+    'bucket_rank': lambda: Case(
+        *[When(bucket=name, then=Value(rank)) for rank, name in enumerate(BUCKETS)],
+        output_field=IntegerField(),
+    ),
+    'progress_key': _progress,
+    'overrun_key': _overrun,
+}
+
+
+def get_task_ordering(params):
+    return TASK_ORDERINGS.get(params.get('ordering') or DEFAULT_TASK_ORDERING, TASK_ORDERINGS[DEFAULT_TASK_ORDERING])
+
+
+def _choices(params, name, allowed):
+    value = params.get(name)
+    if not value or value == 'all':
+        return None
+    values = value.split(',')
+    invalid = [v for v in values if v not in allowed]
+    if invalid:
+        raise ValidationError({name: f"Invalid value(s): {', '.join(invalid)}."})
+    return values
+
+
+def _deadline_filter(params, name, end=False):
+    """Lookup for an inclusive deadline bound; a bare date covers the whole day."""
+    value = params.get(name)
+    if not value:
+        return {}
+    day = parse_date(value)
+    if day is not None:
+        if end:
+            return {'deadline__lt': datetime.combine(day + timedelta(days=1), time.min, tzinfo=dt_timezone.utc)}
+        return {'deadline__gte': datetime.combine(day, time.min, tzinfo=dt_timezone.utc)}
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: 'Expected an ISO 8601 date or datetime.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return {'deadline__lte' if end else 'deadline__gte': parsed}
+
+
+class TaskFilterBackend(BaseFilterBackend):
+    """
+    Query parameters for the task list:
+
+    priority, category, status, bucket -- comma-separated values
+    label -- comma-separated label ids
+    search -- text contained in the title or description
+    deadline_after, deadline_before -- ISO dates or datetimes (inclusive)
+    progress_min, progress_max -- subtask completion share, 0 to 1 (inclusive)
+    overrun -- true: only tasks with more time logged than estimated
+    ordering -- one of TASK_ORDERINGS
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        priorities = _choices(params, 'priority', dict(Task.PRIORITY_CHOICES))
+        if priorities:
+            queryset = queryset.filter(priority__in=priorities)
+        categories = _choices(params, 'category', dict(Task.CATEGORY_CHOICES))
+        if categories:
+            queryset = queryset.filter(category__in=categories)
+        statuses = _choices(params, 'status', dict(Task.STATUS_CHOICES))
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        buckets = _choices(params, 'bucket', BUCKETS)
+        if buckets:
+            queryset = queryset.filter(bucket__in=buckets)
+
+        labels = params.get('label')
+        if labels:
+            try:
+                label_ids = [int(v) for v in labels.split(',')]
+            except ValueError:
+                raise ValidationError({'label': 'Expected comma-separated label ids.'})
+            # Subquery rather than a join so tasks with several matching
+            # labels are not duplicated.
+            queryset = queryset.filter(id__in=TaskLabel.objects.filter(label_id__in=label_ids).values('task_id'))
+
+        text = params.get('search', '').strip()
+        if text:
+            queryset = queryset.filter(Q(title__icontains=text) | Q(description__icontains=text))
+
+        queryset = queryset.filter(
+            **_deadline_filter(params, 'deadline_after'),
+            **_deadline_filter(params, 'deadline_before', end=True),
+        )
+
+        progress = {}
+        for name, lookup in (('progress_min', 'progress_key__gte'), ('progress_max', 'progress_key__lte')):
+            if params.get(name):
+                try:
+                    progress[lookup] = float(params[name])
+                except ValueError:
+                    raise ValidationError({name: 'Expected a number between 0 and 1.'})
+        if progress:
+            # Tasks without subtasks have no progress to match.
+            queryset = queryset.annotate(progress_key=_progress()).filter(progress_key__gte=0).filter(**progress)
+        if params.get('overrun') in ('1', 'true'):
+            queryset = queryset.annotate(overrun_key=_overrun()).filter(overrun_key__gt=0)
+
+        ordering = params.get('ordering')
+        if ordering and ordering not in TASK_ORDERINGS:
+            raise ValidationError({'ordering': f"Expected one of: {', '.join(TASK_ORDERINGS)}."})
+        annotations = {
+            field.lstrip('-'): ORDERING_ANNOTATIONS[field.lstrip('-')]()
+            for field in get_task_ordering(params)
+            if field.lstrip('-') in ORDERING_ANNOTATIONS and field.lstrip('-') not in queryset.query.annotations
+        }
+        return queryset.annotate(**annotations) if annotations else queryset
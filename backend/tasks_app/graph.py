@@ -0,0 +1,170 @@
+from collections import defaultdict, deque
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+from rest_framework.exceptions import ValidationError
+
+from .models import Task, TaskDependency, TimeLog
+
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(user_id):
+    return f'tasks_app:graph:{user_id}'
+
+
+def invalidate(user_id):
+    key = _cache_key(user_id)
+    cache.delete(key)
+    if connection.in_atomic_block:
+        # A read before the commit would cache the old graph again.
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+def load_edges(user_id):
+    """(dependent, depends_on) id pairs for all of the user's dependencies, in one query."""
+    return list(
+        TaskDependency.objects.filter(dependent_task__user_id=user_id)
+        .order_by('id').values_list('dependent_task_id', 'depends_on_task_id')
+    )
+
+
+def _adjacency(edges):
+    depends_on = defaultdict(list)
+    for dependent, prerequisite in edges:
+        depends_on[dependent].append(prerequisite)
+    return depends_on
+
+
+def find_path(depends_on, start, goal):
+    """A chain of dependencies leading from `start` to `goal`, or None."""
+    previous = {start: None}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        if node == goal:
+            path = []
+            while node is not None:
+                path.append(node)
+                node = previous[node]
+            return path[::-1]
+        for child in depends_on.get(node, ()):
+            if child not in previous:
+                previous[child] = node
+                queue.append(child)
+    return None
+
+
+def check_new_edge(user_id, dependent_id, depends_on_id):
+    """
+    Reject a dependency that already exists or would close a cycle. Call
+    inside the transaction that creates the edge: the user row is locked so
+    two concurrent additions can't each pass the check and form a cycle.
+    """
+    User.objects.select_for_update().filter(pk=user_id).exists()
+    if dependent_id == depends_on_id:
+        raise ValidationError({'depends_on_task': 'A task cannot depend on itself.'})
+    edges = load_edges(user_id)
+    if (dependent_id, depends_on_id) in edges:
+        raise ValidationError({'depends_on_task': 'This dependency already exists.'})
+    # The new edge closes a cycle iff its target already (transitively) depends on its source.
+    path = find_path(_adjacency(edges), depends_on_id, dependent_id)
+    if path:
+        cycle = ' -> '.join(str(pk) for pk in path + [depends_on_id])
+        raise ValidationError({'depends_on_task': f'This dependency would create a cycle: {cycle}.'})
+
+
+def _estimates(task_ids):
+    """Minutes of work per task: its logged estimates (summed like the task list does), else the time logged so far."""
+    rows = (
+        TimeLog.objects.filter(task_id__in=task_ids).order_by().values('task_id')
+        .annotate(estimated=Sum('estimated_minutes'), logged=Sum('duration_minutes'))
+    )
+    return {row['task_id']: row['estimated'] or row['logged'] or 0 for row in rows}
+
+
+def _topological_order(node_ids, depends_on):
+    """Kahn's algorithm, prerequisites first, ties by id. Nodes on cycles are left out."""
+    dependents = defaultdict(list)
+    remaining = {node: 0 for node in node_ids}
+    for dependent, prerequisites in depends_on.items():
+        for prerequisite in prerequisites:
+            dependents[prerequisite].append(dependent)
+            remaining[dependent] += 1
+    ready = sorted(node for node, count in remaining.items() if count == 0)
+    order = []
+    while ready:
+        node = ready.pop(0)
+        order.append(node)
+        for dependent in sorted(dependents[node]):
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+        ready.sort()
+    return order
+
+
+def _critical_path(order, depends_on, weights):
+    """The heaviest chain of dependencies, by remaining minutes."""
+    total, previous = {}, {}
+    for node in order:
+        best = max((pk for pk in depends_on.get(node, ()) if pk in total), key=total.get, default=None)
+        previous[node] = best
+        total[node] = weights[node] + (total[best] if best is not None else 0)
+    if not total:
+        return {'tasks': [], 'minutes': 0}
+    node = max(order, key=lambda pk: total[pk])
+    minutes, path = total[node], []
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    return {'tasks': path[::-1], 'minutes': minutes}
+
+
+def build_graph(user_id):
+    """The user's dependency graph: tasks with edges, blocked state, order and critical path."""
+    edges = load_edges(user_id)
+    tasks = {
+        task['id']: task
+        for task in Task.objects.filter(user_id=user_id, id__in={pk for edge in edges for pk in edge}).values('id', 'title', 'status', 'deadline')
+    }
+    # Edges to other users' tasks were never valid; leave them out.
+    edges = [edge for edge in edges if edge[0] in tasks and edge[1] in tasks]
+    depends_on = _adjacency(edges)
+    estimates = _estimates(list(tasks))
+    pending = {pk for pk, task in tasks.items() if task['status'] != 'completed'}
+    # Completed work no longer holds anything up.
+    weights = {pk: estimates.get(pk, 0) if pk in pending else 0 for pk in tasks}
+
+    order = _topological_order(tasks, depends_on)
+    nodes = []
+    for pk in sorted(tasks):
+        task = tasks[pk]
+        blocked_by = [prerequisite for prerequisite in depends_on.get(pk, ()) if prerequisite in pending]
+        nodes.append({
+            **task,
+            'blocked': pk in pending and bool(blocked_by),
+            'blocked_by': blocked_by,
+            'estimate_minutes': estimates.get(pk, 0),
+        })
+    return {
+        'nodes': nodes,
+        'edges': [{'task': dependent, 'depends_on': prerequisite} for dependent, prerequisite in edges],
+        'order': order,
+        'critical_path': _critical_path(order, depends_on, weights),
+        # Only possible for edges created before cycles were rejected.
+        'cyclic': sorted(set(tasks) - set(order)),
+    }
+
+
+def get_graph(user_id):
+    """build_graph(), cached until a dependency, task status or time log changes."""
+    key = _cache_key(user_id)
+    graph = cache.get(key)
+    if graph is None:
+        graph = build_graph(user_id)
+        cache.set(key, graph, CACHE_TIMEOUT)
+    return graph
@@ -0,0 +1,307 @@
+import codecs
+import csv
+import gzip
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from . import caching, productivity, rollups, search
+from .models import Label, Task, TaskLabel, Subtask, TaskNote, TaskComment, TimeLog, StudySession
+from .serializers import (
+    LabelSerializer, TaskSerializer, SubtaskSerializer, TaskNoteSerializer,
+    TaskCommentSerializer, TimeLogSerializer, StudySessionSerializer,
+)
+
+
+# The record types of export.py, in the order they depend on each other.
+TYPES = ('label', 'task', 'subtask', 'note', 'comment', 'time_log', 'study_session')
+MODELS = {
+    'label': Label, 'task': Task, 'subtask': Subtask, 'note': TaskNote,
+    'comment': TaskComment, 'time_log': TimeLog, 'study_session': StudySession,
+}
+SERIALIZERS = {
+    'label': LabelSerializer, 'task': TaskSerializer, 'subtask': SubtaskSerializer, 'note': TaskNoteSerializer,
+    'comment': TaskCommentSerializer, 'time_log': TimeLogSerializer, 'study_session': StudySessionSerializer,
+}
+# Kept from the file although the API treats them as read-only.
+PRESERVED_FIELDS = {
+    'label': ('created_at',),
+    'task': ('order', 'completed_at', 'created_at'),
+    'subtask': ('created_at',),
+    'note': ('created_at',),
+    'comment': ('created_at',),
+    'time_log': ('logged_date', 'created_at'),
+    'study_session': ('created_at',),
+}
+SEARCH_KINDS = {'task': 'task', 'subtask': 'subtask', 'note': 'note', 'comment': 'comment'}
+# Columns that are references or bookkeeping, not serializer input.
+REFERENCE_FIELDS = {'type', 'id', 'task_id', 'task', 'parent_task_id', 'labels', 'author'}
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ('ndjson', 'csv')
+# Raised by a file that can't be read at all (bad gzip, bad UTF-8 in a CSV).
+UNREADABLE = (OSError, EOFError, UnicodeDecodeError, csv.Error)
+
+
+def open_upload(stream):
+    """`stream`, transparently gunzipped if it starts with the gzip magic. Must be seekable."""
+    head = stream.read(2)
+    stream.seek(0)
+    return gunzipped(stream) if head == b'\x1f\x8b' else stream
+
+
+def gunzipped(stream):
+    return gzip.GzipFile(fileobj=stream, mode='rb')
+
+
+def ndjson_rows(stream):
+    """(line number, row or None) for each non-blank line of a binary NDJSON stream."""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _csv_value(column, value):
+    if column == 'labels':
+        value = value.strip()
+        if value.startswith('['):
+            return json.loads(value)
+        return [name.strip() for name in value.split(',') if name.strip()]
+    return value
+
+
+def csv_rows(stream):
+    """(line number, row or None) per CSV record of a binary stream; empty cells are left out."""
+    reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+    for row in reader:
+        try:
+            yield reader.line_num, {column: _csv_value(column, value) for column, value in row.items() if column and value not in ('', None)}
+        except ValueError:
+            yield reader.line_num, None
+
+
+def rows(stream, input_format):
+    return ndjson_rows(stream) if input_format == 'ndjson' else csv_rows(stream)
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = dict.fromkeys(TYPES, 0)
+        self.errors = []
+        self.error_count = 0
+
+    def error(self, line, kind, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'type': kind, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'error_count': self.error_count, 'errors': self.errors}
+
+
+class Importer:
+    """
+    Imports rows of the export format into `user`'s workspace. Rows are
+    queued per type and validated and inserted `chunk_size` at a time,
+    each chunk with bulk_create inside its own savepoint. A chunk that
+    fails in the database is retried row by row, so one bad row costs only
+    itself. Child rows refer to tasks by the task id used in the file.
+    """
+
+    def __init__(self, user, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.report = ImportReport()
+        self.task_ids = {}  # task id in the file -> imported task id
+        self.label_ids = {}  # label name -> id
+        self.pending = {kind: [] for kind in TYPES}
+
+    def add(self, line, row):
+        kind = row.get('type') if row is not None else None
+        if row is None:
+            self.report.error(line, None, {'non_field_errors': ['Malformed row.']})
+        elif kind not in TYPES:
+            self.report.error(line, kind, {'type': [f"Expected one of: {', '.join(TYPES)}."]})
+        else:
+            self.pending[kind].append((line, row))
+            if len(self.pending[kind]) >= self.chunk_size:
+                self.flush(kind)
+
+    def flush(self, kind):
+        # Rows can only point at labels and tasks that are already in.
+        if kind == 'task':
+            self.flush('label')
+        elif kind != 'label':
+            self.flush('task')
+        rows, self.pending[kind] = self.pending[kind], []
+        if rows:
+            self._insert(kind, self._validate(kind, rows))
+
+    def finish(self):
+        for kind in TYPES:
+            self.flush(kind)
+        if any(self.report.created.values()):
+            # Bulk inserts skip the signals that keep these up to date.
+            rollups.rebuild_rollups(user_ids=[self.user.id])
+            productivity.reconcile(user_ids=[self.user.id])
+            caching.bump_version(self.user.id)
+        return self.report
+
+    def _task(self, task_id):
+        # Enough of the task for the FK and the search index, without a query.
+        return Task(id=task_id, user_id=self.user.id)
+
+    def _resolve_labels(self, names):
+        """Ids for `names`, creating the labels the user doesn't have yet."""
+        missing = set(names) - set(self.label_ids)
+        if missing:
+            self.label_ids.update(Label.objects.filter(user=self.user, name__in=missing).values_list('name', 'id'))
+            new = [Label(user=self.user, name=name) for name in sorted(missing - set(self.label_ids))]
+            if new:
+                Label.objects.bulk_create(new, ignore_conflicts=True)
+                self.label_ids.update(Label.objects.filter(user=self.user, name__in=missing).values_list('name', 'id'))
+
+    def _validate(self, kind, rows):
+        """(line, instance, extra) for the valid rows; errors for the rest."""
+        if kind == 'label':
+            names = {row.get('name') for _, row in rows if isinstance(row.get('name'), str)}
+            self.label_ids.update(Label.objects.filter(user=self.user, name__in=names).values_list('name', 'id'))
+        elif kind == 'task':
+            names = [name for _, row in rows if isinstance(row.get('labels'), list) for name in row['labels'] if isinstance(name, str) and name]
+            self._resolve_labels(names)
+
+        items, seen_labels = [], set()
+        for line, row in rows:
+            data = {name: value for name, value in row.items() if name not in REFERENCE_FIELDS}
+            serializer = SERIALIZERS[kind](data=data)
+            if not serializer.is_valid():
+                self.report.error(line, kind, serializer.errors)
+                continue
+            instance = MODELS[kind](**serializer.validated_data)
+            extra = {'preserved': {}}
+            try:
+                for name in PRESERVED_FIELDS[kind]:
+                    if row.get(name) not in (None, ''):
+                        value = MODELS[kind]._meta.get_field(name).to_python(row[name])
+                        if hasattr(value, 'tzinfo') and timezone.is_naive(value):
+                            value = timezone.make_aware(value)
+                        setattr(instance, name, value)
+                        extra['preserved'][name] = value
+            except DjangoValidationError as exc:
+                self.report.error(line, kind, {name: exc.messages})
+                continue
+
+            if kind == 'label':
+                if instance.name in self.label_ids or instance.name in seen_labels:
+                    continue  # Already there: tasks will use the existing label.
+                seen_labels.add(instance.name)
+                instance.user = self.user
+            elif kind == 'task':
+                instance.user = self.user
+                instance.sync_completed_at()
+                instance.sync_recurrence_pending()
+                labels = row.get('labels') or []
+                if not isinstance(labels, list):
+                    self.report.error(line, kind, {'labels': ['Expected a list of label names.']})
+                    continue
+                extra = {
+                    **extra,
+                    'id': _int(row.get('id')),
+                    'parent': _int(row.get('parent_task_id')),
+                    'labels': list(dict.fromkeys(name for name in labels if name in self.label_ids)),
+                }
+                instance.parent_task_id = self.task_ids.get(extra['parent'])
+            else:
+                task_id = self.task_ids.get(_int(row.get('task_id')))
+                if task_id is None and (kind != 'study_session' or row.get('task_id') not in (None, '')):
+                    self.report.error(line, kind, {'task_id': ['No task with this id earlier in the file.']})
+                    continue
+                if task_id is not None:
+                    instance.task = self._task(task_id)
+                if kind in ('comment', 'study_session'):
+                    instance.user = self.user
+            items.append((line, instance, extra))
+        return items
+
+    def _insert(self, kind, items):
+        try:
+            with transaction.atomic():
+                self._write(kind, items)
+        except DatabaseError:
+            # Find the offending rows; the rest of the chunk still goes in.
+            written = []
+            for item in items:
+                try:
+                    with transaction.atomic():
+                        self._write(kind, [item])
+                except DatabaseError as exc:
+                    self.report.error(item[0], kind, {'non_field_errors': [str(exc)]})
+                else:
+                    written.append(item)
+            items = written
+        self.report.created[kind] += len(items)
+        for _, instance, extra in items:
+            if kind == 'label':
+                self.label_ids[instance.name] = instance.id
+            elif kind == 'task' and extra['id'] is not None:
+                self.task_ids[extra['id']] = instance.id
+
+    def _write(self, kind, items):
+        instances = [instance for _, instance, _ in items]
+        for instance in instances:
+            # Left over from an attempt that was rolled back.
+            instance.pk = None
+            instance._state.adding = True
+        MODELS[kind].objects.bulk_create(instances)
+        # bulk_create stamps auto_now_add fields with the current time.
+        for name in PRESERVED_FIELDS[kind]:
+            if not getattr(MODELS[kind]._meta.get_field(name), 'auto_now_add', False):
+                continue
+            stamped = []
+            for _, instance, extra in items:
+                if name in extra['preserved']:
+                    setattr(instance, name, extra['preserved'][name])
+                    stamped.append(instance)
+            if stamped:
+                MODELS[kind].objects.bulk_update(stamped, [name])
+
+        if kind == 'task':
+            TaskLabel.objects.bulk_create([
+                TaskLabel(task=instance, label_id=self.label_ids[name])
+                for _, instance, extra in items for name in extra['labels']
+            ])
+            # Parents later in the same chunk get their id only now.
+            chunk_ids = {extra['id']: instance.id for _, instance, extra in items if extra['id'] is not None}
+            children = []
+            for _, instance, extra in items:
+                if instance.parent_task_id is None and extra['parent'] in chunk_ids:
+                    instance.parent_task_id = chunk_ids[extra['parent']]
+                    children.append(instance)
+            Task.objects.bulk_update(children, ['parent_task'])
+        if kind in SEARCH_KINDS:
+            search.index_objects(SEARCH_KINDS[kind], instances)
+
+
+def import_rows(user, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import `rows` ((line, row) pairs) in one transaction; per-row errors are reported, not raised."""
+    importer = Importer(user, chunk_size=chunk_size)
+    with transaction.atomic():
+        for line, row in rows:
+            importer.add(line, row)
+        return importer.finish()
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks_app.archive import archive_activity
+
+
+class Command(BaseCommand):
+    help = 'Move ActivityLog entries past the retention period to the compressed per-user archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Retention in days (default: ACTIVITY_RETENTION_DAYS).')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Entries moved per transaction.')
+
+    def handle(self, *args, days=None, chunk_size=1000, **options):
+        days = settings.ACTIVITY_RETENTION_DAYS if days is None else days
+        count = archive_activity(retention=timedelta(days=days), chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'Archived {count} activity entries older than {days} days.'))
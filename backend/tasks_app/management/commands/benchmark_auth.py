@@ -0,0 +1,40 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from tasks_app.authentication import CachedJWTAuthentication
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request queries and time of the stock and cached JWT authentication.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, dest='user_id', help='Authenticate as this user id (default: the first user).')
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, user_id=None, requests=1000, **options):
+        user = User.objects.filter(pk=user_id).first() if user_id else User.objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('No such user.')
+        header = f'Bearer {RefreshToken.for_user(user).access_token}'
+        factory = APIRequestFactory()
+
+        for backend in (JWTAuthentication(), CachedJWTAuthentication()):
+            # One warm-up request, so the cached backend is measured on hits.
+            backend.authenticate(Request(factory.get('/', HTTP_AUTHORIZATION=header)))
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                for _ in range(requests):
+                    backend.authenticate(Request(factory.get('/', HTTP_AUTHORIZATION=header)))
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{type(backend).__name__}: {len(ctx.captured_queries) / requests:.2f} queries/request, '
+                f'{elapsed * 1e6 / requests:.0f} us/request'
+            )
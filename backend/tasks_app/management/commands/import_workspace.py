@@ -0,0 +1,36 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks_app import importer
+
+
+class Command(BaseCommand):
+    help = "Import an NDJSON or CSV workspace export (optionally gzipped) into a user's workspace."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username or id of the user to import into.')
+        parser.add_argument('--format', choices=importer.FORMATS, default=None, help='Input format (default: from the file name).')
+        parser.add_argument('--chunk-size', type=int, default=importer.DEFAULT_CHUNK_SIZE, help='Rows validated and inserted at a time.')
+
+    def handle(self, *args, path, user, format=None, chunk_size=importer.DEFAULT_CHUNK_SIZE, **options):
+        lookup = {'pk': user} if user.isdigit() else {'username': user}
+        target = User.objects.filter(**lookup).first()
+        if target is None:
+            raise CommandError(f'No such user: {user}')
+        if not 1 <= chunk_size <= importer.MAX_CHUNK_SIZE:
+            raise CommandError(f'--chunk-size must be between 1 and {importer.MAX_CHUNK_SIZE}.')
+        input_format = format or ('csv' if path.lower().endswith(('.csv', '.csv.gz')) else 'ndjson')
+
+        try:
+            with open(path, 'rb') as raw:
+                report = importer.import_rows(target, importer.rows(importer.open_upload(raw), input_format), chunk_size=chunk_size)
+        except importer.UNREADABLE as exc:
+            raise CommandError(f'Could not read {path}: {exc}')
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']} ({error['type']}): {json.dumps(error['errors'])}")
+        created = ', '.join(f'{count} {kind}' for kind, count in report.created.items() if count) or 'nothing'
+        self.stdout.write(self.style.SUCCESS(f'Imported {created} for {target.username}; {report.error_count} rows skipped.'))
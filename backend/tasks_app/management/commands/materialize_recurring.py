@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from tasks_app.recurrence import materialize, run_forever
+
+
+class Command(BaseCommand):
+    help = 'Create the next instance of every due recurring task, once or in a loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead-hours', type=float, default=0, help='Create instances this many hours before the current one is due.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep running, checking every --interval seconds.')
+        parser.add_argument('--interval', type=int, default=60)
+
+    def handle(self, *args, lead_hours=0, batch_size=500, loop=False, interval=60, **options):
+        lead = timedelta(hours=lead_hours)
+        if loop:
+            self.stdout.write(f'Materializing recurring tasks every {interval}s.')
+            run_forever(interval=interval, lead=lead, batch_size=batch_size)
+            return
+        count = materialize(lead=lead, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Created {count} recurring task instance(s).'))
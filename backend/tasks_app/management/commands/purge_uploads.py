@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from tasks_app.attachments import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable uploads that have not received a chunk for a while, with their partial files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Age of the last chunk after which an upload is abandoned.')
+
+    def handle(self, *args, hours=24, **options):
+        count = purge_stale_uploads(timedelta(hours=hours))
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} uploads idle for more than {hours} hours.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from tasks_app.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Backfill or rebuild the per-user daily analytics rollups from tasks, time logs and study sessions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only rebuild this user id (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, user_ids=None, batch_size=1000, **options):
+        count = rebuild_rollups(user_ids=user_ids, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} rollup rows.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tasks_app.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for tasks, notes, comments and subtasks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, chunk_size=2000, **options):
+        count = rebuild_index(chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} documents.'))
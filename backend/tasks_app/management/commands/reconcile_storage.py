@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from tasks_app.attachments import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user StorageUsage counters from the attachments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only reconcile this user id (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, user_ids=None, batch_size=1000, **options):
+        count = reconcile(user_ids=user_ids, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled storage usage for {count} users.'))
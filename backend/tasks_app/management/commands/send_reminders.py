@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from tasks_app.reminders import ReminderWorker
+
+
+class Command(BaseCommand):
+    help = 'Deliver due email reminders, once or as a long-running worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling every --interval seconds when idle.')
+        parser.add_argument('--interval', type=int, default=5)
+
+    def handle(self, *args, batch_size=500, loop=False, interval=5, **options):
+        worker = ReminderWorker(batch_size=batch_size)
+        if loop:
+            self.stdout.write(f'Dispatching reminders in batches of {batch_size}.')
+            worker.run_forever(interval=interval)
+            return
+        try:
+            while worker.run_once() == batch_size:
+                pass
+        finally:
+            worker.close()
+        self.stdout.write(self.style.SUCCESS(f'Reminders: {worker.metrics.as_dict()}'))
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks_app', '0005_label_updated_at_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', '-timestamp'], name='activity_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studysession',
+            index=models.Index(fields=['user', 'started_at'], name='study_user_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subtask',
+            index=models.Index(fields=['task', 'order', '-created_at'], name='subtask_task_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'order', '-created_at', 'id'], name='task_user_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'status', 'order', '-created_at'], name='task_user_status_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'deadline'], name='task_user_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'updated_at'], name='task_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskcomment',
+            index=models.Index(fields=['task', '-created_at'], name='comment_task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasknote',
+            index=models.Index(fields=['task', '-created_at'], name='tasknote_task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskreminder',
+            index=models.Index(condition=models.Q(('is_sent', False)), fields=['remind_at'], name='reminder_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelog',
+            index=models.Index(fields=['task', 'logged_date'], name='timelog_task_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelog',
+            index=models.Index(fields=['task', '-created_at'], name='timelog_task_created_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_completed_at(apps, schema_editor):
+    # Best available approximation for tasks completed before the field existed.
+    Task = apps.get_model('tasks_app', 'Task')
+    Task.objects.filter(status='completed', completed_at__isnull=True).update(completed_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks_app', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('category', models.CharField(blank=True, default='', max_length=20)),
+                ('tasks_completed', models.IntegerField(default=0)),
+                ('study_minutes', models.IntegerField(default=0)),
+                ('logged_minutes', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date', 'category'],
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'completed_at'], name='task_user_completed_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'category'), name='rollup_user_date_category_uniq'),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks_app', '0007_task_completed_at_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subtask',
+            name='order',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='order',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SQLITE_FORWARD = [
+    # Standalone FTS5 table keyed by the document id. `owner` ("u<user id>")
+    # lets a MATCH intersect with the user's posting list instead of
+    # filtering every user's hits afterwards.
+    """CREATE VIRTUAL TABLE tasks_app_searchdocument_fts
+       USING fts5(content, owner, tokenize='porter unicode61')""",
+    """CREATE TRIGGER tasks_app_searchdocument_ai AFTER INSERT ON tasks_app_searchdocument BEGIN
+         INSERT INTO tasks_app_searchdocument_fts(rowid, content, owner) VALUES (new.id, new.content, 'u' || new.user_id);
+       END""",
+    """CREATE TRIGGER tasks_app_searchdocument_ad AFTER DELETE ON tasks_app_searchdocument BEGIN
+         DELETE FROM tasks_app_searchdocument_fts WHERE rowid = old.id;
+       END""",
+    """CREATE TRIGGER tasks_app_searchdocument_au AFTER UPDATE ON tasks_app_searchdocument BEGIN
+         UPDATE tasks_app_searchdocument_fts SET content = new.content, owner = 'u' || new.user_id WHERE rowid = old.id;
+       END""",
+]
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS tasks_app_searchdocument_au',
+    'DROP TRIGGER IF EXISTS tasks_app_searchdocument_ad',
+    'DROP TRIGGER IF EXISTS tasks_app_searchdocument_ai',
+    'DROP TABLE IF EXISTS tasks_app_searchdocument_fts',
+]
+POSTGRES_FORWARD = [
+    """CREATE INDEX searchdoc_content_fts_idx ON tasks_app_searchdocument
+       USING GIN (to_tsvector('english', content))""",
+]
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS searchdoc_content_fts_idx',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks_app', '0008_fractional_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('task', 'Task'), ('note', 'Note'), ('comment', 'Comment'), ('subtask', 'Subtask')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('content', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='tasks_app.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='searchdoc_kind_object_uniq'),
+        ),
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
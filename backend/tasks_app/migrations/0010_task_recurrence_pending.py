@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:48
+
+from django.db import migrations, models
+
+
+def mark_pending(apps, schema_editor):
+    # Recurring tasks whose next instance was not already created via create_recurring.
+    Task = apps.get_model('tasks_app', 'Task')
+    Task.objects.exclude(recurrence='none').filter(recurring_instances__isnull=True).update(recurrence_pending=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks_app', '0009_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='recurrence_pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('recurrence_pending', True)), fields=['deadline'], name='task_recurrence_due_idx'),
+        ),
+        migrations.RunPython(mark_pending, migrations.RunPython.noop),
+    ]
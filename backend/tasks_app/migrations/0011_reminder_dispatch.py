@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks_app', '0010_task_recurrence_pending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskreminder',
+            name='claim_token',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='taskreminder',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='taskreminder',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='taskreminder',
+            index=models.Index(condition=models.Q(('is_sent', True)), fields=['sent_at'], name='reminder_sent_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks_app', '0012_token_revocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='undone',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='activitylog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks_app', '0014_attachment_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskreminder',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -1,7 +1,30 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+class TrackedFieldsMixin:
+    """
+    Keeps the field values a row was loaded with in `_loaded_values`, so
+    signal handlers can diff a save against them without re-reading it.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
-class Task(models.Model):
+    def remember_loaded_values(self):
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+        }
+
+
+class Task(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('completed', 'Completed'),
@@ -40,21 +63,56 @@ class Task(models.Model):
     recurrence = models.CharField(max_length=20, choices=RECURRENCE_CHOICES, default='none')
     is_recurring = models.BooleanField(default=False)
     parent_task = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='recurring_instances')
-    order = models.IntegerField(default=0)
+    # Recurring and its next occurrence not created yet; see recurrence.py
+    recurrence_pending = models.BooleanField(default=False)
+    # Fractional rank; see ranking.py
+    order = models.FloatField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['order', '-created_at']
+        indexes = [
+            # List views: user's tasks in Meta.ordering (keyset paginated).
+            models.Index(fields=['user', 'order', '-created_at', 'id'], name='task_user_order_idx'),
+            # /tasks/pending/ and /tasks/completed/ and ?status=.
+            models.Index(fields=['user', 'status', 'order', '-created_at'], name='task_user_status_order_idx'),
+            # Deadline ranges, buckets and ?ordering=deadline.
+            models.Index(fields=['user', 'deadline'], name='task_user_deadline_idx'),
+            # /tasks/changes/
+            models.Index(fields=['user', 'updated_at'], name='task_user_updated_idx'),
+            # Completions per day.
+            models.Index(fields=['user', 'completed_at'], name='task_user_completed_idx'),
+            # Recurring tasks still waiting for their next occurrence, across users.
+            models.Index(fields=['deadline'], name='task_recurrence_due_idx', condition=models.Q(recurrence_pending=True)),
+        ]
     
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        self.sync_completed_at()
+        self.sync_recurrence_pending()
+        super().save(*args, **kwargs)
+    
+    def sync_completed_at(self):
+        if self.status == 'completed' and self.completed_at is None:
+            self.completed_at = timezone.now()
+        elif self.status != 'completed':
+            self.completed_at = None
+    
+    def sync_recurrence_pending(self):
+        if self.recurrence == 'none':
+            self.recurrence_pending = False
+        elif self._state.adding or getattr(self, '_loaded_values', {}).get('recurrence') == 'none':
+            # Newly recurring: the scheduler owes it a next occurrence.
+            self.recurrence_pending = True
+    
     @property
     def days_until_deadline(self):
         if not self.deadline:
             return None
-        from django.utils import timezone
         delta = self.deadline.date() - timezone.now().date()
         return delta.days
     
@@ -76,6 +134,7 @@ class Label(models.Model):
     name = models.CharField(max_length=50)
     color = models.CharField(max_length=7, default='#3B82F6')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ('user', 'name')
@@ -100,14 +159,31 @@ class TaskNote(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['task', '-created_at'], name='tasknote_task_created_idx'),
+        ]
     
     def __str__(self):
         return f"Note on {self.task.title}"
 
 
+class AttachmentBlob(models.Model):
+    """Uploaded content, stored once under its SHA-256 however many attachments share it."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    file = models.FileField(upload_to='attachments/')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.sha256
+
+
 class TaskAttachment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='attachments')
+    # Uploads through the API point `file` at their blob's file.
     file = models.FileField(upload_to='task_attachments/')
+    blob = models.ForeignKey(AttachmentBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='attachments')
+    size = models.BigIntegerField(default=0)
     link = models.URLField(null=True, blank=True)
     file_name = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -116,6 +192,36 @@ class TaskAttachment(models.Model):
         return self.file_name
 
 
+class UploadSession(models.Model):
+    """A resumable upload in progress; `received` bytes are on disk so far."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='upload_sessions')
+    file_name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='uploadsession_updated_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Upload of {self.file_name} ({self.received}/{self.size})"
+
+
+class StorageUsage(models.Model):
+    """Bytes of attachments a user has, kept up to date as they are added and removed."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='storage_usage')
+    bytes_used = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Storage of {self.user.username}"
+
+
 class PomodoroSession(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='pomodoro_sessions')
     duration_minutes = models.IntegerField(default=25)
@@ -145,12 +251,15 @@ class Subtask(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='subtasks')
     title = models.CharField(max_length=200)
     status = models.CharField(max_length=20, choices=[('pending', 'Pending'), ('completed', 'Completed')], default='pending')
-    order = models.IntegerField(default=0)
+    order = models.FloatField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['order', '-created_at']
+        indexes = [
+            models.Index(fields=['task', 'order', '-created_at'], name='subtask_task_order_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -169,7 +278,7 @@ class TaskDependency(models.Model):
 
 
 # Feature 3: Time Tracking
-class TimeLog(models.Model):
+class TimeLog(TrackedFieldsMixin, models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='time_logs')
     duration_minutes = models.IntegerField()  # Actual time spent
     estimated_minutes = models.IntegerField(null=True, blank=True)  # Estimated time
@@ -177,6 +286,12 @@ class TimeLog(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'logged_date'], name='timelog_task_date_idx'),
+            models.Index(fields=['task', '-created_at'], name='timelog_task_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Time log - {self.task.title}"
 
@@ -205,6 +320,9 @@ class TaskComment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['task', '-created_at'], name='comment_task_created_idx'),
+        ]
     
     def __str__(self):
         return f"Comment by {self.user.username} on {self.task.title}"
@@ -272,6 +390,12 @@ class TaskReminder(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='reminders')
     remind_at = models.DateTimeField()
     is_sent = models.BooleanField(default=False)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Lease held by a dispatch worker; see reminders.py
+    claim_token = models.CharField(max_length=32, blank=True, default='')
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    # Times it has been claimed; given up on after reminders.MAX_ATTEMPTS.
+    attempts = models.PositiveSmallIntegerField(default=0)
     type = models.CharField(max_length=20, choices=[
         ('browser', 'Browser Notification'),
         ('email', 'Email'),
@@ -279,6 +403,16 @@ class TaskReminder(models.Model):
     ])
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # Due-reminder scan: WHERE NOT is_sent AND remind_at <= now. Partial,
+            # so it only holds pending reminders (and SQLite can use it; it
+            # won't seek on a leading boolean rendered as NOT is_sent).
+            models.Index(fields=['remind_at'], condition=models.Q(is_sent=False), name='reminder_due_idx'),
+            # Throughput metrics: reminders sent in the last minute.
+            models.Index(fields=['sent_at'], condition=models.Q(is_sent=True), name='reminder_sent_idx'),
+        ]
+    
     def __str__(self):
         return f"Reminder for {self.task.title}"
 
@@ -290,17 +424,23 @@ class ActivityLog(models.Model):
     task_id = models.IntegerField(null=True, blank=True)
     old_data = models.JSONField(null=True, blank=True)
     new_data = models.JSONField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # When the change happened; rows are written later, in batches (see activity.py)
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Reverted by /activity/undo/ and not redone since
+    undone = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['user', '-timestamp'], name='activity_user_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.action} - {self.user.username}"
 
 
 # Feature 12: Study Sessions
-class StudySession(models.Model):
+class StudySession(TrackedFieldsMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='study_sessions')
     task = models.ForeignKey(Task, on_delete=models.SET_NULL, null=True, blank=True, related_name='study_sessions')
     duration_minutes = models.IntegerField()
@@ -310,6 +450,11 @@ class StudySession(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'started_at'], name='study_user_started_idx'),
+        ]
+    
     def __str__(self):
         return f"Study Session - {self.user.username}"
 
@@ -342,4 +487,81 @@ class LinkResource(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+
+# Deletion tombstones for incremental sync (/tasks/changes/)
+class Tombstone(models.Model):
+    MODEL_CHOICES = [
+        ('task', 'Task'),
+        ('subtask', 'Subtask'),
+        ('label', 'Label'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted"
+
+
+# Per-user daily analytics rollup, maintained incrementally (see rollups.py)
+class DailyRollup(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    # Task category the numbers belong to ('' for study sessions without a task)
+    category = models.CharField(max_length=20, blank=True, default='')
+    tasks_completed = models.IntegerField(default=0)
+    study_minutes = models.IntegerField(default=0)
+    logged_minutes = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['date', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date', 'category'], name='rollup_user_date_category_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Rollup {self.date} {self.category or '-'} - {self.user.username}"
+
+
+# Full-text search index (see search.py). One row per searchable object;
+# the FTS5 table (SQLite) or GIN index (Postgres) is created in migration 0009.
+class SearchDocument(models.Model):
+    KIND_CHOICES = [
+        ('task', 'Task'),
+        ('note', 'Note'),
+        ('comment', 'Comment'),
+        ('subtask', 'Subtask'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_documents')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='search_documents')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    content = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchdoc_kind_object_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+
+# Access and refresh tokens issued before revoked_before are rejected (see authentication.py)
+class TokenRevocation(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='token_revocation')
+    revoked_before = models.DateTimeField()
+
+    def __str__(self):
+        return f"Tokens of {self.user.username} revoked before {self.revoked_before}"
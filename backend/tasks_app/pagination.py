@@ -0,0 +1,169 @@
+import base64
+import heapq
+import json
+from functools import reduce
+import operator
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .filters import get_task_ordering
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination over a composite key.
+
+    Unlike DRF's CursorPagination (which seeks on the first ordering field
+    and falls back to an offset for ties), the cursor here carries every
+    value of `ordering`, so each page is a single index seek no matter how
+    deep into the list the client is.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.next_position = None
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+
+        results = list(queryset[:self.page_size + 1])
+        page = results[:self.page_size]
+        if len(results) > self.page_size:
+            self.next_position = self.get_position(page[-1])
+        return page
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_seek_filter(self, position):
+        # (a, b, c) > (x, y, z) expanded per column so mixed ASC/DESC keys work:
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        clauses = []
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {f.lstrip('-'): position[f.lstrip('-')] for f in self.ordering[:i]}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': position[name]}))
+        return reduce(operator.or_, clauses)
+
+    def get_position(self, instance):
+        return {field.lstrip('-'): getattr(instance, field.lstrip('-')) for field in self.ordering}
+
+    def encode_cursor(self, position):
+        payload = json.dumps(
+            {name: value.isoformat() if hasattr(value, 'isoformat') else value for name, value in position.items()},
+            separators=(',', ':'),
+        )
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = {}
+            for field in self.ordering:
+                name = field.lstrip('-')
+                annotation = queryset.query.annotations.get(name)
+                model_field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+                position[name] = model_field.to_python(payload[name])
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+
+class TaskPagination(KeysetPagination):
+    # Task.Meta.ordering plus the primary key as a unique tie-breaker.
+    ordering = ('order', '-created_at', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        # Sort keys are validated (and annotated) by TaskFilterBackend.
+        return get_task_ordering(request.query_params)
+
+
+class TimelinePagination(KeysetPagination):
+    """Newest-first pagination for per-task notes, comments and time logs."""
+    ordering = ('-created_at', '-id')
+
+
+class ActivityHistoryPagination(KeysetPagination):
+    """
+    Newest-first pages over a user's ActivityLog rows merged with their
+    archived entries (see archive.py), under one cursor.
+    """
+    ordering = ('-timestamp', '-id')
+
+    def paginate_history(self, queryset, archived, request):
+        """
+        `archived(position)` yields (timestamp, id, record) newest first,
+        strictly before `position`; hot rows are serialized to the same shape.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.next_position = None
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+        before = (position['timestamp'], position['id']) if position is not None else None
+
+        hot = ((row.timestamp, row.id, row) for row in queryset[:self.page_size + 1])
+        page, seen = [], set()
+        # An entry caught mid-archiving can show up on both sides.
+        for timestamp, pk, item in heapq.merge(hot, archived(before), key=lambda entry: entry[:2], reverse=True):
+            if pk in seen:
+                continue
+            seen.add(pk)
+            page.append((timestamp, pk, item))
+            if len(page) > self.page_size:
+                break
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            self.next_position = {'timestamp': page[-1][0], 'id': page[-1][1]}
+        return [item for _, _, item in page]
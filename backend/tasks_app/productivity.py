@@ -0,0 +1,124 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import Greatest, TruncDate
+
+from . import caching
+from .models import Task, StudySession, ProductivityStat
+
+
+def _apply(user_id, **updates):
+    """
+    Apply `updates` (F/Case expressions) to the user's ProductivityStat in a
+    single UPDATE, so concurrent writers never read-modify-write the row in
+    Python. The row is created on first use.
+    """
+    rows = ProductivityStat.objects.filter(user_id=user_id)
+    # Queryset UPDATEs send no signals.
+    caching.bump_version(user_id)
+    if rows.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            ProductivityStat.objects.create(user_id=user_id)
+    except IntegrityError:
+        pass
+    rows.update(**updates)
+
+
+def record_completion(user_id, day):
+    _apply(
+        user_id,
+        total_tasks_completed=F('total_tasks_completed') + 1,
+        # Same day keeps the streak, the day after extends it, a gap restarts it.
+        current_streak=Case(
+            When(last_activity_date=day, then=F('current_streak')),
+            When(last_activity_date=day - timedelta(days=1), then=F('current_streak') + 1),
+            When(last_activity_date__gt=day, then=F('current_streak')),
+            default=Value(1),
+        ),
+        last_activity_date=Case(
+            When(last_activity_date__gt=day, then=F('last_activity_date')),
+            default=Value(day),
+        ),
+    )
+
+
+def record_uncompletion(user_id):
+    # The streak is left alone; reconcile_productivity recomputes it.
+    _apply(user_id, total_tasks_completed=Greatest(F('total_tasks_completed') - 1, Value(0)))
+
+
+def _completion_day(status, completed_at):
+    return completed_at.date() if status == 'completed' and completed_at else None
+
+
+def task_changed(task, created=False, deleted=False):
+    loaded = getattr(task, '_loaded_values', {}) if not created else {}
+    was_completed = _completion_day(loaded.get('status'), loaded.get('completed_at'))
+    completed = None if deleted else _completion_day(task.status, task.completed_at)
+    if bool(was_completed) == bool(completed):
+        return
+    if completed:
+        record_completion(task.user_id, completed)
+    else:
+        record_uncompletion(task.user_id)
+
+
+def study_session_changed(session, created=False, deleted=False):
+    loaded = getattr(session, '_loaded_values', {}) if not created else {}
+    delta = 0 if deleted else session.duration_minutes
+    if loaded:
+        delta -= loaded['duration_minutes']
+    if delta:
+        _apply(session.user_id, total_study_minutes=Greatest(F('total_study_minutes') + delta, Value(0)))
+
+
+def _streak(days):
+    """Length of the run of consecutive days ending at the latest one."""
+    days = sorted(days, reverse=True)
+    streak = 1
+    for newer, older in zip(days, days[1:]):
+        if newer - older != timedelta(days=1):
+            break
+        streak += 1
+    return streak
+
+
+def reconcile(user_ids=None, batch_size=1000):
+    """Recompute every ProductivityStat counter from tasks and study sessions."""
+    tasks = Task.objects.filter(status='completed', completed_at__isnull=False)
+    sessions = StudySession.objects.all()
+    if user_ids is not None:
+        tasks = tasks.filter(user_id__in=user_ids)
+        sessions = sessions.filter(user_id__in=user_ids)
+
+    stats = defaultdict(lambda: {'total_tasks_completed': 0, 'total_study_minutes': 0, 'current_streak': 0, 'last_activity_date': None})
+    completion_days = defaultdict(list)
+    rows = tasks.annotate(day=TruncDate('completed_at')).order_by().values_list('user_id', 'day').annotate(n=Count('id'))
+    for user_id, day, n in rows:
+        stats[user_id]['total_tasks_completed'] += n
+        completion_days[user_id].append(day)
+    for user_id, minutes in sessions.order_by().values_list('user_id').annotate(n=Sum('duration_minutes')):
+        stats[user_id]['total_study_minutes'] = minutes or 0
+    for user_id, days in completion_days.items():
+        stats[user_id]['current_streak'] = _streak(days)
+        stats[user_id]['last_activity_date'] = max(days)
+
+    with transaction.atomic():
+        # Users with no history at all are reset rather than left stale.
+        stale = ProductivityStat.objects.exclude(user_id__in=list(stats))
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        caching.bump_version(*stats, *stale.values_list('user_id', flat=True))
+        stale.update(total_tasks_completed=0, total_study_minutes=0, current_streak=0, last_activity_date=None)
+        ProductivityStat.objects.bulk_create(
+            [ProductivityStat(user_id=user_id, **values) for user_id, values in stats.items()],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['total_tasks_completed', 'total_study_minutes', 'current_streak', 'last_activity_date'],
+        )
+    return len(stats)
@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.functions import Now
+from rest_framework.exceptions import ValidationError
+
+
+# Spacing between ranks after a rebalance. A float has ~50 halvings of
+# headroom per gap before a midpoint stops being strictly between its
+# neighbours, at which point the list is renumbered.
+RANK_STEP = 1024.0
+
+
+def rank_between(previous, following):
+    """A rank strictly between two neighbours (either may be None), or None."""
+    if previous is None and following is None:
+        return 0.0
+    if previous is None:
+        return following - RANK_STEP
+    if following is None:
+        return previous + RANK_STEP
+    middle = (previous + following) / 2
+    if previous < middle < following:
+        return middle
+    return None
+
+
+def apply_order(queryset, ids):
+    """Renumber `ids` (in that order) with one UPDATE ... SET order = CASE."""
+    if not ids:
+        return 0
+    return queryset.filter(id__in=ids).update(
+        order=Case(
+            *[When(id=pk, then=Value(index * RANK_STEP)) for index, pk in enumerate(ids)],
+            output_field=FloatField(),
+        ),
+        # Keep /tasks/changes/ aware of the new positions.
+        updated_at=Now(),
+    )
+
+
+def rebalance(queryset):
+    """Spread the ranks of `queryset` evenly, keeping its current order."""
+    ordering = queryset.model._meta.ordering + ['id']
+    return apply_order(queryset, list(queryset.order_by(*ordering).values_list('id', flat=True)))
+
+
+def _neighbour_id(name, value):
+    # Ids come straight from the request body (JSON or form data).
+    if value is None or value == '':
+        return None
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    raise ValidationError({name: 'Expected an id or null.'})
+
+
+def move(queryset, instance, after=None, before=None):
+    """
+    Give `instance` a rank between the rows `after` and `before` of
+    `queryset` (ids; either may be omitted at the ends of the list). Only
+    the moved row is written unless the gap has run out.
+    """
+    after, before = _neighbour_id('after', after), _neighbour_id('before', before)
+    neighbour_ids = [pk for pk in (after, before) if pk is not None]
+    if instance.pk in neighbour_ids:
+        raise ValidationError({'detail': 'An item cannot be moved next to itself.'})
+
+    with transaction.atomic():
+        ranks = dict(queryset.filter(id__in=neighbour_ids).values_list('id', 'order'))
+        missing = [pk for pk in neighbour_ids if pk not in ranks]
+        if missing:
+            raise ValidationError({'detail': f'Unknown neighbour id(s): {missing}.'})
+        if after is not None and before is not None and ranks[after] > ranks[before]:
+            raise ValidationError({'detail': '`after` must come before `before`.'})
+
+        rank = rank_between(ranks.get(after), ranks.get(before))
+        if rank is None:
+            rebalance(queryset)
+            ranks = dict(queryset.filter(id__in=neighbour_ids).values_list('id', 'order'))
+            rank = rank_between(ranks.get(after), ranks.get(before))
+            if rank is None:
+                raise ValidationError({'detail': 'The list changed; reload it and retry.'})
+
+        queryset.filter(id=instance.pk).update(order=rank, updated_at=Now())
+    instance.order = rank
+    return rank
@@ -0,0 +1,145 @@
+import calendar
+import logging
+import threading
+from datetime import timedelta
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from . import caching, search
+from .models import Task, TaskLabel, Subtask
+
+
+logger = logging.getLogger(__name__)
+
+
+def add_months(value, months):
+    """`value` moved by whole calendar months, clamping the day to the month's end."""
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    return value.replace(year=year, month=month, day=min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence(anchor, recurrence, n):
+    """
+    The n-th occurrence of a series starting at `anchor`. Counted from the
+    anchor rather than the previous instance, so Jan 31 monthly gives
+    Feb 28 then Mar 31, and done on the wall clock so DST keeps the time.
+    """
+    tz = timezone.get_current_timezone()
+    local = timezone.localtime(anchor, tz).replace(tzinfo=None)
+    if recurrence == 'monthly':
+        local = add_months(local, n)
+    elif recurrence == 'weekly':
+        local += timedelta(weeks=n)
+    else:
+        local += timedelta(days=n)
+    return timezone.make_aware(local, tz)
+
+
+def next_deadline(anchor, recurrence, after):
+    """The first occurrence of the series strictly after `after`."""
+    if recurrence == 'monthly':
+        n = (after.year - anchor.year) * 12 + after.month - anchor.month
+    else:
+        n = (after - anchor).days // (7 if recurrence == 'weekly' else 1)
+    n = max(n - 1, 1)
+    while occurrence(anchor, recurrence, n) <= after:
+        n += 1
+    return occurrence(anchor, recurrence, n)
+
+
+def due_tasks(now, lead=timedelta(0)):
+    """Recurring tasks, across users, whose next occurrence should exist by `now`."""
+    # Matches the partial index task_recurrence_due_idx.
+    return Task.objects.filter(recurrence_pending=True, deadline__lte=now + lead)
+
+
+def _claim(queryset):
+    # Concurrent schedulers skip rows another one is already handling. SQLite
+    # serialises writers, so the recurrence_pending flag alone is enough.
+    if connection.features.has_select_for_update_skip_locked:
+        return queryset.select_for_update(skip_locked=True, of=('self',))
+    return queryset
+
+
+def spawn(tasks, now):
+    """
+    Create the next instance of every task in `tasks` (parent_task loaded),
+    with their labels and subtasks, and mark the sources as spawned. Must
+    run inside the transaction that claimed `tasks`.
+    """
+    successors = {}
+    for task in tasks:
+        root = task.parent_task or task
+        anchor = root.deadline or task.deadline
+        successors[task.id] = Task(
+            user_id=task.user_id,
+            title=task.title,
+            description=task.description,
+            priority=task.priority,
+            category=task.category,
+            recurrence=task.recurrence,
+            is_recurring=True,
+            recurrence_pending=True,
+            # Every instance points at the series root, which anchors the dates.
+            parent_task_id=root.id,
+            # Missed occurrences are skipped: one upcoming instance, not a backlog.
+            deadline=next_deadline(anchor, task.recurrence, max(task.deadline, now)),
+            order=task.order,
+        )
+    created = Task.objects.bulk_create(successors.values())
+
+    labels = TaskLabel.objects.filter(task_id__in=successors).values_list('task_id', 'label_id')
+    TaskLabel.objects.bulk_create([TaskLabel(task=successors[task_id], label_id=label_id) for task_id, label_id in labels])
+    subtasks = Subtask.objects.bulk_create([
+        Subtask(task=successors[task_id], title=title, order=order)
+        for task_id, title, order in Subtask.objects.filter(task_id__in=successors).order_by('order', 'id').values_list('task_id', 'title', 'order')
+    ])
+
+    Task.objects.filter(id__in=successors).update(recurrence_pending=False)
+    search.index_objects('task', created)
+    search.index_objects('subtask', subtasks)
+    caching.bump_version(*{task.user_id for task in created})
+    return created
+
+
+def materialize(now=None, lead=timedelta(0), batch_size=500):
+    """
+    Create the next instance of every due recurring task, `batch_size`
+    sources per transaction. Running it again creates nothing new.
+    """
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(_claim(due_tasks(now, lead).select_related('parent_task').order_by('deadline'))[:batch_size])
+            if batch:
+                total += len(spawn(batch, now))
+        if len(batch) < batch_size:
+            return total
+
+
+def spawn_next(task, now=None):
+    """Create the next instance of one task now, or None if it already exists."""
+    with transaction.atomic():
+        source = _claim(
+            Task.objects.filter(pk=task.pk, recurrence_pending=True, deadline__isnull=False)
+            .select_related('parent_task')
+        ).first()
+        if source is None:
+            return None
+        return spawn([source], now or timezone.now())[0]
+
+
+def run_forever(interval=60, lead=timedelta(0), batch_size=500, stop=None):
+    """Materialize due tasks every `interval` seconds until `stop` is set."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            count = materialize(lead=lead, batch_size=batch_size)
+            if count:
+                logger.info('Created %d recurring task instance(s).', count)
+        except DatabaseError:
+            logger.exception('Recurring task materialization failed; retrying in %ss.', interval)
+        stop.wait(interval)
@@ -0,0 +1,199 @@
+import logging
+import smtplib
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from . import caching
+from .models import TaskReminder
+
+
+logger = logging.getLogger(__name__)
+
+# A crashed worker's claims become claimable again after this long, so a
+# reminder is delivered at least once.
+LEASE = timedelta(minutes=5)
+# A reminder whose sends keep failing is given up on after this many claims.
+MAX_ATTEMPTS = 5
+
+
+def due_reminders(now, max_attempts=MAX_ATTEMPTS):
+    """Email reminders that are due, not leased to a live worker and not given up on."""
+    # remind_at/is_sent match the partial index reminder_due_idx.
+    return TaskReminder.objects.filter(is_sent=False, remind_at__lte=now, type='email', attempts__lt=max_attempts).filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+    )
+
+
+def claim(now, batch_size, lease=LEASE, max_attempts=MAX_ATTEMPTS):
+    """
+    Lease up to `batch_size` due reminders to a fresh token and return them.
+    On Postgres the candidate SELECT is FOR UPDATE SKIP LOCKED, so
+    concurrent workers take disjoint batches without waiting. The UPDATE
+    re-checks the due filter, so on SQLite a reminder another worker leased
+    in between is left out; the token tells which of the ids were ours.
+    """
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        candidates = due_reminders(now, max_attempts).order_by('remind_at')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        due_reminders(now, max_attempts).filter(id__in=ids).update(
+            claim_token=token, claimed_until=now + lease, attempts=F('attempts') + 1,
+        )
+    # By primary key: claim_token has no index.
+    return list(TaskReminder.objects.filter(id__in=ids, claim_token=token).select_related('task__user'))
+
+
+def build_message(reminder):
+    task = reminder.task
+    lines = [f'Reminder for your task "{task.title}".']
+    if task.deadline:
+        lines.append(f'Deadline: {timezone.localtime(task.deadline):%Y-%m-%d %H:%M %Z}')
+    if task.description:
+        lines += ['', task.description]
+    return EmailMessage(
+        subject=f'Reminder: {task.title}',
+        body='\n'.join(lines),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[task.user.email],
+    )
+
+
+class DispatchMetrics:
+    """Counters for one worker process, logged after every batch."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.batches = 0
+        self.last_lag = timedelta(0)
+        self.max_lag = timedelta(0)
+
+    def record(self, sent, failed, skipped, lag):
+        self.batches += 1
+        self.sent += sent
+        self.failed += failed
+        self.skipped += skipped
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+
+    @property
+    def per_minute(self):
+        elapsed = time.monotonic() - self.started
+        return self.sent * 60 / elapsed if elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'batches': self.batches,
+            'sent_per_minute': round(self.per_minute, 1),
+            'last_lag_seconds': round(self.last_lag.total_seconds(), 3),
+            'max_lag_seconds': round(self.max_lag.total_seconds(), 3),
+        }
+
+
+class ReminderWorker:
+    """
+    Claims due email reminders in batches and sends them over one SMTP
+    connection that stays open between batches.
+    """
+
+    def __init__(self, batch_size=500, lease=LEASE, max_attempts=MAX_ATTEMPTS):
+        self.batch_size = batch_size
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.metrics = DispatchMetrics()
+        self.connection = None
+
+    def _connection(self):
+        if self.connection is None:
+            self.connection = get_connection()
+            self.connection.open()
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            finally:
+                self.connection = None
+
+    def send_batch(self, reminders):
+        """Send `reminders`; returns the ids delivered (or with no address) and the failure count."""
+        done, failed = [], 0
+        for reminder in reminders:
+            if not reminder.task.user.email:
+                done.append(reminder.id)
+                continue
+            try:
+                self._connection().send_messages([build_message(reminder)])
+            except (smtplib.SMTPException, OSError):
+                # Left leased; it is retried once the lease runs out.
+                logger.exception('Could not send reminder %s.', reminder.id)
+                if reminder.attempts >= self.max_attempts:
+                    logger.error('Giving up on reminder %s after %s attempts.', reminder.id, reminder.attempts)
+                failed += 1
+                self.close()
+            else:
+                done.append(reminder.id)
+        return done, failed
+
+    def run_once(self, now=None):
+        """Claim, send and mark one batch. Returns the number of reminders claimed."""
+        now = now or timezone.now()
+        reminders = claim(now, self.batch_size, self.lease, self.max_attempts)
+        if not reminders:
+            return 0
+        done, failed = self.send_batch(reminders)
+        sent_at = timezone.now()
+        TaskReminder.objects.filter(id__in=done).update(is_sent=True, sent_at=sent_at, claim_token='', claimed_until=None)
+        caching.bump_version(*{reminder.task.user_id for reminder in reminders if reminder.id in done})
+        skipped = sum(1 for reminder in reminders if not reminder.task.user.email)
+        self.metrics.record(len(done) - skipped, failed, skipped, sent_at - min(r.remind_at for r in reminders))
+        logger.info('Reminder batch: %s', self.metrics.as_dict())
+        return len(reminders)
+
+    def run_forever(self, interval=5, stop=None):
+        """Drain due reminders, then poll every `interval` seconds until `stop` is set."""
+        stop = stop or threading.Event()
+        try:
+            while not stop.is_set():
+                try:
+                    claimed = self.run_once()
+                except DatabaseError:
+                    logger.exception('Reminder dispatch failed; retrying in %ss.', interval)
+                    claimed = 0
+                if claimed < self.batch_size:
+                    self.close()
+                    stop.wait(interval)
+        finally:
+            self.close()
+
+
+def backlog_metrics(now=None):
+    """Queue depth and lag as seen from the database, for any process."""
+    now = now or timezone.now()
+    unsent = TaskReminder.objects.filter(is_sent=False, remind_at__lte=now, type='email')
+    pending = unsent.filter(attempts__lt=MAX_ATTEMPTS)
+    oldest = pending.aggregate(oldest=Min('remind_at'))['oldest']
+    return {
+        'due': pending.count(),
+        'given_up': unsent.filter(attempts__gte=MAX_ATTEMPTS).count(),
+        'lag_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+        'sent_last_minute': TaskReminder.objects.filter(is_sent=True, sent_at__gte=now - timedelta(minutes=1)).count(),
+    }
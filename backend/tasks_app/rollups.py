@@ -0,0 +1,147 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from . import caching
+from .models import Task, TimeLog, StudySession, DailyRollup
+
+
+METRICS = ('tasks_completed', 'study_minutes', 'logged_minutes')
+
+
+def bump(user_id, day, category, **deltas):
+    """Add `deltas` to the (user, day, category) rollup row, creating it if needed."""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas or day is None:
+        return
+    category = category or ''
+    rows = DailyRollup.objects.filter(user_id=user_id, date=day, category=category)
+    if rows.update(**{name: F(name) + value for name, value in deltas.items()}):
+        return
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(user_id=user_id, date=day, category=category, **deltas)
+    except IntegrityError:
+        # Created concurrently between the UPDATE and the INSERT.
+        rows.update(**{name: F(name) + value for name, value in deltas.items()})
+
+
+def _completion(status, completed_at, category):
+    if status != 'completed' or completed_at is None:
+        return None
+    return completed_at.date(), category
+
+
+def task_changed(task, created=False, deleted=False):
+    """Move the task's completion between rollup rows after a save or delete."""
+    loaded = getattr(task, '_loaded_values', {}) if not created else {}
+    old = _completion(loaded.get('status'), loaded.get('completed_at'), loaded.get('category'))
+    new = None if deleted else _completion(task.status, task.completed_at, task.category)
+    if old == new:
+        return
+    if old:
+        bump(task.user_id, old[0], old[1], tasks_completed=-1)
+    if new:
+        bump(task.user_id, new[0], new[1], tasks_completed=1)
+
+
+def _task_category(task_id, task=None):
+    if task_id is None:
+        return ''
+    if task is not None and task.pk == task_id:
+        return task.category
+    return Task.objects.filter(pk=task_id).values_list('category', flat=True).first() or ''
+
+
+def _recount_logged_minutes(user_id, day):
+    """Set the day's logged minutes, per category, from the time logs it has now."""
+    totals = defaultdict(int)
+    rows = TimeLog.objects.filter(task__user_id=user_id, logged_date=day).order_by().values_list('task__category').annotate(n=Sum('duration_minutes'))
+    for category, n in rows:
+        totals[category or ''] += n
+    DailyRollup.objects.filter(user_id=user_id, date=day).exclude(category__in=list(totals)).update(logged_minutes=0)
+    for category, minutes in totals.items():
+        if not DailyRollup.objects.filter(user_id=user_id, date=day, category=category).update(logged_minutes=minutes):
+            bump(user_id, day, category, logged_minutes=minutes)
+
+
+def time_log_changed(log, created=False, deleted=False, task=None):
+    task = task or log.task
+    if created:
+        bump(task.user_id, log.logged_date, task.category, logged_minutes=log.duration_minutes)
+        return
+    # The old minutes may sit under a category the task has since left, so
+    # the days involved are recounted (under the current categories, as
+    # rebuild_rollups does) rather than adjusted.
+    loaded = getattr(log, '_loaded_values', {})
+    days = {loaded.get('logged_date'), log.logged_date} - {None}
+    for day in days:
+        _recount_logged_minutes(task.user_id, day)
+
+
+def study_session_changed(session, created=False, deleted=False):
+    loaded = getattr(session, '_loaded_values', {}) if not created else {}
+    if loaded:
+        old_task = session.task if session.task_id == loaded['task_id'] else None
+        bump(
+            loaded['user_id'], loaded['started_at'].date(), _task_category(loaded['task_id'], old_task),
+            study_minutes=-loaded['duration_minutes'],
+        )
+    if not deleted:
+        bump(
+            session.user_id, session.started_at.date(), _task_category(session.task_id, session.task),
+            study_minutes=session.duration_minutes,
+        )
+
+
+def rebuild_rollups(user_ids=None, batch_size=1000):
+    """Recompute rollups from source rows for `user_ids` (all users if None)."""
+    totals = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+
+    completions = Task.objects.filter(status='completed', completed_at__isnull=False)
+    time_logs = TimeLog.objects.all()
+    sessions = StudySession.objects.all()
+    rollups = DailyRollup.objects.all()
+    if user_ids is not None:
+        completions = completions.filter(user_id__in=user_ids)
+        time_logs = time_logs.filter(task__user_id__in=user_ids)
+        sessions = sessions.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    rows = (
+        completions.annotate(day=TruncDate('completed_at'))
+        .order_by().values_list('user_id', 'day', 'category').annotate(n=Count('id'))
+    )
+    for user_id, day, category, n in rows:
+        totals[user_id, day, category or '']['tasks_completed'] += n
+
+    rows = time_logs.order_by().values_list('task__user_id', 'logged_date', 'task__category').annotate(n=Sum('duration_minutes'))
+    for user_id, day, category, n in rows:
+        totals[user_id, day, category or '']['logged_minutes'] += n
+
+    rows = (
+        sessions.annotate(day=TruncDate('started_at'))
+        .order_by().values_list('user_id', 'day', 'task__category').annotate(n=Sum('duration_minutes'))
+    )
+    for user_id, day, category, n in rows:
+        totals[user_id, day, category or '']['study_minutes'] += n
+
+    affected = {user_id for user_id, _, _ in totals}
+    if user_ids is None:
+        affected.update(rollups.order_by().values_list('user_id', flat=True).distinct())
+    else:
+        affected.update(user_ids)
+
+    with transaction.atomic():
+        caching.bump_version(*affected)
+        rollups.delete()
+        DailyRollup.objects.bulk_create(
+            (
+                DailyRollup(user_id=user_id, date=day, category=category, **metrics)
+                for (user_id, day, category), metrics in totals.items()
+            ),
+            batch_size=batch_size,
+        )
+    return len(totals)
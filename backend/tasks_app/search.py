@@ -0,0 +1,140 @@
+import re
+
+from django.db import connection, transaction
+
+from .models import Task, TaskNote, TaskComment, Subtask, SearchDocument
+
+
+MAX_RESULTS = 50
+SNIPPET_TOKENS = 12
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _document(kind, instance):
+    """(task, content) for an indexed object."""
+    if kind == 'task':
+        return instance, f'{instance.title}\n{instance.description}'
+    if kind == 'subtask':
+        return instance.task, instance.title
+    return instance.task, instance.content
+
+
+def index_objects(kind, instances):
+    """Insert or refresh the search documents for `instances` in one statement."""
+    documents = []
+    for instance in instances:
+        task, content = _document(kind, instance)
+        documents.append(SearchDocument(user_id=task.user_id, task_id=task.pk, kind=kind, object_id=instance.pk, content=content))
+    if documents:
+        SearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['content', 'updated_at'],
+        )
+
+
+def index_object(kind, instance):
+    index_objects(kind, [instance])
+
+
+def unindex_object(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def _terms(query):
+    return _TERM_RE.findall(query.lower())[:16]
+
+
+def _sqlite_search(user, terms, limit):
+    # Prefix-match every term (AND), within the user's documents only.
+    match = 'owner:u{} AND content:({})'.format(user.pk, ' AND '.join(f'"{term}"*' for term in terms))
+    sql = """
+        SELECT d.kind, d.object_id, d.task_id, t.title,
+               snippet(tasks_app_searchdocument_fts, 0, '[', ']', '…', %s),
+               bm25(tasks_app_searchdocument_fts, 1.0, 0.0) AS rank
+        FROM tasks_app_searchdocument_fts
+        JOIN tasks_app_searchdocument d ON d.id = tasks_app_searchdocument_fts.rowid
+        JOIN tasks_app_task t ON t.id = d.task_id
+        WHERE tasks_app_searchdocument_fts MATCH %s
+        ORDER BY rank
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [SNIPPET_TOKENS, match, limit])
+        # bm25 is lower-is-better; flip it so every backend returns higher-is-better.
+        return [row[:5] + (-row[5],) for row in cursor.fetchall()]
+
+
+def _postgres_search(user, terms, limit):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    sql = """
+        SELECT d.kind, d.object_id, d.task_id, t.title,
+               ts_headline('english', d.content, q, %s),
+               ts_rank(to_tsvector('english', d.content), q) AS rank
+        FROM tasks_app_searchdocument d
+        JOIN tasks_app_task t ON t.id = d.task_id,
+             to_tsquery('english', %s) q
+        WHERE d.user_id = %s AND to_tsvector('english', d.content) @@ q
+        ORDER BY rank DESC
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        options = f'StartSel=[, StopSel=], MaxWords={SNIPPET_TOKENS}, MinWords=3'
+        cursor.execute(sql, [options, tsquery, user.pk, limit])
+        return cursor.fetchall()
+
+
+def _fallback_search(user, terms, limit):
+    documents = SearchDocument.objects.filter(user=user)
+    for term in terms:
+        documents = documents.filter(content__icontains=term)
+    return [
+        (doc.kind, doc.object_id, doc.task_id, doc.task.title, doc.content[:200], 0.0)
+        for doc in documents.select_related('task').order_by('-updated_at')[:limit]
+    ]
+
+
+def search(user, query, limit=MAX_RESULTS):
+    """Ranked matches for `query` across the user's tasks, notes, comments and subtasks."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    backend = {
+        'sqlite': _sqlite_search,
+        'postgresql': _postgres_search,
+    }.get(connection.vendor, _fallback_search)
+    return [
+        {'kind': kind, 'id': object_id, 'task_id': task_id, 'task_title': title, 'snippet': snippet, 'rank': rank}
+        for kind, object_id, task_id, title, snippet, rank in backend(user, terms, limit)
+    ]
+
+
+SOURCES = [
+    ('task', Task.objects.all()),
+    ('note', TaskNote.objects.select_related('task')),
+    ('comment', TaskComment.objects.select_related('task')),
+    ('subtask', Subtask.objects.select_related('task')),
+]
+
+
+def rebuild_index(chunk_size=2000):
+    """Re-create every search document from the source tables."""
+    count = 0
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for kind, queryset in SOURCES:
+            batch = []
+            for instance in queryset.order_by('pk').iterator(chunk_size=chunk_size):
+                task, content = _document(kind, instance)
+                batch.append(SearchDocument(user_id=task.user_id, task_id=task.pk, kind=kind, object_id=instance.pk, content=content))
+                if len(batch) >= chunk_size:
+                    SearchDocument.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            SearchDocument.objects.bulk_create(batch)
+            count += len(batch)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("INSERT INTO tasks_app_searchdocument_fts(tasks_app_searchdocument_fts) VALUES ('optimize')")
+    return count
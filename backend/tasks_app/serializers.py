@@ -1,10 +1,17 @@
+from datetime import timedelta
+
 from rest_framework import serializers
+from django.utils import timezone
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import authentication
 from .models import (
     Task, Label, TaskLabel, TaskNote, Subtask, TaskDependency, 
     TimeLog, TaskShare, TaskComment, TaskList, Goal, FilterPreset,
     UserTheme, TaskReminder, ActivityLog, StudySession, ProductivityStat,
-    LinkResource, TaskTemplate
+    LinkResource, TaskTemplate, TaskAttachment, UploadSession
 )
 
 
@@ -17,7 +24,7 @@ class UserSerializer(serializers.ModelSerializer):
 class LabelSerializer(serializers.ModelSerializer):
     class Meta:
         model = Label
-        fields = ['id', 'name', 'color', 'created_at']
+        fields = ['id', 'name', 'color', 'created_at', 'updated_at']
 
 
 class TaskLabelSerializer(serializers.ModelSerializer):
@@ -31,11 +38,31 @@ class TaskLabelSerializer(serializers.ModelSerializer):
 class TaskSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     labels = TaskLabelSerializer(many=True, read_only=True)
+    bucket = serializers.SerializerMethodField()
+    # Annotated by annotate_rollups(); a freshly created task has none yet.
+    subtask_count = serializers.IntegerField(read_only=True, default=0)
+    subtasks_completed = serializers.IntegerField(read_only=True, default=0)
+    spent_minutes = serializers.IntegerField(read_only=True, default=0)
+    estimated_minutes = serializers.IntegerField(read_only=True, default=0)
+    progress = serializers.SerializerMethodField()
     
     class Meta:
         model = Task
-        fields = ['id', 'user', 'title', 'description', 'status', 'priority', 'deadline', 'category', 'recurrence', 'labels', 'created_at', 'updated_at']
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        fields = [
+            'id', 'user', 'title', 'description', 'status', 'priority', 'deadline', 'category', 'recurrence', 'labels', 'bucket',
+            'subtask_count', 'subtasks_completed', 'spent_minutes', 'estimated_minutes', 'progress',
+            'order', 'completed_at', 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['user', 'order', 'completed_at', 'created_at', 'updated_at']
+    
+    def get_bucket(self, obj):
+        # Annotated by TaskViewSet; fall back to the Python property for
+        # freshly saved instances.
+        return getattr(obj, 'bucket', None) or obj.status_label
+    
+    def get_progress(self, obj):
+        count = getattr(obj, 'subtask_count', 0)
+        return round(obj.subtasks_completed / count, 4) if count else None
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -63,12 +90,30 @@ class SubtaskSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'status', 'order', 'created_at', 'updated_at']
 
 
+class SubtaskChangeSerializer(SubtaskSerializer):
+    class Meta(SubtaskSerializer.Meta):
+        fields = SubtaskSerializer.Meta.fields + ['task']
+
+
+class TaskSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Task
+        fields = ['id', 'title', 'status', 'priority', 'deadline']
+
+
 class TaskDependencySerializer(serializers.ModelSerializer):
-    depends_on_task = TaskSerializer(read_only=True)
+    depends_on_task = serializers.PrimaryKeyRelatedField(queryset=Task.objects.all())
+    # Just enough to render the edge; the view select_related()s it.
+    depends_on = TaskSummarySerializer(source='depends_on_task', read_only=True)
     
     class Meta:
         model = TaskDependency
-        fields = ['id', 'depends_on_task']
+        fields = ['id', 'depends_on_task', 'depends_on']
+    
+    def validate_depends_on_task(self, task):
+        if task.user_id != self.context['request'].user.id:
+            raise serializers.ValidationError('Task not found.')
+        return task
 
 
 class TimeLogSerializer(serializers.ModelSerializer):
@@ -128,7 +173,7 @@ class TaskReminderSerializer(serializers.ModelSerializer):
 class ActivityLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = ActivityLog
-        fields = ['id', 'action', 'task_id', 'old_data', 'new_data', 'timestamp']
+        fields = ['id', 'action', 'task_id', 'old_data', 'new_data', 'timestamp', 'undone']
 
 
 class StudySessionSerializer(serializers.ModelSerializer):
@@ -141,6 +186,15 @@ class ProductivityStatSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductivityStat
         fields = ['id', 'total_tasks_completed', 'total_study_minutes', 'current_streak', 'last_activity_date', 'updated_at']
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # The stored streak is only advanced on completions; it has lapsed
+        # if the last one was before yesterday.
+        last = instance.last_activity_date
+        if last is None or last < timezone.now().date() - timedelta(days=1):
+            data['current_streak'] = 0
+        return data
 
 
 class LinkResourceSerializer(serializers.ModelSerializer):
@@ -155,6 +209,43 @@ class TaskTemplateSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'priority', 'recurrence', 'created_at']
 
 
+class TaskAttachmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaskAttachment
+        fields = ['id', 'file', 'link', 'file_name', 'size', 'uploaded_at']
+
+
+TASK_DETAIL_SECTIONS = ['notes', 'subtasks', 'comments', 'time_logs', 'reminders', 'resources', 'dependencies', 'attachments']
+
+
+class TaskDetailSerializer(TaskSerializer):
+    """
+    A task with its child collections, for /tasks/<id>/full/. Sections not
+    in `include` (from the serializer context) are dropped, so the view only
+    prefetches what is rendered.
+    """
+    SECTIONS = TASK_DETAIL_SECTIONS
+    
+    notes = TaskNoteSerializer(many=True, read_only=True)
+    subtasks = SubtaskSerializer(many=True, read_only=True)
+    comments = TaskCommentSerializer(many=True, read_only=True)
+    time_logs = TimeLogSerializer(many=True, read_only=True)
+    reminders = TaskReminderSerializer(many=True, read_only=True)
+    resources = LinkResourceSerializer(source='link_resources', many=True, read_only=True)
+    dependencies = TaskDependencySerializer(source='dependencies_on', many=True, read_only=True)
+    attachments = TaskAttachmentSerializer(many=True, read_only=True)
+    
+    class Meta(TaskSerializer.Meta):
+        fields = TaskSerializer.Meta.fields + TASK_DETAIL_SECTIONS
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        include = self.context.get('include', self.SECTIONS)
+        for section in self.SECTIONS:
+            if section not in include:
+                self.fields.pop(section)
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     password2 = serializers.CharField(write_only=True, min_length=8)
@@ -171,4 +262,22 @@ class RegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password2')
         user = User.objects.create_user(**validated_data)
-        return user
\ No newline at end of file
+        return user
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses to refresh for inactive users and revoked tokens, like CachedJWTAuthentication."""
+    
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        authentication.check_token(refresh, authentication.load_state(refresh.get(api_settings.USER_ID_CLAIM)))
+        return super().validate(attrs)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(min_value=1)
+    
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'task', 'file_name', 'size', 'received', 'created_at', 'updated_at']
+        read_only_fields = ['task', 'received', 'created_at', 'updated_at']
@@ -0,0 +1,238 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Task, Label, TaskLabel, Subtask, Tombstone, TimeLog, StudySession,
+    TaskNote, TaskComment, TaskDependency, Goal, FilterPreset, UserTheme,
+    ProductivityStat, TaskReminder, LinkResource, TaskAttachment, TaskShare,
+    TaskList, TaskTemplate, PomodoroSession, TokenRevocation, UploadSession,
+)
+from . import activity, archive, attachments, authentication, caching, graph, productivity, rollups, search
+
+
+def _deleted_with(origin, model):
+    """True if the deletion was cascaded from deleting `model` row(s)."""
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+def _touch_tasks(queryset):
+    # Nested data changed, so bump updated_at to make the task show up in
+    # the next /tasks/changes/ response.
+    queryset.update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Task)
+def record_task_deletion(sender, instance, origin=None, **kwargs):
+    # Nobody is left to sync a deleted account.
+    if _deleted_with(origin, User):
+        return
+    Tombstone.objects.create(user_id=instance.user_id, model='task', object_id=instance.pk)
+    rollups.task_changed(instance, deleted=True)
+    productivity.task_changed(instance, deleted=True)
+    graph.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Task)
+def update_rollups_on_task_save(sender, instance, created, **kwargs):
+    rollups.task_changed(instance, created=created)
+    productivity.task_changed(instance, created=created)
+    loaded = getattr(instance, '_loaded_values', {})
+    if created or (loaded.get('title'), loaded.get('description')) != (instance.title, instance.description):
+        search.index_object('task', instance)
+    if not created and (loaded.get('status'), loaded.get('title'), loaded.get('deadline')) != (instance.status, instance.title, instance.deadline):
+        graph.invalidate(instance.user_id)
+    activity.task_saved(instance, created, loaded)
+    instance.remember_loaded_values()
+
+
+@receiver(pre_delete, sender=Task)
+def log_task_deletion(sender, instance, origin=None, **kwargs):
+    # Before the cascade, while the task's labels still exist.
+    if _deleted_with(origin, User):
+        return
+    activity.task_deleting(instance)
+
+
+SEARCH_KINDS = {TaskNote: 'note', TaskComment: 'comment', Subtask: 'subtask'}
+
+
+@receiver(post_save, sender=TaskNote)
+@receiver(post_save, sender=TaskComment)
+@receiver(post_save, sender=Subtask)
+def index_task_child(sender, instance, **kwargs):
+    search.index_object(SEARCH_KINDS[sender], instance)
+
+
+@receiver(post_delete, sender=TaskNote)
+@receiver(post_delete, sender=TaskComment)
+@receiver(post_delete, sender=Subtask)
+def unindex_task_child(sender, instance, origin=None, **kwargs):
+    # Documents of a deleted task (or user) go with it through the FK cascade.
+    if _deleted_with(origin, Task) or _deleted_with(origin, User):
+        return
+    search.unindex_object(SEARCH_KINDS[sender], instance.pk)
+
+
+@receiver(post_save, sender=TimeLog)
+def update_rollups_on_time_log_save(sender, instance, created, **kwargs):
+    rollups.time_log_changed(instance, created=created)
+    # Time logs weight the critical path.
+    graph.invalidate(instance.task.user_id)
+    instance.remember_loaded_values()
+
+
+@receiver(post_delete, sender=TimeLog)
+def update_rollups_on_time_log_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_with(origin, User):
+        return
+    task = origin if isinstance(origin, Task) else instance.task
+    rollups.time_log_changed(instance, deleted=True, task=task)
+    graph.invalidate(task.user_id)
+
+
+@receiver(post_save, sender=StudySession)
+def update_rollups_on_study_session_save(sender, instance, created, **kwargs):
+    rollups.study_session_changed(instance, created=created)
+    productivity.study_session_changed(instance, created=created)
+    instance.remember_loaded_values()
+
+
+@receiver(post_delete, sender=StudySession)
+def update_rollups_on_study_session_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_with(origin, User):
+        return
+    rollups.study_session_changed(instance, deleted=True)
+    productivity.study_session_changed(instance, deleted=True)
+
+
+@receiver(post_delete, sender=Subtask)
+def record_subtask_deletion(sender, instance, origin=None, **kwargs):
+    # Subtasks removed along with their task are covered by the task tombstone.
+    if _deleted_with(origin, Task) or _deleted_with(origin, User):
+        return
+    user_id = Task.objects.filter(pk=instance.task_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        Tombstone.objects.create(user_id=user_id, model='subtask', object_id=instance.pk)
+
+
+@receiver(post_save, sender=Label)
+def touch_tasks_on_label_change(sender, instance, created, **kwargs):
+    if not created:
+        _touch_tasks(Task.objects.filter(labels__label=instance))
+
+
+@receiver(pre_delete, sender=Label)
+def touch_tasks_on_label_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_with(origin, User):
+        return
+    _touch_tasks(Task.objects.filter(labels__label=instance))
+
+
+@receiver(post_delete, sender=Label)
+def record_label_deletion(sender, instance, origin=None, **kwargs):
+    if _deleted_with(origin, User):
+        return
+    Tombstone.objects.create(user_id=instance.user_id, model='label', object_id=instance.pk)
+
+
+@receiver(post_save, sender=TaskLabel)
+def touch_task_on_label_added(sender, instance, **kwargs):
+    _touch_tasks(Task.objects.filter(pk=instance.task_id))
+
+
+@receiver(post_delete, sender=TaskLabel)
+def touch_task_on_label_removed(sender, instance, origin=None, **kwargs):
+    if any(_deleted_with(origin, model) for model in (Task, Label, User)):
+        return
+    _touch_tasks(Task.objects.filter(pk=instance.task_id))
+
+
+@receiver(post_save, sender=TaskDependency)
+@receiver(post_delete, sender=TaskDependency)
+def invalidate_graph_on_dependency_change(sender, instance, origin=None, **kwargs):
+    # Deleting a task invalidates the graph itself.
+    if _deleted_with(origin, Task) or _deleted_with(origin, User):
+        return
+    graph.invalidate(instance.dependent_task.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_on_user_change(sender, instance, **kwargs):
+    # Deactivation and password changes must reach the cached auth state.
+    authentication.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def delete_activity_archive(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: archive.delete_user_archive(user_id))
+
+
+@receiver(post_delete, sender=TaskAttachment)
+def release_attachment_storage(sender, instance, origin=None, **kwargs):
+    if instance.blob_id is not None:
+        blob_id = instance.blob_id
+        transaction.on_commit(lambda: attachments.release(blob_id))
+    if _deleted_with(origin, User) or not instance.size:
+        return
+    user_id = origin.user_id if isinstance(origin, Task) else instance.task.user_id
+    attachments.uncharge(user_id, instance.size)
+
+
+@receiver(post_delete, sender=UploadSession)
+def discard_partial_upload(sender, instance, **kwargs):
+    session_id = instance.pk
+    transaction.on_commit(lambda: attachments.discard_partial(session_id))
+
+
+@receiver(post_save, sender=TokenRevocation)
+@receiver(post_delete, sender=TokenRevocation)
+def invalidate_auth_on_revocation(sender, instance, **kwargs):
+    authentication.invalidate(instance.user_id)
+
+
+# Owners of the rows behind the per-user response cache (caching.py).
+CACHED_MODELS = {
+    Task: lambda instance: instance.user_id,
+    Label: lambda instance: instance.user_id,
+    Goal: lambda instance: instance.user_id,
+    FilterPreset: lambda instance: instance.user_id,
+    UserTheme: lambda instance: instance.user_id,
+    ProductivityStat: lambda instance: instance.user_id,
+    TaskList: lambda instance: instance.user_id,
+    TaskTemplate: lambda instance: instance.user_id,
+    StudySession: lambda instance: instance.user_id,
+    User: lambda instance: instance.pk,
+    # Rows owned through a task: shown in the task list (labels, subtask and
+    # time rollups), /tasks/<id>/full/ and their own endpoints.
+    TaskLabel: lambda instance: instance.task.user_id,
+    Subtask: lambda instance: instance.task.user_id,
+    TimeLog: lambda instance: instance.task.user_id,
+    TaskNote: lambda instance: instance.task.user_id,
+    TaskComment: lambda instance: instance.task.user_id,
+    TaskDependency: lambda instance: instance.dependent_task.user_id,
+    TaskReminder: lambda instance: instance.task.user_id,
+    LinkResource: lambda instance: instance.task.user_id,
+    TaskAttachment: lambda instance: instance.task.user_id,
+    TaskShare: lambda instance: instance.task.user_id,
+    PomodoroSession: lambda instance: instance.task.user_id,
+}
+
+
+def bump_data_version(sender, instance, origin=None, **kwargs):
+    # Deleting the task (or account) bumps the version itself.
+    if _deleted_with(origin, User) or (sender not in (Task, User) and _deleted_with(origin, Task)):
+        return
+    caching.bump_version(CACHED_MODELS[sender](instance))
+
+
+for model in CACHED_MODELS:
+    post_save.connect(bump_data_version, sender=model, dispatch_uid=f'bump_data_version_save_{model.__name__}')
+    post_delete.connect(bump_data_version, sender=model, dispatch_uid=f'bump_data_version_delete_{model.__name__}')
@@ -0,0 +1,144 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .models import Task, DailyRollup
+
+
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+
+
+def parse_date_range(params):
+    """Return (date_from, date_to), defaulting to the last DEFAULT_RANGE_DAYS days."""
+    today = timezone.now().date()
+    try:
+        date_to = parse_date(params['date_to']) if params.get('date_to') else today
+        date_from = parse_date(params['date_from']) if params.get('date_from') else date_to - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    except ValueError:
+        date_to = date_from = None
+    if date_from is None or date_to is None:
+        raise ValidationError({'date_range': 'date_from and date_to must be ISO 8601 dates.'})
+    if date_from > date_to:
+        raise ValidationError({'date_range': 'date_from must not be after date_to.'})
+    if (date_to - date_from).days >= MAX_RANGE_DAYS:
+        raise ValidationError({'date_range': f'The range is limited to {MAX_RANGE_DAYS} days.'})
+    return date_from, date_to
+
+
+def day_start(day):
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def _day_series(date_from, date_to, counts):
+    days = (date_to - date_from).days + 1
+    return [
+        {'date': day.isoformat(), 'count': counts.get(day, 0)}
+        for day in (date_from + timedelta(days=i) for i in range(days))
+    ]
+
+
+def task_stats(user, params):
+    """
+    Task breakdowns for the stats/analytics pages in two GROUP BY queries:
+    one over (priority, status, category) for every count, one over the
+    completion day for the time series.
+
+    `category` narrows everything. `date_from`/`date_to` bound the
+    completion series; breakdowns cover all tasks unless `created_in_range`
+    is set, in which case only tasks created within the range are counted.
+    """
+    date_from, date_to = parse_date_range(params)
+    tasks = Task.objects.filter(user=user)
+    category = params.get('category')
+    if category and category != 'all':
+        if category not in dict(Task.CATEGORY_CHOICES):
+            raise ValidationError({'category': f'Invalid value: {category}.'})
+        tasks = tasks.filter(category=category)
+
+    breakdown_tasks = tasks
+    if params.get('created_in_range') in ('1', 'true'):
+        breakdown_tasks = tasks.filter(created_at__gte=day_start(date_from), created_at__lt=day_start(date_to + timedelta(days=1)))
+
+    today_start = day_start(timezone.now().date())
+    rows = (
+        breakdown_tasks.order_by()
+        .values('priority', 'status', 'category')
+        .annotate(
+            count=Count('id'),
+            overdue=Count('id', filter=Q(status='pending', deadline__lt=today_start)),
+        )
+    )
+
+    totals = {'total': 0, 'completed': 0, 'pending': 0, 'overdue': 0}
+    by_priority = {
+        priority: {status: 0 for status, _ in Task.STATUS_CHOICES}
+        for priority, _ in Task.PRIORITY_CHOICES
+    }
+    by_category = {category: 0 for category, _ in Task.CATEGORY_CHOICES}
+    for row in rows:
+        totals['total'] += row['count']
+        totals[row['status']] = totals.get(row['status'], 0) + row['count']
+        totals['overdue'] += row['overdue']
+        by_priority.setdefault(row['priority'], {})
+        by_priority[row['priority']][row['status']] = by_priority[row['priority']].get(row['status'], 0) + row['count']
+        category_key = row['category'] or 'Other'
+        by_category[category_key] = by_category.get(category_key, 0) + row['count']
+
+    completions = (
+        tasks.filter(
+            status='completed',
+            completed_at__gte=day_start(date_from),
+            completed_at__lt=day_start(date_to + timedelta(days=1)),
+        )
+        .annotate(day=TruncDate('completed_at'))
+        .order_by()
+        .values('day')
+        .annotate(count=Count('id'))
+    )
+
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'totals': totals,
+        'by_priority': by_priority,
+        'by_category': by_category,
+        'completions_per_day': _day_series(date_from, date_to, {row['day']: row['count'] for row in completions}),
+    }
+
+
+def daily_rollup_stats(user, params):
+    """
+    Per-day completions, study minutes and logged minutes for any date
+    range, read only from DailyRollup rows (one row per day and category).
+    """
+    date_from, date_to = parse_date_range(params)
+    rollups = DailyRollup.objects.filter(user=user, date__gte=date_from, date__lte=date_to)
+    category = params.get('category')
+    if category and category != 'all':
+        rollups = rollups.filter(category=category)
+
+    metrics = {
+        'tasks_completed': Sum('tasks_completed'),
+        'study_minutes': Sum('study_minutes'),
+        'logged_minutes': Sum('logged_minutes'),
+    }
+    per_day = {row.pop('date'): row for row in rollups.order_by().values('date').annotate(**metrics)}
+    empty = dict.fromkeys(metrics, 0)
+    days = (date_to - date_from).days + 1
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'days': [
+            {'date': day.isoformat(), **per_day.get(day, empty)}
+            for day in (date_from + timedelta(days=i) for i in range(days))
+        ],
+        'by_category': {
+            row.pop('category'): row
+            for row in rollups.order_by().values('category').annotate(**metrics)
+        },
+    }
@@ -1,3 +1,1482 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import smtplib
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    Task, Label, TaskLabel, TaskNote, Subtask, TaskComment, TimeLog,
+    TaskReminder, ActivityLog, StudySession, DailyRollup, ProductivityStat,
+    SearchDocument, TaskDependency, LinkResource, Goal, UserTheme,
+    AttachmentBlob, TaskAttachment, UploadSession, StorageUsage, Tombstone,
+)
+from . import activity, archive, attachments, caching, export, graph, importer, rollups
+from .productivity import reconcile
+from .recurrence import due_tasks, materialize, next_deadline
+from .reminders import ReminderWorker, backlog_metrics, claim
+from .search import rebuild_index
+from .rollups import rebuild_rollups
+
+
+class AuthenticatedTestCase(TestCase):
+    """Signed in through self.client as self.user (alice)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class TaskListQueryCountTest(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.label = Label.objects.create(user=self.user, name='exam')
+
+    def _create_tasks(self, count):
+        for i in range(count):
+            task = Task.objects.create(user=self.user, title=f'Task {i}')
+            TaskLabel.objects.create(task=task, label=self.label)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        self._create_tasks(2)
+        baseline = self._count_queries('/api/v1/tasks/')
+        self._create_tasks(20)
+        self.assertEqual(self._count_queries('/api/v1/tasks/'), baseline)
+
+    def test_pending_and_completed_query_count_is_constant(self):
+        self._create_tasks(2)
+        Task.objects.filter(user=self.user).update(status='completed')
+        self._create_tasks(2)
+        pending = self._count_queries('/api/v1/tasks/pending/')
+        completed = self._count_queries('/api/v1/tasks/completed/')
+        self._create_tasks(20)
+        first_ids = list(Task.objects.filter(user=self.user).values_list('id', flat=True)[:5])
+        Task.objects.filter(id__in=first_ids).update(status='completed')
+        self.assertEqual(self._count_queries('/api/v1/tasks/pending/'), pending)
+        self.assertEqual(self._count_queries('/api/v1/tasks/completed/'), completed)
+
+
+class KeysetPaginationTest(AuthenticatedTestCase):
+    def _walk(self, url):
+        ids, pages = [], 0
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any('OFFSET' in q['sql'] for q in ctx.captured_queries))
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_task_pages_follow_meta_ordering(self):
+        for i in range(7):
+            Task.objects.create(user=self.user, title=f'Task {i}', order=i % 2)
+        expected = list(Task.objects.filter(user=self.user).order_by('order', '-created_at', 'id').values_list('id', flat=True))
+        ids, pages = self._walk('/api/v1/tasks/?page_size=3')
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_note_pages_are_newest_first(self):
+        task = Task.objects.create(user=self.user, title='Essay')
+        for i in range(5):
+            TaskNote.objects.create(task=task, content=f'Note {i}')
+        expected = list(task.notes.order_by('-created_at', '-id').values_list('id', flat=True))
+        ids, _ = self._walk(f'/api/v1/tasks/{task.id}/notes/?page_size=2')
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/v1/tasks/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class TaskChangesTest(AuthenticatedTestCase):
+    def _changes(self, since=None):
+        params = {'since': since} if since else {}
+        response = self.client.get('/api/v1/tasks/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_initial_sync_returns_everything(self):
+        task = Task.objects.create(user=self.user, title='Essay')
+        Subtask.objects.create(task=task, title='Outline')
+        Label.objects.create(user=self.user, name='exam')
+        data = self._changes()
+        self.assertEqual(len(data['tasks']['updated']), 1)
+        self.assertEqual(len(data['subtasks']['updated']), 1)
+        self.assertEqual(len(data['labels']['updated']), 1)
+
+    def test_only_changes_since_cursor_are_returned(self):
+        kept = Task.objects.create(user=self.user, title='Kept')
+        edited = Task.objects.create(user=self.user, title='Edited')
+        removed = Task.objects.create(user=self.user, title='Removed')
+        subtask = Subtask.objects.create(task=kept, title='Outline')
+        # Written well before the sync, out of reach of the cursor margin.
+        Task.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        Subtask.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        cursor = self._changes()['cursor']
+
+        self.client.put(f'/api/v1/tasks/{edited.id}/', {'title': 'Edited again'}, format='json')
+        self.client.delete(f'/api/v1/tasks/{removed.id}/')
+        self.client.delete(f'/api/v1/tasks/{kept.id}/subtasks/{subtask.id}/')
+
+        data = self._changes(cursor)
+        self.assertEqual([t['id'] for t in data['tasks']['updated']], [edited.id])
+        self.assertEqual(data['tasks']['deleted'], [removed.id])
+        self.assertEqual(data['subtasks']['deleted'], [subtask.id])
+        # Recent changes come again (clients apply them by id); nothing else does.
+        again = self._changes(data['cursor'])['tasks']
+        self.assertEqual(([t['id'] for t in again['updated']], again['deleted']), ([edited.id], [removed.id]))
+
+    def test_late_commits_stamped_before_the_cursor_are_not_lost(self):
+        task = Task.objects.create(user=self.user, title='Essay')
+        cursor = self._changes()['cursor']
+        # A write stamped before the sync above but committed after it.
+        Task.objects.filter(pk=task.pk).update(title='Report', updated_at=timezone.now() - timedelta(seconds=5))
+        Tombstone.objects.create(user=self.user, model='label', object_id=7)
+        Tombstone.objects.filter(object_id=7).update(deleted_at=timezone.now() - timedelta(seconds=5))
+        data = self._changes(cursor)
+        self.assertEqual([t['title'] for t in data['tasks']['updated']], ['Report'])
+        self.assertEqual(data['labels']['deleted'], [7])
+
+    def test_cascaded_subtasks_are_covered_by_task_tombstone(self):
+        task = Task.objects.create(user=self.user, title='Essay')
+        Subtask.objects.create(task=task, title='Outline')
+        cursor = self._changes()['cursor']
+        self.client.delete(f'/api/v1/tasks/{task.id}/')
+        data = self._changes(cursor)
+        self.assertEqual(data['tasks']['deleted'], [task.id])
+        self.assertEqual(data['subtasks']['deleted'], [])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/v1/tasks/changes/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskFilterTest(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.overdue = Task.objects.create(user=self.user, title='Overdue', priority='high', deadline=now - timedelta(days=2))
+        self.today = Task.objects.create(user=self.user, title='Today', priority='low', category='Math', deadline=now)
+        self.upcoming = Task.objects.create(user=self.user, title='Upcoming', deadline=now + timedelta(days=3))
+        self.undated = Task.objects.create(user=self.user, title='Undated')
+        self.done = Task.objects.create(user=self.user, title='Done', status='completed', deadline=now - timedelta(days=5))
+
+    def _ids(self, params):
+        response = self.client.get('/api/v1/tasks/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [t['id'] for t in response.data['results']]
+
+    def test_bucket_matches_status_label(self):
+        for task in Task.objects.all():
+            response = self.client.get(f'/api/v1/tasks/{task.id}/')
+            self.assertEqual(response.data['bucket'], task.status_label)
+        self.assertEqual(self._ids({'bucket': 'overdue'}), [self.overdue.id])
+        self.assertEqual(self._ids({'bucket': 'today'}), [self.today.id])
+        self.assertCountEqual(self._ids({'bucket': 'upcoming'}), [self.upcoming.id, self.undated.id])
+
+    def test_field_filters(self):
+        self.assertEqual(self._ids({'priority': 'high'}), [self.overdue.id])
+        self.assertEqual(self._ids({'category': 'Math'}), [self.today.id])
+        self.assertEqual(self._ids({'status': 'completed'}), [self.done.id])
+        label = Label.objects.create(user=self.user, name='exam')
+        TaskLabel.objects.create(task=self.upcoming, label=label)
+        self.assertEqual(self._ids({'label': str(label.id)}), [self.upcoming.id])
+
+    def test_search_matches_title_and_description(self):
+        Task.objects.filter(pk=self.undated.pk).update(description='Read chapter 4 of the textbook')
+        self.assertEqual(self._ids({'search': 'overd'}), [self.overdue.id])
+        self.assertEqual(self._ids({'search': 'TEXTBOOK'}), [self.undated.id])
+        self.assertCountEqual(self._ids({'search': 'o', 'status': 'completed'}), [self.done.id])
+
+    def test_deadline_range(self):
+        today = timezone.now().date()
+        ids = self._ids({'deadline_after': today.isoformat(), 'deadline_before': (today + timedelta(days=3)).isoformat()})
+        self.assertCountEqual(ids, [self.today.id, self.upcoming.id])
+
+    def test_orderings_paginate(self):
+        expected = [self.done.id, self.overdue.id, self.today.id, self.upcoming.id, self.undated.id]
+        ids, url = [], '/api/v1/tasks/?ordering=deadline&page_size=2'
+        while url:
+            response = self.client.get(url)
+            ids.extend(t['id'] for t in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, expected)
+        self.assertEqual(self._ids({'ordering': 'priority'})[0], self.overdue.id)
+        self.assertEqual(self._ids({'ordering': 'bucket'})[-1], self.done.id)
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({'priority': 'urgent'}, {'ordering': 'title'}, {'deadline_after': 'soon'}, {'label': 'x'}):
+            self.assertEqual(self.client.get('/api/v1/tasks/', params).status_code, 400)
+
+
+class IndexPlanTest(TestCase):
+    """EXPLAIN the hot query shapes and check the composite indexes are picked."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='password123')
+        self.task = Task.objects.create(user=self.user, title='Essay')
+        if connection.vendor == 'postgresql':
+            # Tiny test tables would otherwise always be sequentially scanned.
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_task_access_paths(self):
+        tasks = Task.objects.filter(user=self.user)
+        self.assertUsesIndex(tasks.order_by('order', '-created_at', 'id')[:51], 'task_user_order_idx')
+        self.assertUsesIndex(tasks.filter(status='pending').order_by('order', '-created_at')[:51], 'task_user_status_order_idx')
+        self.assertUsesIndex(tasks.filter(deadline__gte=timezone.now()), 'task_user_deadline_idx')
+        self.assertUsesIndex(tasks.filter(updated_at__gte=timezone.now()), 'task_user_updated_idx')
+
+    def test_child_access_paths(self):
+        self.assertUsesIndex(TaskNote.objects.filter(task=self.task).order_by('-created_at')[:51], 'tasknote_task_created_idx')
+        self.assertUsesIndex(TaskComment.objects.filter(task=self.task).order_by('-created_at')[:51], 'comment_task_created_idx')
+        self.assertUsesIndex(Subtask.objects.filter(task=self.task).order_by('order', '-created_at'), 'subtask_task_order_idx')
+        self.assertUsesIndex(TimeLog.objects.filter(task=self.task, logged_date__gte=timezone.now().date()), 'timelog_task_date_idx')
+
+    def test_user_timeline_access_paths(self):
+        self.assertUsesIndex(TaskReminder.objects.filter(is_sent=False, remind_at__lte=timezone.now()), 'reminder_due_idx')
+        self.assertUsesIndex(ActivityLog.objects.filter(user=self.user).order_by('-timestamp')[:50], 'activity_user_time_idx')
+        self.assertUsesIndex(StudySession.objects.filter(user=self.user, started_at__gte=timezone.now()), 'study_user_started_idx')
+
+
+class TaskStatsTest(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        yesterday = timezone.now() - timedelta(days=1)
+        Task.objects.create(user=self.user, title='A', priority='high', category='Math', deadline=yesterday - timedelta(days=1))
+        Task.objects.create(user=self.user, title='B', priority='high', category='Math', status='completed')
+        Task.objects.create(user=self.user, title='C', priority='low', category='Science')
+
+    def test_breakdowns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/tasks/stats/')
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['totals'], {'total': 3, 'completed': 1, 'pending': 2, 'overdue': 1})
+        self.assertEqual(data['by_priority']['high'], {'pending': 1, 'completed': 1})
+        self.assertEqual(data['by_category']['Math'], 2)
+        self.assertEqual(len(data['completions_per_day']), 30)
+        self.assertEqual(data['completions_per_day'][-1]['count'], 1)
+        # Authentication plus the two GROUP BY queries.
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+
+    def test_filters(self):
+        data = self.client.get('/api/v1/tasks/stats/', {'category': 'Science', 'date_from': '2020-01-01', 'date_to': '2020-01-07'}).data
+        self.assertEqual(data['totals']['total'], 1)
+        self.assertEqual(len(data['completions_per_day']), 7)
+        self.assertEqual(self.client.get('/api/v1/tasks/stats/', {'date_from': 'x'}).status_code, 400)
+
+
+class DailyRollupTest(AuthenticatedTestCase):
+    def _snapshot(self):
+        return sorted(DailyRollup.objects.filter(user=self.user).exclude(
+            tasks_completed=0, study_minutes=0, logged_minutes=0,
+        ).values_list('date', 'category', 'tasks_completed', 'study_minutes', 'logged_minutes'))
+
+    def test_incremental_updates_match_rebuild(self):
+        task = Task.objects.create(user=self.user, title='Essay', category='Math')
+        other = Task.objects.create(user=self.user, title='Lab', category='Science')
+        self.client.post(f'/api/v1/tasks/{task.id}/mark_complete/')
+        self.client.post(f'/api/v1/tasks/{other.id}/mark_complete/')
+        self.client.post(f'/api/v1/tasks/{other.id}/mark_pending/')
+        self.client.post(f'/api/v1/tasks/{task.id}/time-logs/', {'duration_minutes': 30})
+        log_id = self.client.post(f'/api/v1/tasks/{other.id}/time-logs/', {'duration_minutes': 10}).data['id']
+        self.client.put(f'/api/v1/tasks/{other.id}/time-logs/{log_id}/', {'duration_minutes': 25})
+        self.client.post('/api/v1/study-sessions/', {'task': task.id, 'duration_minutes': 45, 'started_at': timezone.now().isoformat()})
+        Task.objects.get(pk=other.id).delete()
+
+        incremental = self._snapshot()
+        today = timezone.now().date()
+        self.assertEqual(incremental, [(today, 'Math', 1, 45, 30)])
+        rebuild_rollups([self.user.id])
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_time_logs_follow_a_category_change(self):
+        task = Task.objects.create(user=self.user, title='Essay', category='Math')
+        first = self.client.post(f'/api/v1/tasks/{task.id}/time-logs/', {'duration_minutes': 30}).data['id']
+        self.client.post(f'/api/v1/tasks/{task.id}/time-logs/', {'duration_minutes': 20})
+        self.client.patch(f'/api/v1/tasks/{task.id}/', {'category': 'Science'}, format='json')
+        self.client.delete(f'/api/v1/tasks/{task.id}/time-logs/{first}/')
+
+        today = timezone.now().date()
+        self.assertEqual(self._snapshot(), [(today, 'Science', 0, 0, 20)])
+        self.assertFalse(DailyRollup.objects.filter(logged_minutes__lt=0).exists())
+        rebuild_rollups([self.user.id])
+        self.assertEqual(self._snapshot(), [(today, 'Science', 0, 0, 20)])
+
+    def test_range_api_reads_rollups(self):
+        today = timezone.now().date()
+        DailyRollup.objects.create(user=self.user, date=today, category='Math', tasks_completed=2, logged_minutes=60)
+        DailyRollup.objects.create(user=self.user, date=today, category='', study_minutes=25)
+        response = self.client.get('/api/v1/analytics/daily/', {'date_from': (today - timedelta(days=6)).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['days']), 7)
+        self.assertEqual(response.data['days'][-1], {'date': today.isoformat(), 'tasks_completed': 2, 'study_minutes': 25, 'logged_minutes': 60})
+        self.assertEqual(response.data['by_category']['Math']['logged_minutes'], 60)
+
+
+class ProductivityStatTest(AuthenticatedTestCase):
+    def _counters(self):
+        stat = ProductivityStat.objects.get(user=self.user)
+        return stat.total_tasks_completed, stat.total_study_minutes, stat.current_streak, stat.last_activity_date
+
+    def test_counters_follow_completions_and_study_sessions(self):
+        today = timezone.now().date()
+        first = Task.objects.create(user=self.user, title='Essay')
+        second = Task.objects.create(user=self.user, title='Lab')
+        self.client.post(f'/api/v1/tasks/{first.id}/mark_complete/')
+        self.client.put(f'/api/v1/tasks/{second.id}/', {'title': 'Lab', 'status': 'completed'}, format='json')
+        self.client.post('/api/v1/study-sessions/', {'duration_minutes': 40, 'started_at': timezone.now().isoformat()})
+        self.assertEqual(self._counters(), (2, 40, 1, today))
+
+        self.client.post(f'/api/v1/tasks/{second.id}/mark_pending/')
+        self.assertEqual(self._counters()[0], 1)
+        response = self.client.get('/api/v1/productivity/me/')
+        self.assertEqual(response.data['current_streak'], 1)
+
+    def test_streak_extends_on_consecutive_days(self):
+        yesterday = timezone.now().date() - timedelta(days=1)
+        ProductivityStat.objects.create(user=self.user, total_tasks_completed=3, current_streak=3, last_activity_date=yesterday)
+        task = Task.objects.create(user=self.user, title='Essay')
+        self.client.post(f'/api/v1/tasks/{task.id}/mark_complete/')
+        self.assertEqual(self._counters()[:3], (4, 0, 4))
+
+    def test_reconcile_recomputes_from_history(self):
+        now = timezone.now()
+        for days_ago in (0, 1, 2, 5):
+            Task.objects.create(user=self.user, title=f'T{days_ago}', status='completed', completed_at=now - timedelta(days=days_ago))
+        StudySession.objects.create(user=self.user, duration_minutes=30, started_at=now)
+        ProductivityStat.objects.filter(user=self.user).update(total_tasks_completed=99, current_streak=0)
+        reconcile([self.user.id])
+        self.assertEqual(self._counters(), (4, 30, 3, now.date()))
+
+
+class TaskRankingTest(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tasks = [Task.objects.create(user=self.user, title=f'T{i}') for i in range(4)]
+        self.client.post('/api/v1/tasks/update_order/', {'order': [t.id for t in self.tasks]}, format='json')
+
+    def _order(self):
+        return list(Task.objects.filter(user=self.user).order_by('order', '-created_at', 'id').values_list('id', flat=True))
+
+    def test_update_order_is_one_statement(self):
+        ids = [t.id for t in reversed(self.tasks)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/v1/tasks/update_order/', {'order': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 1)
+        self.assertEqual(self._order(), ids)
+
+    def test_move_only_writes_the_moved_task(self):
+        a, b, c, d = self.tasks
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f'/api/v1/tasks/{d.id}/move/', {'after': a.id, 'before': b.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 1)
+        self.assertEqual(self._order(), [a.id, d.id, b.id, c.id])
+        self.client.post(f'/api/v1/tasks/{a.id}/move/', {'after': c.id}, format='json')
+        self.assertEqual(self._order(), [d.id, b.id, c.id, a.id])
+
+    def test_exhausted_gap_triggers_rebalance(self):
+        a, b, c, d = self.tasks
+        for _ in range(60):
+            self.client.post(f'/api/v1/tasks/{c.id}/move/', {'after': a.id, 'before': b.id}, format='json')
+            self.client.post(f'/api/v1/tasks/{b.id}/move/', {'after': a.id, 'before': c.id}, format='json')
+        self.assertEqual(self._order(), [a.id, b.id, c.id, d.id])
+
+    def test_invalid_neighbours_are_rejected(self):
+        a, b = self.tasks[:2]
+        self.assertEqual(self.client.post(f'/api/v1/tasks/{a.id}/move/', {'after': a.id}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(f'/api/v1/tasks/{a.id}/move/', {'after': 999999}, format='json').status_code, 400)
+        subtask = Subtask.objects.create(task=a, title='Outline')
+        for url in (f'/api/v1/tasks/{a.id}/move/', f'/api/v1/tasks/{a.id}/subtasks/{subtask.id}/move/'):
+            for body in ({'after': 'abc'}, {'after': [b.id]}, {'before': {'id': b.id}}, {'before': True}):
+                response = self.client.post(url, body, format='json')
+                self.assertEqual(response.status_code, 400, (url, body))
+                self.assertIn(next(iter(body)), response.data)
+
+    def test_subtask_move_and_reorder(self):
+        task = self.tasks[0]
+        subtasks = [Subtask.objects.create(task=task, title=f'S{i}') for i in range(3)]
+        url = f'/api/v1/tasks/{task.id}/subtasks/'
+        self.client.post(url + 'reorder/', {'order': [s.id for s in subtasks]}, format='json')
+        self.client.post(url + f'{subtasks[2].id}/move/', {'before': subtasks[0].id}, format='json')
+        ordered = list(task.subtasks.order_by('order').values_list('id', flat=True))
+        self.assertEqual(ordered, [subtasks[2].id, subtasks[0].id, subtasks[1].id])
+
+
+class TaskBatchTest(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = Task.objects.create(user=self.user, title='First')
+        self.second = Task.objects.create(user=self.user, title='Second')
+        self.third = Task.objects.create(user=self.user, title='Third')
+
+    def _batch(self, operations):
+        return self.client.post('/api/v1/tasks/batch/', {'operations': operations}, format='json')
+
+    def test_applies_all_operations(self):
+        response = self._batch([
+            {'op': 'create', 'data': {'title': 'New', 'priority': 'high'}},
+            {'op': 'update', 'id': self.first.id, 'data': {'title': 'Renamed'}},
+            {'op': 'complete', 'id': self.second.id},
+            {'op': 'delete', 'id': self.third.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        statuses = [r['status'] for r in response.data['results']]
+        self.assertEqual(statuses, ['created', 'updated', 'updated', 'deleted'])
+        self.assertTrue(Task.objects.filter(user=self.user, title='New', priority='high').exists())
+        self.assertEqual(Task.objects.get(pk=self.first.id).title, 'Renamed')
+        second = Task.objects.get(pk=self.second.id)
+        self.assertEqual(second.status, 'completed')
+        self.assertIsNotNone(second.completed_at)
+        self.assertFalse(Task.objects.filter(pk=self.third.id).exists())
+        # post_save side effects still run for bulk-written rows.
+        self.assertEqual(ProductivityStat.objects.get(user=self.user).total_tasks_completed, 1)
+
+    def test_invalid_operation_aborts_whole_batch(self):
+        response = self._batch([
+            {'op': 'delete', 'id': self.first.id},
+            {'op': 'update', 'id': self.second.id, 'data': {'priority': 'urgent'}},
+            {'op': 'complete', 'id': 999999},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], ['valid', 'error', 'error'])
+        self.assertTrue(Task.objects.filter(pk=self.first.id).exists())
+
+    def test_malformed_bodies_are_rejected(self):
+        for body in ([{'op': 'delete', 'id': self.first.id}], {'operations': {'op': 'delete'}}, {'operations': 'all'}):
+            response = self.client.post('/api/v1/tasks/batch/', body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('operations', response.data['results'][0]['errors'])
+        response = self._batch([{'op': 'delete', 'id': [self.first.id]}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'][0]['errors'], {'id': 'Not found.'})
+        self.assertTrue(Task.objects.filter(pk=self.first.id).exists())
+
+    def test_tasks_are_written_in_bulk(self):
+        operations = [{'op': 'create', 'data': {'title': f'T{i}'}} for i in range(10)]
+        operations += [{'op': 'complete', 'id': task.id} for task in (self.first, self.second, self.third)]
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._batch(operations).status_code, 200)
+        statements = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(sum(s.startswith('INSERT INTO "tasks_app_task"') for s in statements), 1)
+        self.assertEqual(sum(s.startswith('UPDATE "tasks_app_task"') for s in statements), 1)
+
+
+class SearchTest(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(user=self.user, title='History essay', description='Draft about the treaty')
+        self.note = TaskNote.objects.create(task=self.task, content='Check the treaty dates')
+        self.subtask = Subtask.objects.create(task=self.task, title='Bibliography')
+        other = User.objects.create_user(username='bob', password='password123')
+        Task.objects.create(user=other, title='Treaty notes')
+
+    def _search(self, q):
+        response = self.client.get('/api/v1/search/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [(r['kind'], r['id']) for r in response.data['results']]
+
+    def test_matches_across_kinds_for_owner_only(self):
+        self.assertCountEqual(self._search('treaty'), [('task', self.task.id), ('note', self.note.id)])
+        self.assertEqual(self._search('biblio'), [('subtask', self.subtask.id)])
+        self.assertEqual(self._search('essay draft'), [('task', self.task.id)])
+        self.assertEqual(self._search('"); DROP'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.client.put(f'/api/v1/tasks/{self.task.id}/', {'title': 'Geography report'}, format='json')
+        self.assertEqual(self._search('essay'), [])
+        self.assertEqual(self._search('geography'), [('task', self.task.id)])
+        self.client.delete(f'/api/v1/tasks/{self.task.id}/notes/{self.note.id}/')
+        self.assertEqual(self._search('dates'), [])
+        self.client.delete(f'/api/v1/tasks/{self.task.id}/')
+        self.assertEqual(self._search('bibliography'), [])
+        self.assertFalse(SearchDocument.objects.filter(user=self.user).exists())
+
+    def test_rebuild(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self._search('treaty'), [])
+        self.assertEqual(rebuild_index(), 4)
+        self.assertEqual(len(self._search('treaty')), 2)
+
+
+class RecurrenceTest(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = datetime(2024, 3, 10, 12, tzinfo=dt_timezone.utc)
+        self.label = Label.objects.create(user=self.user, name='exam')
+
+    def _recurring(self, recurrence, deadline, **kwargs):
+        task = Task.objects.create(user=self.user, title=f'{recurrence} review', recurrence=recurrence, deadline=deadline, **kwargs)
+        TaskLabel.objects.create(task=task, label=self.label)
+        Subtask.objects.create(task=task, title='Read', order=0)
+        Subtask.objects.create(task=task, title='Summarise', order=1)
+        return task
+
+    def test_calendar_arithmetic(self):
+        jan31 = datetime(2024, 1, 31, 9, tzinfo=dt_timezone.utc)
+        self.assertEqual(next_deadline(jan31, 'monthly', jan31), datetime(2024, 2, 29, 9, tzinfo=dt_timezone.utc))
+        self.assertEqual(next_deadline(jan31, 'monthly', datetime(2024, 2, 29, 9, tzinfo=dt_timezone.utc)), datetime(2024, 3, 31, 9, tzinfo=dt_timezone.utc))
+        self.assertEqual(next_deadline(jan31, 'weekly', datetime(2024, 2, 14, 9, tzinfo=dt_timezone.utc)), datetime(2024, 2, 21, 9, tzinfo=dt_timezone.utc))
+        self.assertEqual(next_deadline(jan31, 'daily', datetime(2024, 3, 1, 10, tzinfo=dt_timezone.utc)), datetime(2024, 3, 2, 9, tzinfo=dt_timezone.utc))
+
+    def test_materialize_is_bulk_and_idempotent(self):
+        monthly = self._recurring('monthly', datetime(2024, 1, 31, 9, tzinfo=dt_timezone.utc))
+        weekly = self._recurring('weekly', self.now - timedelta(hours=1))
+        self._recurring('daily', self.now + timedelta(days=2))
+        Task.objects.create(user=self.user, title='One-off', deadline=self.now - timedelta(days=1))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(materialize(now=self.now), 2)
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "tasks_app_task"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(materialize(now=self.now), 0)
+
+        # Missed occurrences are skipped; the series keeps its day of month.
+        next_monthly = Task.objects.get(parent_task=monthly)
+        self.assertEqual(next_monthly.deadline, datetime(2024, 3, 31, 9, tzinfo=dt_timezone.utc))
+        next_weekly = Task.objects.get(parent_task=weekly)
+        self.assertEqual(next_weekly.deadline, weekly.deadline + timedelta(weeks=1))
+        self.assertEqual(list(next_weekly.subtasks.values_list('title', flat=True)), ['Read', 'Summarise'])
+        self.assertEqual(list(next_weekly.labels.values_list('label', flat=True)), [self.label.id])
+
+        # The new instance becomes the source of the next one, anchored on the root.
+        materialize(now=datetime(2024, 4, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(
+            list(Task.objects.filter(parent_task=monthly).order_by('deadline').values_list('deadline', flat=True)),
+            [datetime(2024, 3, 31, 9, tzinfo=dt_timezone.utc), datetime(2024, 4, 30, 9, tzinfo=dt_timezone.utc)],
+        )
+
+    def test_due_query_uses_index(self):
+        plan = due_tasks(self.now).order_by('deadline')[:500].explain()
+        self.assertIn('task_recurrence_due_idx', plan)
+
+    def test_create_recurring_endpoint(self):
+        task = self._recurring('weekly', timezone.now() + timedelta(days=3))
+        response = self.client.post(f'/api/v1/tasks/{task.id}/create_recurring/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['deadline'], (task.deadline + timedelta(weeks=1)).isoformat().replace('+00:00', 'Z'))
+        self.assertEqual(len(response.data['labels']), 1)
+        self.assertEqual(self.client.post(f'/api/v1/tasks/{task.id}/create_recurring/').status_code, 400)
+        self.assertEqual(materialize(now=task.deadline), 0)
+
+
+class ReminderDispatchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='password123', email='alice@example.com')
+        self.task = Task.objects.create(user=self.user, title='Essay')
+        self.now = timezone.now()
+        self.due = [
+            TaskReminder.objects.create(task=self.task, type='email', remind_at=self.now - timedelta(minutes=i))
+            for i in range(3)
+        ]
+        TaskReminder.objects.create(task=self.task, type='email', remind_at=self.now + timedelta(hours=1))
+        TaskReminder.objects.create(task=self.task, type='browser', remind_at=self.now - timedelta(minutes=1))
+
+    def test_sends_due_email_reminders_in_bulk(self):
+        worker = ReminderWorker(batch_size=2)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(worker.run_once(self.now), 2)
+        # Claim UPDATE, fetch, mark-sent UPDATE (plus savepoints).
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 2)
+        self.assertEqual(worker.run_once(self.now), 1)
+        self.assertEqual(worker.run_once(self.now), 0)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['alice@example.com'])
+        self.assertEqual(mail.outbox[0].subject, 'Reminder: Essay')
+        self.assertEqual(set(TaskReminder.objects.filter(is_sent=True).values_list('id', flat=True)), {r.id for r in self.due})
+        self.assertEqual(worker.metrics.sent, 3)
+
+    def test_claims_are_leased(self):
+        first = claim(self.now, 10)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(claim(self.now, 10), [])
+        # An abandoned claim is picked up again once its lease runs out.
+        self.assertEqual(len(claim(self.now + timedelta(minutes=10), 10)), 3)
+
+    def test_failing_reminders_are_given_up_on(self):
+        worker = ReminderWorker(batch_size=10, max_attempts=2)
+        with mock.patch.object(worker, '_connection', side_effect=smtplib.SMTPServerDisconnected()):
+            self.assertEqual(worker.run_once(self.now), 3)
+            self.assertEqual(worker.run_once(self.now + timedelta(minutes=10)), 3)
+            self.assertEqual(worker.run_once(self.now + timedelta(minutes=20)), 0)
+        self.assertEqual(worker.metrics.failed, 6)
+        self.assertEqual(set(TaskReminder.objects.filter(type='email', is_sent=False).values_list('attempts', flat=True)), {0, 2})
+        with mock.patch('tasks_app.reminders.MAX_ATTEMPTS', 2):
+            self.assertEqual(backlog_metrics(self.now + timedelta(minutes=20))['given_up'], 3)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/v1/reminders/metrics/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        data = client.get('/api/v1/reminders/metrics/').data
+        self.assertEqual(data['due'], 3)
+        self.assertGreater(data['lag_seconds'], 0)
+
+
+class DependencyGraphTest(AuthenticatedTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        # research -> outline -> draft, research -> slides; draft is the long chain.
+        self.research, self.outline, self.draft, self.slides = (
+            Task.objects.create(user=self.user, title=title) for title in ('Research', 'Outline', 'Draft', 'Slides')
+        )
+        for task, minutes in ((self.research, 60), (self.outline, 30), (self.draft, 120), (self.slides, 45)):
+            TimeLog.objects.create(task=task, duration_minutes=10, estimated_minutes=minutes)
+        self._depend(self.outline, self.research)
+        self._depend(self.draft, self.outline)
+        self._depend(self.slides, self.research)
+
+    def _depend(self, task, on):
+        return self.client.post(f'/api/v1/tasks/{task.id}/dependencies/', {'depends_on_task': on.id}, format='json')
+
+    def test_rejects_cycles_and_duplicates(self):
+        response = self._depend(self.research, self.draft)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cycle', str(response.data['depends_on_task']))
+        self.assertEqual(self._depend(self.draft, self.outline).status_code, 400)
+        self.assertEqual(self._depend(self.draft, self.draft).status_code, 400)
+        other = Task.objects.create(user=User.objects.create_user(username='bob', password='x'), title='Theirs')
+        self.assertEqual(self._depend(self.draft, other).status_code, 400)
+        self.assertEqual(TaskDependency.objects.count(), 3)
+
+    def test_graph(self):
+        data = self.client.get('/api/v1/tasks/graph/').data
+        blocked = {node['id'] for node in data['nodes'] if node['blocked']}
+        self.assertEqual(blocked, {self.outline.id, self.draft.id, self.slides.id})
+        order = data['order']
+        self.assertLess(order.index(self.research.id), order.index(self.outline.id))
+        self.assertLess(order.index(self.outline.id), order.index(self.draft.id))
+        self.assertEqual(data['critical_path'], {'tasks': [self.research.id, self.outline.id, self.draft.id], 'minutes': 210})
+
+    def test_graph_is_cached_until_invalidated(self):
+        self.client.get('/api/v1/tasks/graph/')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/v1/tasks/graph/')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        self.client.post(f'/api/v1/tasks/{self.research.id}/mark_complete/')
+        data = self.client.get('/api/v1/tasks/graph/').data
+        self.assertEqual({node['id'] for node in data['nodes'] if node['blocked']}, {self.draft.id})
+        self.assertEqual(data['critical_path']['minutes'], 150)
+
+        TaskDependency.objects.get(dependent_task=self.draft).delete()
+        data = self.client.get('/api/v1/tasks/graph/').data
+        self.assertEqual(len(data['edges']), 2)
+
+    def test_graph_is_invalidated_again_on_commit(self):
+        stale = graph.get_graph(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskDependency.objects.get(dependent_task=self.draft).delete()
+            # Another request, reading before the commit, caches the old graph.
+            cache.set(graph._cache_key(self.user.id), stale)
+        self.assertEqual(len(graph.get_graph(self.user.id)['edges']), 2)
+
+    def test_dependency_list_is_not_n_plus_one(self):
+        self._depend(self.draft, self.slides)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/v1/tasks/{self.draft.id}/dependencies/')
+        self.assertEqual([d['depends_on']['title'] for d in response.data], ['Outline', 'Slides'])
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class TaskDetailTest(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(user=self.user, title='Essay')
+        self.other = Task.objects.create(user=self.user, title='Research')
+
+    def _populate(self, n):
+        for i in range(n):
+            TaskNote.objects.create(task=self.task, content=f'Note {i}')
+            Subtask.objects.create(task=self.task, title=f'Step {i}', order=i)
+            TaskComment.objects.create(task=self.task, user=User.objects.create_user(username=f'u{self.task.comments.count()}'), content='Hi')
+            TimeLog.objects.create(task=self.task, duration_minutes=10)
+            TaskReminder.objects.create(task=self.task, type='email', remind_at=timezone.now())
+            LinkResource.objects.create(task=self.task, title='Docs', url='https://example.com')
+        TaskDependency.objects.get_or_create(dependent_task=self.task, depends_on_task=self.other)
+
+    def _full(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/v1/tasks/{self.task.id}/full/', params)
+        return response, len(ctx.captured_queries)
+
+    def test_query_count_is_fixed(self):
+        self._populate(1)
+        response, baseline = self._full()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Essay')
+        self.assertEqual(response.data['dependencies'][0]['depends_on']['title'], 'Research')
+        self.assertEqual(response.data['comments'][0]['user']['username'], 'u0')
+        self._populate(4)
+        response, queries = self._full()
+        self.assertEqual(len(response.data['notes']), 5)
+        self.assertEqual(len(response.data['resources']), 5)
+        self.assertEqual(queries, baseline)
+
+    def test_include_trims_sections(self):
+        self._populate(1)
+        _, everything = self._full()
+        response, queries = self._full(include='notes,subtasks')
+        self.assertIn('notes', response.data)
+        self.assertNotIn('comments', response.data)
+        self.assertEqual(queries, everything - 6)
+        self.assertEqual(self._full(include='notes,secrets')[0].status_code, 400)
+
+    def test_other_users_task_is_not_found(self):
+        task = Task.objects.create(user=User.objects.create_user(username='bob'), title='Theirs')
+        self.assertEqual(self.client.get(f'/api/v1/tasks/{task.id}/full/').status_code, 404)
+
+
+class TaskRollupAnnotationTest(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.half = Task.objects.create(user=self.user, title='Half', order=1)
+        self.done = Task.objects.create(user=self.user, title='Done', order=2)
+        self.bare = Task.objects.create(user=self.user, title='Bare', order=3)
+        for status in ('completed', 'pending'):
+            Subtask.objects.create(task=self.half, title='Step', status=status)
+        Subtask.objects.create(task=self.done, title='Step', status='completed')
+        TimeLog.objects.create(task=self.half, duration_minutes=90, estimated_minutes=60)
+        TimeLog.objects.create(task=self.half, duration_minutes=30)
+        TimeLog.objects.create(task=self.done, duration_minutes=20, estimated_minutes=45)
+
+    def _ids(self, **params):
+        response = self.client.get('/api/v1/tasks/', params)
+        self.assertEqual(response.status_code, 200)
+        return [task['id'] for task in response.data['results']]
+
+    def test_list_carries_rollups(self):
+        tasks = {task['id']: task for task in self.client.get('/api/v1/tasks/').data['results']}
+        half = tasks[self.half.id]
+        self.assertEqual((half['subtask_count'], half['subtasks_completed'], half['progress']), (2, 1, 0.5))
+        self.assertEqual((half['spent_minutes'], half['estimated_minutes']), (120, 60))
+        self.assertEqual((tasks[self.bare.id]['subtask_count'], tasks[self.bare.id]['progress']), (0, None))
+
+    def test_sort_and_filter_by_progress_and_overrun(self):
+        self.assertEqual(self._ids(ordering='-progress'), [self.done.id, self.half.id, self.bare.id])
+        self.assertEqual(self._ids(progress_min='0.5', progress_max='0.9'), [self.half.id])
+        self.assertEqual(self._ids(overrun='true'), [self.half.id])
+        self.assertEqual(self._ids(ordering='overrun'), [self.done.id, self.bare.id, self.half.id])
+
+    def test_progress_ordering_paginates(self):
+        first = self.client.get('/api/v1/tasks/', {'ordering': '-progress', 'page_size': 2}).data
+        second = self.client.get(first['next']).data
+        self.assertEqual([t['id'] for t in first['results'] + second['results']], [self.done.id, self.half.id, self.bare.id])
+
+
+class ResponseCacheTest(AuthenticatedTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.task = Task.objects.create(user=self.user, title='Essay')
+        # Created by the first visit to /theme/me/ and /productivity/me/.
+        UserTheme.objects.create(user=self.user)
+        ProductivityStat.objects.create(user=self.user)
+
+    def _get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(ctx.captured_queries)
+
+    def test_repeated_reads_skip_the_database(self):
+        for url in ('/api/v1/tasks/', '/api/v1/labels/', '/api/v1/goals/', '/api/v1/filter-presets/', '/api/v1/theme/me/', '/api/v1/productivity/me/'):
+            self._get(url)
+            self.assertEqual(self._get(url)[1], 0, url)
+
+    def test_writes_invalidate(self):
+        self._get('/api/v1/tasks/')
+        self.client.patch(f'/api/v1/tasks/{self.task.id}/', {'title': 'Report'}, format='json')
+        data, _ = self._get('/api/v1/tasks/')
+        self.assertEqual(data['results'][0]['title'], 'Report')
+
+        Subtask.objects.create(task=self.task, title='Outline')
+        self.assertEqual(self._get('/api/v1/tasks/')[0]['results'][0]['subtask_count'], 1)
+
+        self._get('/api/v1/productivity/me/')
+        self.client.post(f'/api/v1/tasks/{self.task.id}/mark_complete/')
+        self.assertEqual(self._get('/api/v1/productivity/me/')[0]['total_tasks_completed'], 1)
+
+        self._get('/api/v1/theme/me/')
+        UserTheme.objects.filter(user=self.user).update(dark_mode=True)
+        # Queryset updates bypass signals: still the cached copy ...
+        self.assertFalse(self._get('/api/v1/theme/me/')[0]['dark_mode'])
+        self.client.put('/api/v1/theme/me/', {'font_family': 'Serif'}, format='json')
+        self.assertEqual(self._get('/api/v1/theme/me/')[0]['font_family'], 'Serif')
+
+    def test_cache_is_per_user_and_per_query(self):
+        self._get('/api/v1/goals/')
+        other = User.objects.create_user(username='bob', password='password123')
+        Goal.objects.create(user=other, title='Read', target_count=3, period='weekly')
+        self.client.force_authenticate(other)
+        self.assertEqual(len(self._get('/api/v1/goals/')[0]), 1)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(len(self._get('/api/v1/goals/')[0]), 0)
+        self.assertEqual(self._get('/api/v1/tasks/', status='completed')[0]['results'], [])
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', password='password123')
+        self.client = APIClient()
+        tokens = self.client.post('/api/v1/auth/token/', {'username': 'alice', 'password': 'password123'}).data
+        self.refresh = tokens['refresh']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+    def test_user_is_not_loaded_per_request(self):
+        self.assertEqual(self.client.get('/api/v1/users/me/').data['username'], 'alice')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/users/me/')
+        self.assertEqual(response.data['username'], 'alice')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_deactivation_and_password_change(self):
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 401)
+        self.user.is_active = True
+        self.user.set_password('password456')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 401)
+
+    def test_revoke_tokens(self):
+        self.assertEqual(self.client.post('/api/v1/users/revoke_tokens/').status_code, 204)
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 401)
+        self.client.credentials()
+        self.assertEqual(self.client.post('/api/v1/auth/token/refresh/', {'refresh': self.refresh}).status_code, 401)
+
+
+class ConditionalGetTest(AuthenticatedTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.task = Task.objects.create(user=self.user, title='Essay')
+
+    def test_unchanged_data_is_answered_with_304(self):
+        for url in ('/api/v1/tasks/', f'/api/v1/tasks/{self.task.id}/', f'/api/v1/tasks/{self.task.id}/notes/', '/api/v1/study-sessions/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn('Last-Modified', response)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(len(ctx.captured_queries), 0, url)
+
+    def test_writes_change_the_etag(self):
+        url = f'/api/v1/tasks/{self.task.id}/full/'
+        etag = self.client.get(url)['ETag']
+        TaskNote.objects.create(task=self.task, content='Draft')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['notes']), 1)
+
+    def test_etag_depends_on_query_and_user(self):
+        etag = self.client.get('/api/v1/tasks/')['ETag']
+        self.assertEqual(self.client.get('/api/v1/tasks/', {'status': 'completed'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.client.force_authenticate(User.objects.create_user(username='bob', password='password123'))
+        self.assertEqual(self.client.get('/api/v1/tasks/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_subtask_reordering_changes_the_etag(self):
+        first, second = (Subtask.objects.create(task=self.task, title=title) for title in ('Outline', 'Draft'))
+        urls = (f'/api/v1/tasks/{self.task.id}/subtasks/', f'/api/v1/tasks/{self.task.id}/full/?include=subtasks')
+        for path, data in (
+            (f'/api/v1/tasks/{self.task.id}/subtasks/{second.id}/move/', {'before': first.id}),
+            (f'/api/v1/tasks/{self.task.id}/subtasks/reorder/', {'order': [first.id, second.id]}),
+        ):
+            etags = [self.client.get(url)['ETag'] for url in urls]
+            self.assertEqual(self.client.post(path, data, format='json').status_code, 200)
+            for url, etag in zip(urls, etags):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200, url)
+
+    def test_process_local_cache_is_warned_about(self):
+        self.assertEqual(caching.check_shared_cache(), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([warning.id for warning in caching.check_shared_cache()], ['tasks_app.W001'])
+
+    def test_tests_do_not_share_the_development_cache(self):
+        self.assertNotEqual(settings.CACHES['default']['LOCATION'], str(settings.BASE_DIR / 'cache'))
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/v1/labels/')['Last-Modified']
+        self.assertEqual(self.client.get('/api/v1/labels/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get('/api/v1/labels/', HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200)
+
+
+class ActivityLogTest(AuthenticatedTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.label = Label.objects.create(user=self.user, name='School')
+
+    def tearDown(self):
+        activity.flush()
+
+    def _write(self, method, url, data=None):
+        # Entries are queued when the write commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, data, format='json')
+
+    def test_changes_are_buffered_and_written_in_bulk(self):
+        task_id = self._write('post', '/api/v1/tasks/', {'title': 'Essay'}).data['id']
+        self._write('patch', f'/api/v1/tasks/{task_id}/', {'title': 'Report'})
+        self._write('post', f'/api/v1/tasks/{task_id}/mark_complete/')
+        self._write('delete', f'/api/v1/tasks/{task_id}/')
+        self.assertFalse(ActivityLog.objects.exists())
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(activity.flush(), 4)
+        self.assertEqual(sum('INSERT INTO "tasks_app_activitylog"' in q['sql'] for q in ctx.captured_queries), 1)
+        entries = self.client.get('/api/v1/activity/').data
+        self.assertEqual([entry['action'] for entry in entries], ['delete', 'complete', 'update', 'create'])
+        self.assertEqual(entries[2]['old_data'], {'title': 'Essay'})
+        self.assertEqual(entries[2]['new_data'], {'title': 'Report'})
+
+    def test_undo_and_redo(self):
+        task_id = self._write('post', '/api/v1/tasks/', {'title': 'Essay'}).data['id']
+        TaskLabel.objects.create(task_id=task_id, label=self.label)
+        self._write('patch', f'/api/v1/tasks/{task_id}/', {'title': 'Report'})
+        self._write('delete', f'/api/v1/tasks/{task_id}/')
+
+        response = self.client.post('/api/v1/activity/undo/')
+        self.assertEqual(response.data['entry']['action'], 'delete')
+        self.assertEqual(response.data['task']['title'], 'Report')
+        self.assertEqual(response.data['task']['labels'][0]['label']['name'], 'School')
+        self.assertEqual(self.client.post('/api/v1/activity/undo/').data['task']['title'], 'Essay')
+        self.assertIsNone(self.client.post('/api/v1/activity/undo/').data['task'])
+        self.assertFalse(Task.objects.filter(pk=task_id).exists())
+        self.assertEqual(self.client.post('/api/v1/activity/undo/').status_code, 400)
+
+        self.assertEqual(self.client.post('/api/v1/activity/redo/').data['task']['id'], task_id)
+        self.assertEqual(self.client.post('/api/v1/activity/redo/').data['task']['title'], 'Report')
+        # Undo/redo themselves are not logged.
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+        self._write('patch', f'/api/v1/tasks/{task_id}/', {'priority': 'high'})
+        self.assertEqual(self.client.post('/api/v1/activity/redo/').status_code, 400)
+
+    def test_undoing_a_delete_restores_what_it_cascaded_to(self):
+        task_id = self._write('post', '/api/v1/tasks/', {'title': 'Essay', 'recurrence': 'weekly'}).data['id']
+        other = Task.objects.create(user=self.user, title='Outline')
+        # The scheduler already created this week's successor.
+        Task.objects.filter(pk=task_id).update(recurrence_pending=False)
+        subtask = Subtask.objects.create(task_id=task_id, title='Sources', status='completed')
+        reminder = TaskReminder.objects.create(task_id=task_id, remind_at=timezone.now() + timedelta(days=1), type='email')
+        log = TimeLog.objects.create(task_id=task_id, duration_minutes=45)
+        logged = timezone.now().date() - timedelta(days=3)
+        TimeLog.objects.filter(pk=log.pk).update(logged_date=logged)
+        rollups.rebuild_rollups(user_ids=[self.user.id])
+        TaskDependency.objects.create(dependent_task_id=task_id, depends_on_task=other)
+        note = TaskNote.objects.create(task_id=task_id, content='Check the rubric')
+        comment = TaskComment.objects.create(task_id=task_id, user=self.user, content='Looks good')
+        link = LinkResource.objects.create(task_id=task_id, title='Guide', url='https://example.com/guide')
+        self._write('delete', f'/api/v1/tasks/{task_id}/')
+        self.assertFalse(TimeLog.objects.exists())
+        self.assertTrue(Tombstone.objects.filter(model='task', object_id=task_id).exists())
+
+        self.assertEqual(self.client.post('/api/v1/activity/undo/').status_code, 200)
+        task = Task.objects.get(pk=task_id)
+        self.assertFalse(task.recurrence_pending)
+        self.assertEqual(list(task.subtasks.values_list('id', 'title', 'status')), [(subtask.id, 'Sources', 'completed')])
+        self.assertEqual(list(task.reminders.values_list('id', 'type')), [(reminder.id, 'email')])
+        self.assertEqual(list(task.time_logs.values_list('id', 'duration_minutes', 'logged_date')), [(log.id, 45, logged)])
+        self.assertTrue(TaskDependency.objects.filter(dependent_task_id=task_id, depends_on_task=other).exists())
+        self.assertEqual(DailyRollup.objects.get(user=self.user, date=logged).logged_minutes, 45)
+        self.assertTrue(SearchDocument.objects.filter(kind='subtask', object_id=subtask.id).exists())
+        self.assertEqual(list(task.notes.values_list('id', 'content')), [(note.id, 'Check the rubric')])
+        self.assertEqual(list(task.comments.values_list('id', 'user_id')), [(comment.id, self.user.id)])
+        self.assertEqual(list(task.link_resources.values_list('id', 'url')), [(link.id, 'https://example.com/guide')])
+        self.assertTrue(SearchDocument.objects.filter(kind='note', object_id=note.id).exists())
+        self.assertFalse(Tombstone.objects.filter(model='task', object_id=task_id).exists())
+
+    def test_undoing_the_delete_of_a_task_with_attachments_is_refused(self):
+        task_id = self._write('post', '/api/v1/tasks/', {'title': 'Essay'}).data['id']
+        TaskAttachment.objects.create(task_id=task_id, file='attachments/essay.pdf', size=10, file_name='essay.pdf')
+        self._write('delete', f'/api/v1/tasks/{task_id}/')
+        response = self.client.post('/api/v1/activity/undo/')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('attachments', response.data['error'])
+        self.assertFalse(Task.objects.filter(pk=task_id).exists())
+
+    def test_undo_refuses_to_overwrite_unlogged_changes(self):
+        task_id = self._write('post', '/api/v1/tasks/', {'title': 'Essay'}).data['id']
+        self._write('patch', f'/api/v1/tasks/{task_id}/', {'title': 'Report'})
+        Task.objects.filter(pk=task_id).update(title='Thesis')
+        self.assertEqual(self.client.post('/api/v1/activity/undo/').status_code, 409)
+        self.assertEqual(Task.objects.get(pk=task_id).title, 'Thesis')
+
+
+class ActivityArchiveTest(AuthenticatedTestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        settings_override = override_settings(ACTIVITY_ARCHIVE_DIR=self.archive_dir, ACTIVITY_RETENTION_DAYS=90)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        super().setUp()
+        now = timezone.now()
+        # Old entries spread over several months, plus a few recent ones.
+        self.entries = ActivityLog.objects.bulk_create([
+            ActivityLog(user=self.user, action='update', task_id=i % 2, old_data={'title': f'v{i}'}, new_data={'title': f'v{i + 1}'}, timestamp=now - timedelta(days=200 - 10 * i))
+            for i in range(20)
+        ])
+
+    def _history(self, **params):
+        entries, url = [], '/api/v1/activity/history/'
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            entries += response.data['results']
+            url, params = response.data['next'], None
+        return [entry['id'] for entry in entries]
+
+    def test_old_entries_move_to_compacted_archive(self):
+        self.assertEqual(archive.archive_activity(chunk_size=3), 12)
+        self.assertEqual(ActivityLog.objects.count(), 8)
+        files = sorted(archive.user_dir(self.user.id).glob('*.ndjson.gz'))
+        self.assertGreater(len(files), 1)
+        # Compacted: one gzip member per file, entries in order.
+        for path in files:
+            with open(path, 'rb') as raw:
+                self.assertEqual(raw.read().count(b'\x1f\x8b\x08'), 1)
+            records = archive.read_file(path)
+            self.assertEqual(records, sorted(records, key=lambda record: record['timestamp']))
+        self.assertEqual(sum(len(archive.read_file(path)) for path in files), 12)
+        self.assertEqual(archive.archive_activity(), 0)
+
+    def test_history_merges_live_and_archived_entries(self):
+        archive.archive_activity(chunk_size=4)
+        expected = [entry.id for entry in reversed(self.entries)]
+        self.assertEqual(self._history(page_size=3), expected)
+        self.assertEqual(self._history(page_size=4, task_id=1), [pk for pk in expected if pk % 2 == self.entries[1].id % 2])
+        entry = self.client.get('/api/v1/activity/history/', {'page_size': 20}).data['results'][-1]
+        self.assertEqual(entry['old_data'], {'title': 'v0'})
+
+    def test_entries_archived_twice_or_not_yet_deleted_are_listed_once(self):
+        entries = ActivityLog.objects.order_by('id')[:5]
+        for _ in range(2):
+            archive._write(archive._path(self.user.id, archive._month(entries[0].timestamp)), [archive._record(entry) for entry in entries], 'ab')
+        self.assertEqual(self._history(page_size=7), [entry.id for entry in reversed(self.entries)])
+
+    def test_damaged_members_are_skipped_and_not_compacted_away(self):
+        entries = list(ActivityLog.objects.order_by('id')[:3])
+        path = archive._path(self.user.id, archive._month(entries[0].timestamp))
+        archive._write(path, [archive._record(entries[0])], 'ab')
+        with open(path, 'ab') as raw:
+            damaged = gzip.compress(b'{"id": 0}\n')
+            raw.write(damaged[:12] + b'\xff' * 8 + damaged[20:])
+        archive._write(path, [archive._record(entries[1])], 'ab')
+        with open(path, 'ab') as raw:
+            raw.write(gzip.compress(b'{"id": 1')[:-6])
+        self.assertEqual({record['id'] for record in archive.read_file(path)}, {entries[0].id, entries[1].id})
+
+        before = path.read_bytes()
+        with self.assertLogs('tasks_app.archive', 'WARNING'):
+            self.assertFalse(archive.compact(path))
+        self.assertEqual(path.read_bytes(), before)
+
+    def test_deleting_the_user_deletes_the_archive(self):
+        archive.archive_activity()
+        self.assertTrue(archive.user_dir(self.user.id).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(archive.user_dir(self.user.id).exists())
+
+
+class ExportTest(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        label = Label.objects.create(user=self.user, name='School')
+        for i in range(5):
+            task = Task.objects.create(user=self.user, title=f'Task {i}', deadline=timezone.now())
+            TaskLabel.objects.create(task=task, label=label)
+            Subtask.objects.create(task=task, title='Outline')
+            TaskNote.objects.create(task=task, content='Draft, "quoted"\nsecond line')
+            TaskComment.objects.create(task=task, user=self.user, content='Looks good')
+            TimeLog.objects.create(task=task, duration_minutes=30)
+        StudySession.objects.create(user=self.user, task=task, duration_minutes=45, started_at=timezone.now())
+        other = User.objects.create_user(username='bob', password='password123')
+        Task.objects.create(user=other, title='Private')
+
+    def _get(self, output_format, **headers):
+        response = self.client.get('/api/v1/export/', {'format': output_format}, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson(self):
+        _, body = self._get('ndjson')
+        records = [json.loads(line) for line in body.decode().splitlines()]
+        counts = {}
+        for record in records:
+            counts[record['type']] = counts.get(record['type'], 0) + 1
+        self.assertEqual(counts, {'label': 1, 'task': 5, 'subtask': 5, 'note': 5, 'comment': 5, 'time_log': 5, 'study_session': 1})
+        task = next(record for record in records if record['type'] == 'task')
+        self.assertEqual(task['labels'], ['School'])
+        self.assertNotIn('Private', body.decode())
+
+    def test_csv(self):
+        _, body = self._get('csv')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(len(rows), 27)
+        note = next(row for row in rows if row['type'] == 'note')
+        self.assertEqual(note['content'], 'Draft, "quoted"\nsecond line')
+        self.assertEqual(json.loads(next(row for row in rows if row['type'] == 'task')['labels']), ['School'])
+
+    def test_gzip_when_accepted(self):
+        _, plain = self._get('ndjson')
+        response, body = self._get('ndjson', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(body), plain)
+
+    def test_rows_are_read_in_chunks(self):
+        with mock.patch.object(export, 'CHUNK_SIZE', 2), CaptureQueriesContext(connection) as ctx:
+            self._get('ndjson')
+        # Task labels are prefetched per chunk of tasks: 3 chunks of at most 2.
+        self.assertEqual(sum('"tasks_app_tasklabel"' in q['sql'] for q in ctx.captured_queries), 3)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/api/v1/export/', {'format': 'xml'}).status_code, 400)
+
+
+class ImportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='password123')
+        label = Label.objects.create(user=self.user, name='School')
+        parent = Task.objects.create(user=self.user, title='Thesis', status='completed')
+        for i in range(3):
+            task = Task.objects.create(user=self.user, title=f'Chapter {i}', parent_task=parent)
+            TaskLabel.objects.create(task=task, label=label)
+            Subtask.objects.create(task=task, title='Outline')
+            TaskNote.objects.create(task=task, content='Draft, "quoted"\nsecond line')
+            TimeLog.objects.create(task=task, duration_minutes=30)
+        StudySession.objects.create(user=self.user, task=task, duration_minutes=45, started_at=timezone.now())
+        self.other = User.objects.create_user(username='bob', password='password123')
+        self.school = Label.objects.create(user=self.other, name='School', color='#000000')
+        self.client = APIClient()
+        self.client.force_authenticate(self.other)
+
+    def _export(self, output_format):
+        return b''.join(export.export_stream(self.user, output_format))
+
+    def _post(self, body, content_type, **extra):
+        return self.client.generic('POST', '/api/v1/import/', body, content_type=content_type, **extra)
+
+    def _assert_copied(self):
+        tasks = Task.objects.filter(user=self.other)
+        self.assertEqual(tasks.count(), 4)
+        thesis = tasks.get(title='Thesis')
+        self.assertIsNotNone(thesis.completed_at)
+        self.assertEqual(set(tasks.filter(parent_task=thesis).values_list('title', flat=True)), {'Chapter 0', 'Chapter 1', 'Chapter 2'})
+        # Labels are matched by name against the user's own.
+        self.assertEqual(Label.objects.filter(user=self.other).count(), 1)
+        self.assertEqual(TaskLabel.objects.filter(task__user=self.other, label=self.school).count(), 3)
+        self.assertEqual(TaskNote.objects.filter(task__user=self.other, content='Draft, "quoted"\nsecond line').count(), 3)
+        self.assertEqual(StudySession.objects.get(user=self.other).task.title, 'Chapter 2')
+        self.assertEqual(ProductivityStat.objects.get(user=self.other).total_study_minutes, 45)
+
+    def test_ndjson_round_trip(self):
+        response = self._post(self._export('ndjson'), 'application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], {'label': 0, 'task': 4, 'subtask': 3, 'note': 3, 'comment': 0, 'time_log': 3, 'study_session': 1})
+        self.assertEqual(response.data['error_count'], 0)
+        self._assert_copied()
+
+    def test_dates_survive_the_round_trip(self):
+        created = datetime(2025, 1, 1, 9, 30, tzinfo=dt_timezone.utc)
+        for model in (Task, Subtask, TaskNote, TimeLog, StudySession):
+            model.objects.update(created_at=created)
+        TimeLog.objects.update(logged_date=created.date())
+        for output_format, content_type in (('ndjson', 'application/x-ndjson'), ('csv', 'text/csv')):
+            with self.subTest(output_format):
+                Task.objects.filter(user=self.other).delete()
+                StudySession.objects.filter(user=self.other).delete()
+                self.assertEqual(self._post(self._export(output_format), content_type).status_code, 201)
+                for model in (Task, Subtask, TaskNote, TimeLog):
+                    owner = 'user' if model is Task else 'task__user'
+                    self.assertEqual(set(model.objects.filter(**{owner: self.other}).values_list('created_at', flat=True)), {created})
+                self.assertEqual(StudySession.objects.get(user=self.other).created_at, created)
+                self.assertEqual(set(TimeLog.objects.filter(task__user=self.other).values_list('logged_date', flat=True)), {created.date()})
+                rollups = DailyRollup.objects.filter(user=self.other, logged_minutes__gt=0)
+                self.assertEqual(list(rollups.values_list('date', 'logged_minutes')), [(created.date(), 90)])
+
+    def test_csv_upload_gzipped(self):
+        upload = io.BytesIO(gzip.compress(self._export('csv')))
+        upload.name = 'export.csv.gz'
+        response = self.client.post('/api/v1/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self._assert_copied()
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        lines = [
+            {'type': 'task', 'id': 1, 'title': 'Kept', 'labels': ['New label']},
+            {'type': 'task', 'id': 2, 'title': 'Bad', 'priority': 'urgent'},
+            {'type': 'subtask', 'task_id': 2, 'title': 'Orphan'},
+            {'type': 'subtask', 'task_id': 1, 'title': 'Kept too'},
+            {'type': 'widget'},
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines) + '\nnot json\n'
+        response = self._post(body, 'application/x-ndjson', QUERY_STRING='chunk_size=1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['error_count'], 4)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3, 5, 6])
+        self.assertEqual(list(Task.objects.filter(user=self.other).values_list('title', flat=True)), ['Kept'])
+        self.assertEqual(Subtask.objects.get(task__user=self.other).title, 'Kept too')
+        self.assertTrue(TaskLabel.objects.filter(task__title='Kept', label__name='New label', label__user=self.other).exists())
+
+    def test_database_errors_only_cost_the_row(self):
+        lines = [{'type': 'task', 'id': i, 'title': f'Task {i}'} for i in range(4)]
+        body = '\n'.join(json.dumps(line) for line in lines)
+        real = importer.Importer._write
+
+        def failing(self, kind, items):
+            if any(instance.title == 'Task 2' for _, instance, _ in items):
+                raise DatabaseError('boom')
+            return real(self, kind, items)
+
+        with mock.patch.object(importer.Importer, '_write', failing):
+            response = self._post(body, 'application/x-ndjson')
+        self.assertEqual(response.data['created']['task'], 3)
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+        self.assertEqual(Task.objects.filter(user=self.other).count(), 3)
+
+    def test_inserts_in_chunks(self):
+        body = '\n'.join(json.dumps({'type': 'task', 'id': i, 'title': f'Task {i}'}) for i in range(10))
+        with CaptureQueriesContext(connection) as ctx:
+            self._post(body, 'application/x-ndjson', QUERY_STRING='chunk_size=4')
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "tasks_app_task"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self._post('x', 'application/x-ndjson', QUERY_STRING='chunk_size=0').status_code, 400)
+        self.assertEqual(self._post('x', 'text/plain').status_code, 415)
+        response = self._post(b'\x1f\x8bnot gzip', 'application/x-ndjson', HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 400)
+
+
+class AttachmentUploadTest(AuthenticatedTestCase):
+    def setUp(self):
+        for name in ('MEDIA_ROOT', 'ATTACHMENT_UPLOAD_DIR'):
+            directory = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+            settings_override = override_settings(**{name: directory})
+            settings_override.enable()
+            self.addCleanup(settings_override.disable)
+        settings_override = override_settings(ATTACHMENT_QUOTA_BYTES=1000)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        super().setUp()
+        self.task = Task.objects.create(user=self.user, title='Essay')
+        self.content = bytes(range(256)) + b'tail' * 11
+
+    def tearDown(self):
+        # Task changes committed by the tests' on_commit callbacks.
+        activity.flush()
+
+    def _start(self, size, task=None):
+        task = task or self.task
+        return self.client.post(f'/api/v1/tasks/{task.id}/attachments/uploads/', {'file_name': 'essay.pdf', 'size': size}, format='json')
+
+    def _put(self, session_id, first, data, total=None):
+        total = len(self.content) if total is None else total
+        content_range = f'bytes {first}-{first + len(data) - 1}/{total}' if data else f'bytes */{total}'
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.generic(
+                'PUT', f'/api/v1/uploads/{session_id}/', data,
+                content_type='application/octet-stream', HTTP_CONTENT_RANGE=content_range,
+            )
+
+    def _upload(self, content, task=None):
+        session_id = self._start(len(content), task).data['id']
+        for first in range(0, len(content), 100):
+            response = self._put(session_id, first, content[first:first + 100], total=len(content))
+        return response
+
+    def test_chunked_upload_resumes_after_a_gap(self):
+        session_id = self._start(len(self.content)).data['id']
+        self.assertEqual(self._put(session_id, 0, self.content[:100]).data['received'], 100)
+        # Out of order: the client is told where to resume.
+        response = self._put(session_id, 200, self.content[200:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['received'], 100)
+        self.assertEqual(self.client.get(f'/api/v1/uploads/{session_id}/').data['received'], 100)
+        # Picked up by a process that didn't see the first chunk.
+        attachments._hashers.clear()
+        self.assertEqual(self._put(session_id, 100, self.content[100:200]).status_code, 200)
+        response = self._put(session_id, 200, self.content[200:])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['size'], len(self.content))
+
+        blob = AttachmentBlob.objects.get()
+        self.assertEqual(blob.sha256, hashlib.sha256(self.content).hexdigest())
+        with blob.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(settings.ATTACHMENT_UPLOAD_DIR), [])
+        self.assertEqual(self.client.get('/api/v1/users/storage/').data, {'bytes_used': len(self.content), 'quota_bytes': 1000})
+
+    def test_identical_content_is_stored_once(self):
+        other = Task.objects.create(user=self.user, title='Slides')
+        self.assertEqual(self._upload(self.content).status_code, 201)
+        self.assertEqual(self._upload(self.content, task=other).status_code, 201)
+        blob = AttachmentBlob.objects.get()
+        self.assertEqual(TaskAttachment.objects.filter(blob=blob, file=blob.file.name).count(), 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(blob.file.path))), 1)
+        self.assertEqual(attachments.usage(self.user.id), 2 * len(self.content))
+
+        first, second = TaskAttachment.objects.order_by('id')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/api/v1/tasks/{self.task.id}/attachments/{first.id}/').status_code, 204)
+        self.assertTrue(os.path.exists(blob.file.path))
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertFalse(os.path.exists(blob.file.path))
+        self.assertEqual(attachments.usage(self.user.id), 0)
+
+    def test_quota(self):
+        self.assertEqual(self._start(1001).status_code, 413)
+        self._upload(self.content)
+        session_id = self._start(len(self.content)).data['id']
+        # Another upload finished first and took the room.
+        StorageUsage.objects.filter(user=self.user).update(bytes_used=900)
+        response = self._put(session_id, 0, self.content[:100])
+        response = self._put(session_id, 100, self.content[100:])
+        self.assertEqual(response.status_code, 413)
+        StorageUsage.objects.filter(user=self.user).update(bytes_used=0)
+        self.assertEqual(self._put(session_id, 0, b'').status_code, 201)
+        attachments.reconcile(user_ids=[self.user.id])
+        self.assertEqual(attachments.usage(self.user.id), 2 * len(self.content))
+
+    def test_rejects_bad_chunks(self):
+        session_id = self._start(len(self.content)).data['id']
+        response = self.client.generic('PUT', f'/api/v1/uploads/{session_id}/', b'abc', content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._put(session_id, 0, self.content[:100], total=999).status_code, 400)
+        other = User.objects.create_user(username='bob', password='password123')
+        self.client.force_authenticate(other)
+        self.assertEqual(self._put(session_id, 0, self.content[:100]).status_code, 404)
+        self.assertEqual(self._start(10).status_code, 404)
+
+    def test_completing_twice_creates_one_attachment(self):
+        session = attachments.start_upload(self.user, self.task, 'essay.pdf', len(self.content))
+        stale = UploadSession.objects.get(pk=session.pk)
+        self.assertIsNotNone(attachments.write_chunk(session, 0, io.BytesIO(self.content), len(self.content)))
+        with self.assertRaises(attachments.UploadConflict):
+            attachments.complete(stale)
+        self.assertEqual(TaskAttachment.objects.count(), 1)
+        self.assertEqual(attachments.usage(self.user.id), len(self.content))
+
+    def test_abandoned_uploads_are_purged(self):
+        session_id = self._start(len(self.content)).data['id']
+        self._put(session_id, 0, self.content[:100])
+        UploadSession.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(attachments.purge_stale_uploads(timedelta(hours=24)), 1)
+        self.assertEqual(os.listdir(settings.ATTACHMENT_UPLOAD_DIR), [])
+
+
+class AttachmentDownloadTest(AuthenticatedTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        super().setUp()
+        self.task = Task.objects.create(user=self.user, title='Essay')
+        self.content = bytes(range(256)) * 4
+        digest = hashlib.sha256(self.content).hexdigest()
+        name = default_storage.save(attachments.blob_name(digest), ContentFile(self.content))
+        blob = AttachmentBlob.objects.create(sha256=digest, size=len(self.content), file=name)
+        self.attachment = TaskAttachment.objects.create(task=self.task, blob=blob, file=name, size=len(self.content), file_name='essay.pdf')
+        self.url = f'/api/v1/tasks/{self.task.id}/attachments/{self.attachment.id}/download/'
+        self.etag = f'"{digest}"'
+
+    def _get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_download_checks_ownership_in_one_query(self):
+        with self.assertNumQueries(1):
+            response, body = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('attachment; filename="essay.pdf"', response['Content-Disposition'])
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=self.etag)[0].status_code, 304)
+
+        self.client.force_authenticate(User.objects.create_user(username='bob', password='password123'))
+        self.assertEqual(self._get()[0].status_code, 404)
+
+    def test_ranges(self):
+        response, body = self._get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self._get(HTTP_RANGE='bytes=1000-')[1], self.content[1000:])
+        self.assertEqual(self._get(HTTP_RANGE='bytes=-5')[1], self.content[-5:])
+        response, _ = self._get(HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+        # Several ranges aren't supported: the whole file is sent.
+        self.assertEqual(self._get(HTTP_RANGE='bytes=0-1,5-6')[0].status_code, 200)
+
+    def test_if_range(self):
+        response, body = self._get(HTTP_RANGE='bytes=100-', HTTP_IF_RANGE=self.etag)
+        self.assertEqual((response.status_code, body), (206, self.content[100:]))
+        # The file changed since the first part was fetched: start over.
+        response, body = self._get(HTTP_RANGE='bytes=100-', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, body), (200, self.content))
+
+    @override_settings(ATTACHMENT_SENDFILE='x-accel-redirect', ATTACHMENT_ACCEL_PREFIX='/protected-media/')
+    def test_web_server_handoff(self):
+        response, body = self._get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b'')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.attachment.file.name}')
+        self.assertEqual(response['ETag'], self.etag)
@@ -6,7 +6,10 @@ from .views import (
     SubtaskViewSet, TaskDependencyViewSet, TimeLogViewSet, TaskShareViewSet,
     TaskCommentViewSet, TaskListViewSet, GoalViewSet, FilterPresetViewSet,
     UserThemeViewSet, TaskReminderViewSet, ActivityLogViewSet, StudySessionViewSet,
-    ProductivityStatViewSet, LinkResourceViewSet, TaskTemplateViewSet
+    ProductivityStatViewSet, LinkResourceViewSet, TaskTemplateViewSet,
+    DailyRollupViewSet, SearchViewSet, ReminderMetricsViewSet, ExportViewSet,
+    ImportViewSet, TaskAttachmentViewSet, AttachmentUploadViewSet,
+    AttachmentDownloadViewSet
 )
 
 router = DefaultRouter()
@@ -27,6 +30,8 @@ urlpatterns = [
     path('tasks/<int:task_id>/notes/<int:pk>/', TaskNoteViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='task-notes-detail'),
     path('tasks/<int:task_id>/subtasks/', SubtaskViewSet.as_view({'get': 'list', 'post': 'create'}), name='task-subtasks-list'),
     path('tasks/<int:task_id>/subtasks/<int:pk>/', SubtaskViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='task-subtasks-detail'),
+    path('tasks/<int:task_id>/subtasks/reorder/', SubtaskViewSet.as_view({'post': 'reorder'}), name='task-subtasks-reorder'),
+    path('tasks/<int:task_id>/subtasks/<int:pk>/move/', SubtaskViewSet.as_view({'post': 'move'}), name='task-subtasks-move'),
     path('tasks/<int:task_id>/dependencies/', TaskDependencyViewSet.as_view({'get': 'list', 'post': 'create'}), name='task-dependencies-list'),
     path('tasks/<int:task_id>/dependencies/<int:pk>/', TaskDependencyViewSet.as_view({'get': 'retrieve', 'delete': 'destroy'}), name='task-dependencies-detail'),
     path('tasks/<int:task_id>/time-logs/', TimeLogViewSet.as_view({'get': 'list', 'post': 'create'}), name='task-time-logs-list'),
@@ -37,10 +42,23 @@ urlpatterns = [
     path('tasks/<int:task_id>/reminders/<int:pk>/', TaskReminderViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='task-reminders-detail'),
     path('tasks/<int:task_id>/resources/', LinkResourceViewSet.as_view({'get': 'list', 'post': 'create'}), name='task-resources-list'),
     path('tasks/<int:task_id>/resources/<int:pk>/', LinkResourceViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='task-resources-detail'),
+    path('tasks/<int:task_id>/attachments/', TaskAttachmentViewSet.as_view({'get': 'list'}), name='task-attachments-list'),
+    path('tasks/<int:task_id>/attachments/<int:pk>/', TaskAttachmentViewSet.as_view({'get': 'retrieve', 'delete': 'destroy'}), name='task-attachments-detail'),
+    path('tasks/<int:task_id>/attachments/<int:pk>/download/', AttachmentDownloadViewSet.as_view({'get': 'retrieve'}), name='task-attachments-download'),
+    path('tasks/<int:task_id>/attachments/uploads/', AttachmentUploadViewSet.as_view({'post': 'create'}), name='task-attachment-uploads'),
+    path('uploads/<uuid:pk>/', AttachmentUploadViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='upload-detail'),
     path('task-shares/', TaskShareViewSet.as_view({'get': 'list', 'post': 'create'}), name='task-share-list'),
     path('theme/me/', UserThemeViewSet.as_view({'get': 'me', 'put': 'me'}), name='theme-me'),
     path('activity/', ActivityLogViewSet.as_view({'get': 'list'}), name='activity-list'),
+    path('activity/undo/', ActivityLogViewSet.as_view({'post': 'undo'}), name='activity-undo'),
+    path('activity/redo/', ActivityLogViewSet.as_view({'post': 'redo'}), name='activity-redo'),
+    path('activity/history/', ActivityLogViewSet.as_view({'get': 'history'}), name='activity-history'),
     path('productivity/me/', ProductivityStatViewSet.as_view({'get': 'me'}), name='productivity-me'),
+    path('analytics/daily/', DailyRollupViewSet.as_view({'get': 'list'}), name='analytics-daily'),
+    path('search/', SearchViewSet.as_view({'get': 'list'}), name='search'),
+    path('export/', ExportViewSet.as_view({'get': 'list'}), name='export'),
+    path('import/', ImportViewSet.as_view({'post': 'create'}), name='import'),
+    path('reminders/metrics/', ReminderMetricsViewSet.as_view({'get': 'list'}), name='reminder-metrics'),
     path('auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
\ No newline at end of file
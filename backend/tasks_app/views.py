@@ -1,14 +1,26 @@
+import re
+from datetime import timedelta
+
 from rest_framework import viewsets, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from .models import (
     Task, Label, TaskLabel, TaskNote, Subtask, TaskDependency,
     TimeLog, TaskShare, TaskComment, TaskList, Goal, FilterPreset,
     UserTheme, TaskReminder, ActivityLog, StudySession, ProductivityStat,
-    LinkResource, TaskTemplate
+    LinkResource, TaskTemplate, Tombstone, TaskAttachment, UploadSession
 )
 from .serializers import (
     TaskSerializer, 
@@ -18,6 +30,7 @@ from .serializers import (
     TaskCreateUpdateSerializer,
     TaskNoteSerializer,
     SubtaskSerializer,
+    SubtaskChangeSerializer,
     TaskDependencySerializer,
     TimeLogSerializer,
     TaskShareSerializer,
@@ -31,8 +44,23 @@ from .serializers import (
     StudySessionSerializer,
     ProductivityStatSerializer,
     LinkResourceSerializer,
-    TaskTemplateSerializer
+    TaskTemplateSerializer,
+    TaskDetailSerializer,
+    TaskAttachmentSerializer,
+    UploadSessionSerializer
 )
+from .pagination import ActivityHistoryPagination, TaskPagination, TimelinePagination
+from .filters import TaskFilterBackend, annotate_bucket, annotate_rollups
+from .stats import task_stats, daily_rollup_stats
+from . import activity, archive, attachments, authentication, caching, downloads, export, graph, importer, ranking, recurrence
+from .caching import CachedListMixin, ConditionalGetMixin, cache_per_user
+from .batch import BatchError, apply_batch
+from . import search
+from .reminders import backlog_metrics
+
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+CONTENT_RANGE = re.compile(r'^bytes (?:(\d+)-(\d+)|\*)/(\d+)$')
 
 
 class RegisterView(viewsets.ViewSet):
@@ -50,27 +78,128 @@ class RegisterView(viewsets.ViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+# Prefetches for the /tasks/<id>/full/ sections, ordered like their own
+# list endpoints. One query each, however many rows they hold.
+TASK_DETAIL_PREFETCHES = {
+    'notes': Prefetch('notes', queryset=TaskNote.objects.order_by('-created_at', '-id')),
+    'subtasks': Prefetch('subtasks', queryset=Subtask.objects.order_by('order', '-created_at')),
+    'comments': Prefetch('comments', queryset=TaskComment.objects.select_related('user').order_by('-created_at', '-id')),
+    'time_logs': Prefetch('time_logs', queryset=TimeLog.objects.order_by('-created_at', '-id')),
+    'reminders': Prefetch('reminders', queryset=TaskReminder.objects.order_by('remind_at')),
+    'resources': Prefetch('link_resources', queryset=LinkResource.objects.order_by('-created_at')),
+    'dependencies': Prefetch('dependencies_on', queryset=TaskDependency.objects.select_related('depends_on_task').order_by('id')),
+    'attachments': Prefetch('attachments', queryset=TaskAttachment.objects.order_by('-uploaded_at')),
+}
+
+
+class TaskViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TaskPagination
+    filter_backends = [TaskFilterBackend]
     
     def get_queryset(self):
-        return Task.objects.filter(user=self.request.user)
+        # TaskSerializer nests the owner and each label, so join/prefetch them
+        # up front instead of issuing queries per task.
+        queryset = (
+            Task.objects.filter(user=self.request.user)
+            .select_related('user')
+            .prefetch_related('labels__label')
+        )
+        return annotate_rollups(annotate_bucket(queryset))
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @cache_per_user
     def pending(self, request):
-        tasks = self.get_queryset().filter(status='pending')
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        tasks = self.filter_queryset(self.get_queryset()).filter(status='pending')
+        page = self.paginate_queryset(tasks)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cache_per_user
     def completed(self, request):
-        tasks = self.get_queryset().filter(status='completed')
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        tasks = self.filter_queryset(self.get_queryset()).filter(status='completed')
+        page = self.paginate_queryset(tasks)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Aggregated counts for the stats and analytics pages."""
+        return Response(task_stats(request.user, request.query_params))
+    
+    @action(detail=True, methods=['get'])
+    def full(self, request, pk=None):
+        """The task with all of its child collections: ?include=notes,subtasks,..."""
+        include = TaskDetailSerializer.SECTIONS
+        if request.query_params.get('include'):
+            include = [section.strip() for section in request.query_params['include'].split(',') if section.strip()]
+            unknown = sorted(set(include) - set(TaskDetailSerializer.SECTIONS))
+            if unknown:
+                raise ValidationError({'include': f"Unknown section(s): {', '.join(unknown)}."})
+        queryset = self.get_queryset().prefetch_related(*(TASK_DETAIL_PREFETCHES[section] for section in include))
+        task = get_object_or_404(queryset, pk=pk)
+        return Response(TaskDetailSerializer(task, context={**self.get_serializer_context(), 'include': include}).data)
+    
+    @action(detail=False, methods=['get'])
+    def graph(self, request):
+        """Dependency graph: blocked tasks, topological order and critical path"""
+        return Response(graph.get_graph(request.user.id))
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Incremental sync: tasks, subtasks and labels created, updated or
+        deleted since `since` (the `cursor` of the previous response).
+        Without `since` everything is returned. Subtasks of a deleted task
+        are only reported through the task's tombstone. Changes near the
+        cursor are sent again next time, so clients must apply them by id.
+        """
+        # updated_at and deleted_at are stamped before the writer commits,
+        # so a write can become visible after a later cursor was handed out.
+        # Stepping the cursor back by the longest transaction keeps it.
+        cursor = timezone.now() - timedelta(seconds=settings.SYNC_CURSOR_MARGIN_SECONDS)
+        since = request.query_params.get('since')
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                raise ValidationError({'since': 'Invalid cursor.'})
+
+        tasks = self.get_queryset()
+        subtasks = Subtask.objects.filter(task__user=request.user)
+        labels = Label.objects.filter(user=request.user)
+        tombstones = Tombstone.objects.filter(user=request.user)
+        if since:
+            tasks = tasks.filter(updated_at__gte=since)
+            subtasks = subtasks.filter(updated_at__gte=since)
+            labels = labels.filter(updated_at__gte=since)
+            tombstones = tombstones.filter(deleted_at__gte=since)
+        else:
+            tombstones = tombstones.none()
+
+        deleted = {'task': [], 'subtask': [], 'label': []}
+        for model, object_id in tombstones.values_list('model', 'object_id'):
+            deleted[model].append(object_id)
+
+        return Response({
+            'cursor': cursor.isoformat().replace('+00:00', 'Z'),
+            'tasks': {
+                'updated': self.get_serializer(tasks, many=True).data,
+                'deleted': deleted['task'],
+            },
+            'subtasks': {
+                'updated': SubtaskChangeSerializer(subtasks, many=True).data,
+                'deleted': deleted['subtask'],
+            },
+            'labels': {
+                'updated': LabelSerializer(labels, many=True).data,
+                'deleted': deleted['label'],
+            },
+        })
     
     @action(detail=True, methods=['post'])
     def mark_complete(self, request, pk=None):
@@ -90,53 +219,57 @@ class TaskViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def update_order(self, request):
-        """Update task order for drag and drop"""
+        """Apply a full drag-and-drop order in one UPDATE statement"""
+        order_data = request.data.get('order', [])
+        if not isinstance(order_data, list) or not all(isinstance(pk, int) for pk in order_data):
+            return Response({'error': 'order must be a list of task ids'}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            ranking.apply_order(Task.objects.filter(user=request.user), order_data)
+        # A queryset UPDATE sends no signals.
+        caching.bump_version(request.user.id)
+        return Response({'message': 'Order updated successfully'})
+    
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Apply a list of create/update/delete/complete/pending operations in
+        one transaction. Nothing is written if any operation is invalid.
+        """
+        # A JSON body that isn't an object has no operations.
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
         try:
-            order_data = request.data.get('order', [])
-            for index, task_id in enumerate(order_data):
-                Task.objects.filter(id=task_id, user=request.user).update(order=index)
-            return Response({'message': 'Order updated successfully'})
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            results = apply_batch(request.user, operations, self.get_serializer_context())
+        except BatchError as e:
+            return Response({'results': e.results}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results})
+    
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        """Move one task between its new neighbours (`after` / `before` ids)"""
+        task = self.get_object()
+        rank = ranking.move(
+            Task.objects.filter(user=request.user), task,
+            after=request.data.get('after'), before=request.data.get('before'),
+        )
+        caching.bump_version(request.user.id)
+        return Response({'id': task.id, 'order': rank})
     
     @action(detail=True, methods=['post'])
     def create_recurring(self, request, pk=None):
-        """Create next instance of recurring task"""
-        from datetime import timedelta
-        from django.utils import timezone
-        
+        """Create next instance of recurring task now instead of waiting for the scheduler"""
         task = self.get_object()
         if task.recurrence == 'none':
             return Response({'error': 'Task is not recurring'}, status=status.HTTP_400_BAD_REQUEST)
+        if task.deadline is None:
+            return Response({'error': 'Recurring tasks need a deadline'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            new_deadline = task.deadline
-            if task.recurrence == 'daily' and task.deadline:
-                new_deadline = task.deadline + timedelta(days=1)
-            elif task.recurrence == 'weekly' and task.deadline:
-                new_deadline = task.deadline + timedelta(weeks=1)
-            elif task.recurrence == 'monthly' and task.deadline:
-                new_deadline = task.deadline + timedelta(days=30)
-            
-            new_task = Task.objects.create(
-                user=task.user,
-                title=task.title,
-                description=task.description,
-                priority=task.priority,
-                category=task.category,
-                recurrence=task.recurrence,
-                is_recurring=True,
-                parent_task=task,
-                deadline=new_deadline,
-                status='pending'
-            )
-            serializer = self.get_serializer(new_task)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        new_task = recurrence.spawn_next(task)
+        if new_task is None:
+            return Response({'error': 'The next instance already exists'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(self.get_queryset().get(pk=new_task.pk)).data, status=status.HTTP_201_CREATED)
 
 
-class LabelViewSet(viewsets.ModelViewSet):
+class LabelViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     serializer_class = LabelSerializer
     permission_classes = [IsAuthenticated]
     
@@ -147,18 +280,29 @@ class LabelViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class UserViewSet(viewsets.ViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
     
     @action(detail=False, methods=['get'])
     def me(self, request):
         serializer = UserSerializer(request.user)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def revoke_tokens(self, request):
+        """Log out everywhere: all access and refresh tokens issued so far stop working"""
+        authentication.revoke_tokens(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=False, methods=['get'])
+    def storage(self, request):
+        return Response({'bytes_used': attachments.usage(request.user.pk), 'quota_bytes': settings.ATTACHMENT_QUOTA_BYTES})
 
 
-class TaskNoteViewSet(viewsets.ModelViewSet):
+class TaskNoteViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TaskNoteSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimelinePagination
     
     def get_queryset(self):
         task_id = self.kwargs.get('task_id')
@@ -179,7 +323,7 @@ class TaskNoteViewSet(viewsets.ModelViewSet):
 
 # New ViewSets for all features
 
-class SubtaskViewSet(viewsets.ModelViewSet):
+class SubtaskViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = SubtaskSerializer
     permission_classes = [IsAuthenticated]
     
@@ -191,25 +335,49 @@ class SubtaskViewSet(viewsets.ModelViewSet):
         task_id = self.kwargs.get('task_id')
         task = Task.objects.get(id=task_id, user=self.request.user)
         serializer.save(task=task)
-
-
-class TaskDependencyViewSet(viewsets.ModelViewSet):
+    
+    def move(self, request, task_id=None, pk=None):
+        subtask = self.get_object()
+        rank = ranking.move(
+            self.get_queryset(), subtask,
+            after=request.data.get('after'), before=request.data.get('before'),
+        )
+        # A queryset UPDATE sends no signals.
+        caching.bump_version(request.user.id)
+        return Response({'id': subtask.id, 'order': rank})
+    
+    def reorder(self, request, task_id=None):
+        order_data = request.data.get('order', [])
+        if not isinstance(order_data, list) or not all(isinstance(pk, int) for pk in order_data):
+            return Response({'error': 'order must be a list of subtask ids'}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            ranking.apply_order(self.get_queryset(), order_data)
+        caching.bump_version(request.user.id)
+        return Response({'message': 'Order updated successfully'})
+
+
+class TaskDependencyViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TaskDependencySerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         task_id = self.kwargs.get('task_id')
-        return TaskDependency.objects.filter(dependent_task__id=task_id, dependent_task__user=self.request.user)
+        return TaskDependency.objects.filter(
+            dependent_task__id=task_id, dependent_task__user=self.request.user,
+        ).select_related('depends_on_task')
     
     def perform_create(self, serializer):
         task_id = self.kwargs.get('task_id')
         task = Task.objects.get(id=task_id, user=self.request.user)
-        serializer.save(dependent_task=task)
+        with transaction.atomic():
+            graph.check_new_edge(self.request.user.id, task.id, serializer.validated_data['depends_on_task'].id)
+            serializer.save(dependent_task=task)
 
 
-class TimeLogViewSet(viewsets.ModelViewSet):
+class TimeLogViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TimeLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimelinePagination
     
     def get_queryset(self):
         task_id = self.kwargs.get('task_id')
@@ -221,7 +389,7 @@ class TimeLogViewSet(viewsets.ModelViewSet):
         serializer.save(task=task)
 
 
-class TaskShareViewSet(viewsets.ModelViewSet):
+class TaskShareViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TaskShareSerializer
     permission_classes = [IsAuthenticated]
     
@@ -234,13 +402,14 @@ class TaskShareViewSet(viewsets.ModelViewSet):
         serializer.save(task=task)
 
 
-class TaskCommentViewSet(viewsets.ModelViewSet):
+class TaskCommentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TaskCommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimelinePagination
     
     def get_queryset(self):
         task_id = self.kwargs.get('task_id')
-        return TaskComment.objects.filter(task__id=task_id, task__user=self.request.user)
+        return TaskComment.objects.filter(task__id=task_id, task__user=self.request.user).select_related('user')
     
     def perform_create(self, serializer):
         task_id = self.kwargs.get('task_id')
@@ -248,7 +417,7 @@ class TaskCommentViewSet(viewsets.ModelViewSet):
         serializer.save(task=task, user=self.request.user)
 
 
-class TaskListViewSet(viewsets.ModelViewSet):
+class TaskListViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TaskListSerializer
     permission_classes = [IsAuthenticated]
     
@@ -259,7 +428,7 @@ class TaskListViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class GoalViewSet(viewsets.ModelViewSet):
+class GoalViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     serializer_class = GoalSerializer
     permission_classes = [IsAuthenticated]
     
@@ -270,7 +439,7 @@ class GoalViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class FilterPresetViewSet(viewsets.ModelViewSet):
+class FilterPresetViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     serializer_class = FilterPresetSerializer
     permission_classes = [IsAuthenticated]
     
@@ -281,11 +450,12 @@ class FilterPresetViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class UserThemeViewSet(viewsets.ModelViewSet):
+class UserThemeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = UserThemeSerializer
     permission_classes = [IsAuthenticated]
     
     @action(detail=False, methods=['get', 'put'])
+    @cache_per_user
     def me(self, request):
         theme, created = UserTheme.objects.get_or_create(user=request.user)
         if request.method == 'PUT':
@@ -297,7 +467,7 @@ class UserThemeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class TaskReminderViewSet(viewsets.ModelViewSet):
+class TaskReminderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TaskReminderSerializer
     permission_classes = [IsAuthenticated]
     
@@ -311,15 +481,69 @@ class TaskReminderViewSet(viewsets.ModelViewSet):
         serializer.save(task=task)
 
 
-class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
+class ReminderMetricsViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdminUser]
+    
+    def list(self, request):
+        """Reminder queue depth, delivery lag and throughput"""
+        return Response(backlog_metrics())
+
+
+class ActivityLogViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ActivityLogSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         return ActivityLog.objects.filter(user=self.request.user)
+    
+    def initial(self, request, *args, **kwargs):
+        # Entries still buffered in this process belong in the answer (and its ETag).
+        activity.flush()
+        super().initial(request, *args, **kwargs)
+    
+    def _replay(self, request, replay):
+        try:
+            entry, task = replay(request.user)
+        except activity.NothingToReplay:
+            return Response({'error': f'Nothing to {replay.__name__}'}, status=status.HTTP_400_BAD_REQUEST)
+        except activity.ReplayConflict as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        if task is not None:
+            task = annotate_rollups(Task.objects.filter(pk=task.pk).select_related('user').prefetch_related('labels__label')).first()
+        return Response({
+            'entry': ActivityLogSerializer(entry).data,
+            'task': TaskSerializer(task, context=self.get_serializer_context()).data if task else None,
+        })
+    
+    def undo(self, request):
+        """Revert the latest task create/update/complete/delete"""
+        return self._replay(request, activity.undo)
+    
+    def redo(self, request):
+        """Re-apply the most recently undone change"""
+        return self._replay(request, activity.redo)
+    
+    def history(self, request):
+        """Live and archived entries, newest first: /activity/history/[?task_id=n][&cursor=...]"""
+        queryset = self.get_queryset()
+        try:
+            task_id = int(request.query_params['task_id']) if request.query_params.get('task_id') else None
+        except ValueError:
+            return Response({'error': 'task_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if task_id is not None:
+            queryset = queryset.filter(task_id=task_id)
+        
+        def archived(before):
+            for timestamp, pk, record in archive.archived_entries(request.user.id, before):
+                if task_id is None or record['task_id'] == task_id:
+                    yield timestamp, pk, ActivityLog(user_id=request.user.id, **{**record, 'timestamp': timestamp})
+        
+        paginator = ActivityHistoryPagination()
+        page = paginator.paginate_history(queryset, archived, request)
+        return paginator.get_paginated_response(ActivityLogSerializer(page, many=True).data)
 
 
-class StudySessionViewSet(viewsets.ModelViewSet):
+class StudySessionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = StudySessionSerializer
     permission_classes = [IsAuthenticated]
     
@@ -330,18 +554,113 @@ class StudySessionViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class ProductivityStatViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductivityStatViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ProductivityStatSerializer
     permission_classes = [IsAuthenticated]
     
     @action(detail=False, methods=['get'])
+    @cache_per_user
     def me(self, request):
         stat, created = ProductivityStat.objects.get_or_create(user=request.user)
         serializer = self.get_serializer(stat)
         return Response(serializer.data)
 
 
-class LinkResourceViewSet(viewsets.ModelViewSet):
+class FileFormatNegotiation(DefaultContentNegotiation):
+    def select_renderer(self, request, renderers, format_suffix=None):
+        # ?format= names the file format, not a renderer; errors are JSON.
+        return renderers[0], renderers[0].media_type
+
+
+class ExportViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = FileFormatNegotiation
+    
+    CONTENT_TYPES = {'ndjson': 'application/x-ndjson; charset=utf-8', 'csv': 'text/csv; charset=utf-8'}
+    
+    def list(self, request):
+        """The whole workspace, streamed: /export/?format=ndjson|csv, gzipped if the client accepts it"""
+        output_format = request.query_params.get('format', 'ndjson')
+        if output_format not in export.FORMATS:
+            return Response({'error': f"format must be one of: {', '.join(export.FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        gzip = bool(ACCEPTS_GZIP.search(request.headers.get('Accept-Encoding', '')))
+        response = StreamingHttpResponse(
+            export.export_stream(request.user, output_format, gzip=gzip),
+            content_type=self.CONTENT_TYPES[output_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="duna-export-{timezone.now():%Y-%m-%d}.{output_format}"'
+        response['Vary'] = 'Accept-Encoding'
+        if gzip:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+
+class ImportViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = FileFormatNegotiation
+    
+    CONTENT_TYPES = {'application/x-ndjson': 'ndjson', 'text/csv': 'csv'}
+    
+    def create(self, request):
+        """
+        Import a file in the export format: a multipart `file` upload, or the
+        raw body sent as application/x-ndjson or text/csv. Gzipped input is
+        accepted. Rows that fail validation are reported and skipped.
+        """
+        content_type = request.content_type.split(';')[0].strip()
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', importer.DEFAULT_CHUNK_SIZE))
+        except ValueError:
+            chunk_size = 0
+        if not 1 <= chunk_size <= importer.MAX_CHUNK_SIZE:
+            return Response({'error': f'chunk_size must be between 1 and {importer.MAX_CHUNK_SIZE}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if content_type == 'multipart/form-data':
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+            default_format = 'csv' if upload.name.lower().endswith(('.csv', '.csv.gz')) else 'ndjson'
+            stream = importer.open_upload(upload)
+        elif content_type in self.CONTENT_TYPES:
+            default_format = self.CONTENT_TYPES[content_type]
+            # Read straight off the request, never holding the whole body.
+            stream = request.stream
+            if request.headers.get('Content-Encoding', '').strip().lower() == 'gzip':
+                stream = importer.gunzipped(stream)
+        else:
+            return Response({'error': 'Send a multipart file, application/x-ndjson or text/csv'}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        
+        input_format = request.query_params.get('format', default_format)
+        if input_format not in importer.FORMATS:
+            return Response({'error': f"format must be one of: {', '.join(importer.FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = importer.import_rows(request.user, importer.rows(stream, input_format), chunk_size=chunk_size)
+        except importer.UNREADABLE:
+            return Response({'error': f'The file is not readable as {input_format}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict(), status=status.HTTP_201_CREATED if any(report.created.values()) else status.HTTP_200_OK)
+
+
+class DailyRollupViewSet(ConditionalGetMixin, viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+    
+    def list(self, request):
+        return Response(daily_rollup_stats(request.user, request.query_params))
+
+
+class SearchViewSet(ConditionalGetMixin, viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+    
+    def list(self, request):
+        """Ranked full-text search: /search/?q=<terms>[&limit=n]"""
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(max(int(request.query_params.get('limit', search.MAX_RESULTS)), 1), search.MAX_RESULTS)
+        except ValueError:
+            limit = search.MAX_RESULTS
+        return Response({'query': query, 'results': search.search(request.user, query, limit=limit)})
+
+
+class LinkResourceViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = LinkResourceSerializer
     permission_classes = [IsAuthenticated]
     
@@ -355,7 +674,85 @@ class LinkResourceViewSet(viewsets.ModelViewSet):
         serializer.save(task=task)
 
 
-class TaskTemplateViewSet(viewsets.ModelViewSet):
+class TaskAttachmentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    serializer_class = TaskAttachmentSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        task_id = self.kwargs.get('task_id')
+        return TaskAttachment.objects.filter(task__id=task_id, task__user=self.request.user).order_by('-uploaded_at')
+
+
+class AttachmentDownloadViewSet(viewsets.ViewSet):
+    # No ConditionalGetMixin: the file's own ETag and Last-Modified apply.
+    permission_classes = [IsAuthenticated]
+    
+    def retrieve(self, request, task_id=None, pk=None):
+        """The attachment's file; supports Range and If-Range for resumed downloads"""
+        # Ownership and everything needed to serve the file, in one query.
+        attachment = (
+            TaskAttachment.objects.filter(pk=pk, task_id=task_id, task__user=request.user)
+            .values('file', 'file_name', 'uploaded_at', 'blob__sha256')
+            .first()
+        )
+        if attachment is None or not attachment['file']:
+            raise Http404
+        return downloads.serve(request, attachment)
+
+
+class AttachmentUploadViewSet(viewsets.ViewSet):
+    # No ConditionalGetMixin: `received` moves without a data version bump.
+    permission_classes = [IsAuthenticated]
+    
+    def get_session(self, request, pk):
+        return get_object_or_404(UploadSession, pk=pk, user=request.user)
+    
+    def create(self, request, task_id=None):
+        """Start a resumable upload of {file_name, size}; the bytes follow with PUT /uploads/<id>/"""
+        task = get_object_or_404(Task, pk=task_id, user=request.user)
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = attachments.start_upload(request.user, task, **serializer.validated_data)
+        except attachments.QuotaExceeded:
+            return Response({'error': 'Storage quota exceeded'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+    
+    def retrieve(self, request, pk=None):
+        """Where to resume: the next chunk starts at `received`"""
+        return Response(UploadSessionSerializer(self.get_session(request, pk)).data)
+    
+    def update(self, request, pk=None):
+        """
+        Send the chunk at `received` as the raw body, with Content-Range:
+        bytes <first>-<last>/<size>. The last chunk returns the attachment;
+        `bytes */<size>` retries completing a fully received upload.
+        """
+        session = self.get_session(request, pk)
+        match = CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+        if match is None or int(match[3]) != session.size:
+            return Response({'error': f'Content-Range: bytes <first>-<last>/{session.size} is required'}, status=status.HTTP_400_BAD_REQUEST)
+        offset, length = (session.size, 0) if match[1] is None else (int(match[1]), int(match[2]) - int(match[1]) + 1)
+        if (match[1] is not None and length < 1) or int(request.META.get('CONTENT_LENGTH') or 0) != length:
+            return Response({'error': 'Content-Length must match Content-Range'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            attachment = attachments.write_chunk(session, offset, request.stream, length)
+        except attachments.UploadConflict as exc:
+            return Response({'error': str(exc), 'received': exc.received}, status=status.HTTP_409_CONFLICT)
+        except attachments.UploadError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except attachments.QuotaExceeded:
+            return Response({'error': 'Storage quota exceeded'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if attachment is None:
+            return Response(UploadSessionSerializer(session).data)
+        return Response(TaskAttachmentSerializer(attachment, context={'request': request}).data, status=status.HTTP_201_CREATED)
+    
+    def destroy(self, request, pk=None):
+        self.get_session(request, pk).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TaskTemplateViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TaskTemplateSerializer
     permission_classes = [IsAuthenticated]
     
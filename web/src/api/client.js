@@ -43,4 +43,14 @@ client.interceptors.response.use(
   }
 );
 
+// One page of a cursor-paginated list: { results, next }. Pass `next` back
+// as `url` for the following page; it already carries the query string of
+// the first request, so `params` is dropped.
+export const fetchPage = async (url, config = {}, next = null) => {
+  const response = next
+    ? await client.get(next, { ...config, params: undefined })
+    : await client.get(url, config);
+  return { results: response.data.results, next: response.data.next };
+};
+
 export default client;
\ No newline at end of file
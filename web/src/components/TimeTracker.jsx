@@ -1,6 +1,6 @@
 import { useState } from 'react';
 
-export default function TimeTracker({ darkMode, timeLogs = [], onAddTimeLog }) {
+export default function TimeTracker({ darkMode, timeLogs = [], totalSpent, totalEstimated, onAddTimeLog, onLoadMore }) {
   const [showAddLog, setShowAddLog] = useState(false);
   const [duration, setDuration] = useState('');
   const [estimated, setEstimated] = useState('');
@@ -24,8 +24,9 @@ export default function TimeTracker({ darkMode, timeLogs = [], onAddTimeLog }) {
     }
   };
 
-  const totalSpent = timeLogs.reduce((sum, log) => sum + log.duration_minutes, 0);
-  const totalEstimated = timeLogs.reduce((sum, log) => sum + (log.estimated_minutes || 0), 0);
+  // The totals come with the task: only a page of logs may be loaded.
+  const spentMinutes = totalSpent ?? timeLogs.reduce((sum, log) => sum + log.duration_minutes, 0);
+  const estimatedMinutes = totalEstimated ?? timeLogs.reduce((sum, log) => sum + (log.estimated_minutes || 0), 0);
 
   return (
     <div className={`mt-4 p-4 rounded-lg ${darkMode ? 'bg-slate-700/30' : 'bg-white/30'}`}>
@@ -34,7 +35,7 @@ export default function TimeTracker({ darkMode, timeLogs = [], onAddTimeLog }) {
           ⏱ Time Tracking
         </h4>
         <div className={`text-sm ${darkMode ? 'text-slate-400' : 'text-gray-600'}`}>
-          {totalSpent}m{totalEstimated ? ` / ${totalEstimated}m` : ''}
+          {spentMinutes}m{estimatedMinutes ? ` / ${estimatedMinutes}m` : ''}
         </div>
       </div>
 
@@ -62,6 +63,14 @@ export default function TimeTracker({ darkMode, timeLogs = [], onAddTimeLog }) {
             </div>
           ))
         )}
+        {onLoadMore && (
+          <button
+            onClick={onLoadMore}
+            className={`text-xs font-medium ${darkMode ? 'text-blue-300 hover:text-blue-200' : 'text-amber-700 hover:text-amber-800'}`}
+          >
+            Load more
+          </button>
+        )}
       </div>
 
       {showAddLog ? (
@@ -1,21 +1,48 @@
-import { useState, useEffect } from 'react';
-import client from '../api/client';
+import { useState, useEffect, useRef } from 'react';
+import client, { fetchPage } from '../api/client';
 
-export const useTasks = () => {
+export const useTasks = ({ autoFetch = true } = {}) => {
   const [tasks, setTasks] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
+  // Cursor of the page after the loaded ones; null once the list is complete.
+  const [nextPage, setNextPage] = useState(null);
+  const latestFetch = useRef(0);
 
-  const fetchTasks = async () => {
+  // params: server-side filters/sorting (search, priority, category, status,
+  // label, bucket, deadline_after, deadline_before, ordering). Loads the
+  // first page; loadMore() appends the following ones.
+  const fetchTasks = async (params = {}) => {
+    // Only the latest request's results are kept when filters change quickly.
+    const request = ++latestFetch.current;
     setLoading(true);
     setError(null);
     try {
-      const response = await client.get('/tasks/');
-      setTasks(response.data);
+      const page = await fetchPage('/tasks/', { params });
+      if (request === latestFetch.current) {
+        setTasks(page.results);
+        setNextPage(page.next);
+      }
     } catch (err) {
-      setError(err.message);
+      if (request === latestFetch.current) setError(err.message);
     } finally {
-      setLoading(false);
+      if (request === latestFetch.current) setLoading(false);
+    }
+  };
+
+  const loadMore = async () => {
+    if (!nextPage) return;
+    const request = latestFetch.current;
+    try {
+      const page = await fetchPage('/tasks/', {}, nextPage);
+      // Dropped if the filters changed meanwhile.
+      if (request === latestFetch.current) {
+        setTasks(current => [...current, ...page.results]);
+        setNextPage(page.next);
+      }
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Failed to fetch tasks');
+      throw err;
     }
   };
 
@@ -73,10 +100,43 @@ export const useTasks = () => {
     }
   };
 
-  const getNotes = async (taskId) => {
+  // operations: [{ op: 'create'|'update'|'delete'|'complete'|'pending', id, data }]
+  // Applied in one request and one transaction; all or nothing.
+  const batchTasks = async (operations) => {
     try {
-      const response = await client.get(`/tasks/${taskId}/notes/`);
+      const response = await client.post('/tasks/batch/', { operations });
+      const { results } = response.data;
+      const deletedIds = new Set(results.filter(r => r.status === 'deleted').map(r => r.id));
+      const updatedById = new Map(results.filter(r => r.status === 'updated').map(r => [r.task.id, r.task]));
+      const createdTasks = results.filter(r => r.status === 'created').map(r => r.task);
+      setTasks([
+        ...createdTasks,
+        ...tasks.filter(t => !deletedIds.has(t.id)).map(t => updatedById.get(t.id) || t),
+      ]);
+      return results;
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Failed to apply changes');
+      throw err;
+    }
+  };
+
+  // One request for the task and its child collections; `include` trims
+  // them, e.g. ['notes', 'subtasks'].
+  const getTaskDetail = async (taskId, include) => {
+    try {
+      const params = include ? { include: include.join(',') } : undefined;
+      const response = await client.get(`/tasks/${taskId}/full/`, { params });
       return response.data;
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Failed to fetch task');
+      throw err;
+    }
+  };
+
+  // A page of notes ({ results, next }); pass `next` to get the following one.
+  const getNotes = async (taskId, next = null) => {
+    try {
+      return await fetchPage(`/tasks/${taskId}/notes/`, {}, next);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to fetch notes');
       throw err;
@@ -125,6 +185,31 @@ export const useTasks = () => {
     }
   };
 
+  // Move one task within orderArray (the new pending order); only the moved
+  // task is re-ranked on the server.
+  const moveTask = async (taskId, orderArray) => {
+    try {
+      const pendingTasks = tasks.filter(t => t.status === 'pending');
+      const completedTasks = tasks.filter(t => t.status === 'completed');
+      setTasks(
+        orderArray
+          .map(id => pendingTasks.find(t => t.id === id))
+          .filter(Boolean)
+          .concat(completedTasks)
+      );
+
+      const index = orderArray.indexOf(taskId);
+      await client.post(`/tasks/${taskId}/move/`, {
+        after: index > 0 ? orderArray[index - 1] : null,
+        before: index < orderArray.length - 1 ? orderArray[index + 1] : null,
+      });
+      return true;
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Failed to move task');
+      throw err;
+    }
+  };
+
   const createRecurringTask = async (taskId) => {
     try {
       const response = await client.post(`/tasks/${taskId}/create_recurring/`);
@@ -173,6 +258,12 @@ export const useTasks = () => {
   const logTime = async (taskId, data) => {
     try {
       const response = await client.post(`/tasks/${taskId}/time-logs/`, data);
+      // Keep the task's totals in step without refetching the list.
+      setTasks(current => current.map(t => (t.id === taskId ? {
+        ...t,
+        spent_minutes: (t.spent_minutes || 0) + response.data.duration_minutes,
+        estimated_minutes: (t.estimated_minutes || 0) + (response.data.estimated_minutes || 0),
+      } : t)));
       return response.data;
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to log time');
@@ -180,10 +271,10 @@ export const useTasks = () => {
     }
   };
 
-  const getTimeLogs = async (taskId) => {
+  // A page of time logs ({ results, next }); pass `next` to get the following one.
+  const getTimeLogs = async (taskId, next = null) => {
     try {
-      const response = await client.get(`/tasks/${taskId}/time-logs/`);
-      return response.data;
+      return await fetchPage(`/tasks/${taskId}/time-logs/`, {}, next);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to fetch time logs');
       throw err;
@@ -200,10 +291,10 @@ export const useTasks = () => {
     }
   };
 
-  const getComments = async (taskId) => {
+  // A page of comments ({ results, next }); pass `next` to get the following one.
+  const getComments = async (taskId, next = null) => {
     try {
-      const response = await client.get(`/tasks/${taskId}/comments/`);
-      return response.data;
+      return await fetchPage(`/tasks/${taskId}/comments/`, {}, next);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to fetch comments');
       throw err;
@@ -230,6 +321,17 @@ export const useTasks = () => {
     }
   };
 
+  // Server-side breakdowns (totals, by_priority, by_category, completions_per_day)
+  const getTaskStats = async (params = {}) => {
+    try {
+      const response = await client.get('/tasks/stats/', { params });
+      return response.data;
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Failed to fetch task stats');
+      throw err;
+    }
+  };
+
   const getGoals = async () => {
     try {
       const response = await client.get('/goals/');
@@ -291,7 +393,7 @@ export const useTasks = () => {
   };
 
   useEffect(() => {
-    if (localStorage.getItem('access_token')) {
+    if (autoFetch && localStorage.getItem('access_token')) {
       fetchTasks();
     }
   }, []);
@@ -301,15 +403,20 @@ export const useTasks = () => {
     loading,
     error,
     fetchTasks,
+    hasMore: nextPage !== null,
+    loadMore,
     createTask,
     updateTask,
     deleteTask,
     markComplete,
     markPending,
+    batchTasks,
+    getTaskDetail,
     getNotes,
     addNote,
     deleteNote,
     updateTaskOrder,
+    moveTask,
     createRecurringTask,
     // New feature functions
     addSubtask,
@@ -321,6 +428,7 @@ export const useTasks = () => {
     getComments,
     deleteComment,
     getProductivityStats,
+    getTaskStats,
     getGoals,
     createGoal,
     getUserTheme,
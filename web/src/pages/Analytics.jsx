@@ -5,8 +5,9 @@ import { useEffect, useState } from 'react';
 
 export default function Analytics({ darkMode }) {
   const navigate = useNavigate();
-  const { tasks, getProductivityStats } = useTasks();
+  const { getProductivityStats, getTaskStats } = useTasks({ autoFetch: false });
   const [stats, setStats] = useState(null);
+  const [taskStats, setTaskStats] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -21,45 +22,27 @@ export default function Analytics({ darkMode }) {
       }
     };
     fetchStats();
+    getTaskStats()
+      .then(setTaskStats)
+      .catch(() => console.log('Unable to fetch task stats'));
   }, [getProductivityStats]);
 
-  // Generate last 30 days completion data
-  const last30Days = [];
-  for (let i = 29; i >= 0; i--) {
-    const date = new Date();
-    date.setDate(date.getDate() - i);
-    const dateStr = date.toISOString().split('T')[0];
-    const count = tasks.filter(t => 
-      t.status === 'completed' && 
-      t.updated_at?.split('T')[0] === dateStr
-    ).length;
-    last30Days.push({
-      date: date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' }),
-      completed: count,
-    });
-  }
+  // Last 30 days completion data (the stats endpoint's default range)
+  const last30Days = (taskStats?.completions_per_day ?? []).map(day => ({
+    date: new Date(`${day.date}T00:00:00`).toLocaleDateString('en-US', { month: 'short', day: 'numeric' }),
+    completed: day.count,
+  }));
 
   // Calculate trends
-  const totalTasks = tasks.length;
-  const completedTasks = tasks.filter(t => t.status === 'completed').length;
+  const totalTasks = taskStats?.totals.total ?? 0;
+  const completedTasks = taskStats?.totals.completed ?? 0;
   const completionRate = totalTasks > 0 ? Math.round((completedTasks / totalTasks) * 100) : 0;
 
+  const byPriority = taskStats?.by_priority ?? {};
   const priorityCompletionData = [
-    { 
-      name: 'High Priority', 
-      completed: tasks.filter(t => t.priority === 'high' && t.status === 'completed').length,
-      pending: tasks.filter(t => t.priority === 'high' && t.status === 'pending').length
-    },
-    { 
-      name: 'Medium Priority', 
-      completed: tasks.filter(t => t.priority === 'medium' && t.status === 'completed').length,
-      pending: tasks.filter(t => t.priority === 'medium' && t.status === 'pending').length
-    },
-    { 
-      name: 'Low Priority', 
-      completed: tasks.filter(t => t.priority === 'low' && t.status === 'completed').length,
-      pending: tasks.filter(t => t.priority === 'low' && t.status === 'pending').length
-    }
+    { name: 'High Priority', completed: byPriority.high?.completed ?? 0, pending: byPriority.high?.pending ?? 0 },
+    { name: 'Medium Priority', completed: byPriority.medium?.completed ?? 0, pending: byPriority.medium?.pending ?? 0 },
+    { name: 'Low Priority', completed: byPriority.low?.completed ?? 0, pending: byPriority.low?.pending ?? 0 },
   ];
 
   return (
@@ -260,6 +260,7 @@ const SortableTaskItem = ({
 
   const [expandedFeature, setExpandedFeature] = useState(null);
   const [timeLogs, setTimeLogs] = useState([]);
+  const [moreTimeLogs, setMoreTimeLogs] = useState(null);
 
   const style = {
     transform: CSS.Transform.toString(transform),
@@ -276,8 +277,9 @@ const SortableTaskItem = ({
       setExpandedFeature(feature);
       if (feature === 'time' && timeLogs.length === 0) {
         try {
-          const logs = await getTimeLogs(task.id);
-          setTimeLogs(logs);
+          const page = await getTimeLogs(task.id);
+          setTimeLogs(page.results);
+          setMoreTimeLogs(page.next);
         } catch {
           console.log('No time logs yet');
         }
@@ -288,13 +290,24 @@ const SortableTaskItem = ({
   const handleAddTimeLog = async (logData) => {
     try {
       await logTime(task.id, logData);
-      const logs = await getTimeLogs(task.id);
-      setTimeLogs(logs);
+      const page = await getTimeLogs(task.id);
+      setTimeLogs(page.results);
+      setMoreTimeLogs(page.next);
     } catch {
       console.error('Failed to add time log');
     }
   };
 
+  const handleLoadMoreTimeLogs = async () => {
+    try {
+      const page = await getTimeLogs(task.id, moreTimeLogs);
+      setTimeLogs([...timeLogs, ...page.results]);
+      setMoreTimeLogs(page.next);
+    } catch {
+      console.error('Failed to load time logs');
+    }
+  };
+
   return (
     <div
       ref={setNodeRef}
@@ -360,6 +373,24 @@ const SortableTaskItem = ({
                 🔁 {task.recurrence}
               </span>
             )}
+            {task.subtask_count > 0 && (
+              <span className={`px-3 py-1 rounded text-xs font-medium border ${
+                darkMode
+                  ? 'bg-slate-500/30 text-slate-300 border-slate-400/50'
+                  : 'bg-gray-100/50 text-gray-700 border-gray-300/50'
+              }`}>
+                ☑ {task.subtasks_completed}/{task.subtask_count}
+              </span>
+            )}
+            {task.spent_minutes > 0 && (
+              <span className={`px-3 py-1 rounded text-xs font-medium border ${
+                task.estimated_minutes && task.spent_minutes > task.estimated_minutes
+                  ? darkMode ? 'bg-red-500/30 text-red-300 border-red-400/50' : 'bg-red-200/50 text-red-800 border-red-300/50'
+                  : darkMode ? 'bg-slate-500/30 text-slate-300 border-slate-400/50' : 'bg-gray-100/50 text-gray-700 border-gray-300/50'
+              }`}>
+                ⏱ {task.spent_minutes}m{task.estimated_minutes ? ` / ${task.estimated_minutes}m` : ''}
+              </span>
+            )}
           </div>
 
           {/* Expandable Feature Sections */}
@@ -382,7 +413,10 @@ const SortableTaskItem = ({
                 taskId={task.id}
                 darkMode={darkMode}
                 timeLogs={timeLogs}
+                totalSpent={task.spent_minutes}
+                totalEstimated={task.estimated_minutes}
                 onAddTimeLog={handleAddTimeLog}
+                onLoadMore={moreTimeLogs ? handleLoadMoreTimeLogs : null}
               />
             </div>
           )}
@@ -463,14 +497,16 @@ const SortableTaskItem = ({
 const TaskNotesModal = ({ task, darkMode, onClose, onAddNote, getNotes, deleteNote }) => {
   const [noteContent, setNoteContent] = useState('');
   const [notes, setNotes] = useState([]);
+  const [moreNotes, setMoreNotes] = useState(null);
   const [loading, setLoading] = useState(false);
 
   useEffect(() => {
     const fetchNotes = async () => {
       setLoading(true);
       try {
-        const fetchedNotes = await getNotes(task.id);
-        setNotes(fetchedNotes);
+        const page = await getNotes(task.id);
+        setNotes(page.results);
+        setMoreNotes(page.next);
       } catch {
         setNotes([]);
       }
@@ -491,6 +527,16 @@ const TaskNotesModal = ({ task, darkMode, onClose, onAddNote, getNotes, deleteNo
     }
   };
 
+  const handleLoadMoreNotes = async () => {
+    try {
+      const page = await getNotes(task.id, moreNotes);
+      setNotes([...notes, ...page.results]);
+      setMoreNotes(page.next);
+    } catch {
+      // Error handled by parent
+    }
+  };
+
   const handleDeleteNote = async (noteId) => {
     try {
       await deleteNote(task.id, noteId);
@@ -540,7 +586,7 @@ const TaskNotesModal = ({ task, darkMode, onClose, onAddNote, getNotes, deleteNo
         {/* Notes List */}
         <div className="mb-6">
           <h3 className={`text-lg font-semibold mb-3 ${darkMode ? 'text-slate-200' : 'text-gray-700'}`}>
-            All Notes ({notes.length})
+            Notes
           </h3>
           {loading && <p className={darkMode ? 'text-slate-400' : 'text-gray-500'}>Loading notes...</p>}
           {!loading && notes.length === 0 && (
@@ -570,6 +616,14 @@ const TaskNotesModal = ({ task, darkMode, onClose, onAddNote, getNotes, deleteNo
               </div>
             ))}
           </div>
+          {moreNotes && (
+            <button
+              onClick={handleLoadMoreNotes}
+              className={`mt-3 text-sm font-medium ${darkMode ? 'text-blue-300 hover:text-blue-200' : 'text-amber-700 hover:text-amber-800'}`}
+            >
+              Load more notes
+            </button>
+          )}
         </div>
 
         <button
@@ -587,11 +641,23 @@ const TaskNotesModal = ({ task, darkMode, onClose, onAddNote, getNotes, deleteNo
   );
 };
 
+// Sort options of the dashboard -> task list orderings on the server.
+const SORT_ORDERINGS = {
+  status: 'bucket',
+  deadline: 'deadline',
+  priority: 'priority',
+  created: '-created_at',
+};
+
 export default function Dashboard({ darkMode, setDarkMode }) {
   const { logout } = useAuth();
   const { 
     tasks, 
     loading, 
+    fetchTasks,
+    hasMore,
+    loadMore,
+    getTaskStats,
     createTask, 
     markComplete, 
     markPending, 
@@ -600,19 +666,20 @@ export default function Dashboard({ darkMode, setDarkMode }) {
     addNote, 
     deleteNote, 
     createRecurringTask, 
-    updateTaskOrder,
+    moveTask,
     logTime,
     getTimeLogs,
     addSubtask,
     toggleSubtask,
     deleteSubtask
-  } = useTasks();
+  } = useTasks({ autoFetch: false });
   const navigate = useNavigate();
   const [showForm, setShowForm] = useState(false);
   const [searchQuery, setSearchQuery] = useState('');
   const [priorityFilter, setPriorityFilter] = useState('all');
   const [categoryFilter, setCategoryFilter] = useState('all');
   const [sortBy, setSortBy] = useState('status');
+  const [totals, setTotals] = useState({ total: 0, pending: 0, completed: 0, overdue: 0 });
   const [showPomodoro, setShowPomodoro] = useState(null);
   const [showTaskNotes, setShowTaskNotes] = useState(null);
   const [toast, setToast] = useState(null);
@@ -639,7 +706,7 @@ export default function Dashboard({ darkMode, setDarkMode }) {
         
         try {
           // This will update both local state and backend
-          await updateTaskOrder(taskIds);
+          await moveTask(active.id, taskIds);
         } catch {
           setToast({ message: '✗ Failed to save task order', type: 'error' });
         }
@@ -750,55 +817,31 @@ export default function Dashboard({ darkMode, setDarkMode }) {
     }
   };
 
-  // Filter and sort tasks
-  let filteredTasks = tasks.filter(t => {
-    const matchesSearch = t.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      t.description.toLowerCase().includes(searchQuery.toLowerCase());
-    const matchesPriority = priorityFilter === 'all' || t.priority === priorityFilter;
-    const matchesCategory = categoryFilter === 'all' || (t.category === categoryFilter);
-    return matchesSearch && matchesPriority && matchesCategory;
-  });
+  // Filtering and sorting happen on the server; typing in the search box
+  // waits for a pause before asking again.
+  useEffect(() => {
+    const params = { ordering: SORT_ORDERINGS[sortBy] };
+    if (searchQuery.trim()) params.search = searchQuery.trim();
+    if (priorityFilter !== 'all') params.priority = priorityFilter;
+    if (categoryFilter !== 'all') params.category = categoryFilter;
+    const timer = setTimeout(() => fetchTasks(params), searchQuery ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [searchQuery, priorityFilter, categoryFilter, sortBy]);
 
-  filteredTasks = [...filteredTasks].sort((a, b) => {
-    if (sortBy === 'deadline') {
-      if (!a.deadline && !b.deadline) return new Date(b.created_at) - new Date(a.created_at);
-      if (!a.deadline) return 1;
-      if (!b.deadline) return -1;
-      return new Date(a.deadline) - new Date(b.deadline);
-    } else if (sortBy === 'priority') {
-      const priorityOrder = { high: 0, medium: 1, low: 2 };
-      return priorityOrder[a.priority] - priorityOrder[b.priority];
-    } else if (sortBy === 'status') {
-      // For pending tasks, respect the drag-drop order field
-      // For completed tasks, sort by status
-      if (a.status === 'pending' && b.status === 'pending') {
-        return (a.order || 0) - (b.order || 0);
-      }
-      const statusPriority = (t) => {
-        if (t.status === 'completed') return 3;
-        if (!t.deadline) return 2;
-        const daysLeft = Math.floor((new Date(t.deadline) - new Date()) / (1000 * 60 * 60 * 24));
-        if (daysLeft < 0) return 0;
-        if (daysLeft === 0) return 1;
-        return 2;
-      };
-      return statusPriority(a) - statusPriority(b);
-    } else {
-      return new Date(b.created_at) - new Date(a.created_at);
-    }
-  });
+  // The list is filtered, so the counters come from the server.
+  useEffect(() => {
+    getTaskStats()
+      .then(data => setTotals(data.totals))
+      .catch(() => {});
+  }, [tasks]);
 
-  const pendingTasks = filteredTasks.filter(t => t.status === 'pending');
-  const completedTasks = filteredTasks.filter(t => t.status === 'completed');
+  const pendingTasks = tasks.filter(t => t.status === 'pending');
+  const completedTasks = tasks.filter(t => t.status === 'completed');
 
-  const totalTasks = tasks.length;
-  const totalPending = tasks.filter(t => t.status === 'pending').length;
-  const totalCompleted = tasks.filter(t => t.status === 'completed').length;
-  const totalOverdue = tasks.filter(t => {
-    if (t.status !== 'pending' || !t.deadline) return false;
-    const daysLeft = Math.floor((new Date(t.deadline) - new Date()) / (1000 * 60 * 60 * 24));
-    return daysLeft < 0;
-  }).length;
+  const totalTasks = totals.total;
+  const totalPending = totals.pending;
+  const totalCompleted = totals.completed;
+  const totalOverdue = totals.overdue;
 
   return (
     <div className={`min-h-screen transition-colors duration-300 ${
@@ -1163,7 +1206,7 @@ export default function Dashboard({ darkMode, setDarkMode }) {
           <p className={`text-center py-12 text-lg ${darkMode ? 'text-blue-300' : 'text-amber-600'}`}>
             Loading tasks...
           </p>
-        ) : filteredTasks.length === 0 ? (
+        ) : tasks.length === 0 ? (
           <div className="text-center py-12">
             <p className={`text-lg mb-4 ${darkMode ? 'text-slate-400' : 'text-amber-600'}`}>
               No tasks found. Let's get studying! 🚀
@@ -1268,6 +1311,18 @@ export default function Dashboard({ darkMode, setDarkMode }) {
                   </div>
                 )}
 
+                {hasMore && (
+                  <button
+                    onClick={loadMore}
+                    className={`w-full py-3 rounded-xl font-medium transition ${
+                      darkMode
+                        ? 'bg-slate-800/50 hover:bg-slate-700/60 text-slate-200 border border-slate-700/50'
+                        : 'bg-white/40 hover:bg-white/60 text-amber-800 border border-white/40'
+                    }`}
+                  >
+                    Load more tasks
+                  </button>
+                )}
               </div>
             </SortableContext>
           </DndContext>
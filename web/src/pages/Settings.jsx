@@ -4,7 +4,7 @@ import { useState, useEffect } from 'react';
 
 export default function Settings({ darkMode, setDarkMode }) {
   const navigate = useNavigate();
-  const { getGoals, createGoal } = useTasks();
+  const { getGoals, createGoal } = useTasks({ autoFetch: false });
   const [goals, setGoals] = useState([]);
   const [newGoal, setNewGoal] = useState('');
   const [showGoalForm, setShowGoalForm] = useState(false);
@@ -1,3 +1,4 @@
+import { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useTasks } from '../hooks/useTasks';
 import ProductivityDashboard from '../components/ProductivityDashboard';
@@ -5,32 +6,34 @@ import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, Responsive
 
 export default function Stats({ darkMode }) {
   const navigate = useNavigate();
-  const { tasks } = useTasks();
+  const { getTaskStats } = useTasks({ autoFetch: false });
+  const [stats, setStats] = useState(null);
+
+  useEffect(() => {
+    const from = new Date();
+    from.setDate(from.getDate() - 6);
+    getTaskStats({ date_from: from.toISOString().split('T')[0] })
+      .then(setStats)
+      .catch(() => console.log('Unable to fetch task stats'));
+  }, []);
 
   // Calculate stats
-  const totalTasks = tasks.length;
-  const completedTasks = tasks.filter(t => t.status === 'completed').length;
-  const pendingTasks = tasks.filter(t => t.status === 'pending').length;
-  
-  const highPriority = tasks.filter(t => t.priority === 'high').length;
-  const mediumPriority = tasks.filter(t => t.priority === 'medium').length;
-  const lowPriority = tasks.filter(t => t.priority === 'low').length;
+  const totals = stats?.totals ?? { total: 0, completed: 0, pending: 0 };
+  const totalTasks = totals.total;
+  const completedTasks = totals.completed;
+  const pendingTasks = totals.pending;
+
+  const countByPriority = (priority) =>
+    Object.values(stats?.by_priority?.[priority] ?? {}).reduce((sum, n) => sum + n, 0);
+  const highPriority = countByPriority('high');
+  const mediumPriority = countByPriority('medium');
+  const lowPriority = countByPriority('low');
 
-  // Get last 7 days of completed tasks
-  const last7Days = [];
-  for (let i = 6; i >= 0; i--) {
-    const date = new Date();
-    date.setDate(date.getDate() - i);
-    const dateStr = date.toISOString().split('T')[0];
-    const count = tasks.filter(t => 
-      t.status === 'completed' && 
-      t.updated_at.split('T')[0] === dateStr
-    ).length;
-    last7Days.push({
-      date: date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' }),
-      completed: count,
-    });
-  }
+  // Last 7 days of completed tasks
+  const last7Days = (stats?.completions_per_day ?? []).map(day => ({
+    date: new Date(`${day.date}T00:00:00`).toLocaleDateString('en-US', { month: 'short', day: 'numeric' }),
+    completed: day.count,
+  }));
 
   // Priority distribution
   const priorityData = [